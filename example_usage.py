@@ -10,6 +10,7 @@ from llm.vector_store.qdrant_client import QdrantVectorStore
 from llm.embedding.service import EmbeddingService
 from llm.llm_api.client import LLMClient
 from llm.domain.query import Query
+from llm.vector_store.payload_indexes import CONVERSATION_INDEXES
 from qdrant_client import models
 
 # Set up logging
@@ -29,10 +30,12 @@ class ConversationManager:
         try:
             self.vector_store.client.get_collection(self.collection_name)
             logging.info(f"Conversation collection '{self.collection_name}' already exists")
+            self.vector_store.ensure_payload_indexes(self.collection_name, CONVERSATION_INDEXES)
         except Exception:
             self.vector_store.create_collection(
                 self.collection_name, 
-                self.embedding_service.embedding_size
+                self.embedding_service.embedding_size,
+                payload_indexes=CONVERSATION_INDEXES
             )
             logging.info(f"Created conversation collection '{self.collection_name}'")
     
@@ -0,0 +1,252 @@
+# llm/cache/backends.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+class CacheBackend(ABC):
+    """Key/value store with per-entry TTL and a size bound.
+
+    Values must be JSON serializable so that backends shared between
+    processes can store them.
+    """
+
+    @abstractmethod
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Return the live entries among keys; missing or expired keys are left out"""
+
+    @abstractmethod
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None):
+        pass
+
+    @abstractmethod
+    def delete_many(self, keys: Iterable[str]):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_many([key]).get(key)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self.set_many({key: value}, ttl=ttl)
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """Process-local LRU with TTL"""
+
+    def __init__(self, max_size: int = 100000):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        now = time.time()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                value, expires_at = entry
+                if expires_at is not None and expires_at <= now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None):
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            for key, value in items.items():
+                self._entries[key] = (value, expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete_many(self, keys: Iterable[str]):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """File-backed cache that several worker processes on one host can share.
+
+    Eviction drops expired entries first and then the least recently read
+    ones once the table grows past max_size.
+    """
+
+    def __init__(self, path: str, max_size: int = 100000, table: str = "cache"):
+        self.path = path
+        self.max_size = max_size
+        self.table = table
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed_at ON {table} (accessed_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        now = time.time()
+        found = {}
+        conn = self._connection()
+        # Stay well below SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT key, value FROM {self.table} WHERE key IN ({placeholders}) "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (*batch, now)
+            ).fetchall()
+            found.update((key, json.loads(value)) for key, value in rows)
+        if found:
+            with conn:
+                conn.executemany(
+                    f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+        return found
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None):
+        if not items:
+            return
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                [(key, json.dumps(value), expires_at, now) for key, value in items.items()]
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        conn.execute(f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        overflow = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0] - self.max_size
+        if overflow > 0:
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,)
+            )
+
+    def delete_many(self, keys: Iterable[str]):
+        conn = self._connection()
+        with conn:
+            conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", [(key,) for key in keys])
+
+    def clear(self):
+        conn = self._connection()
+        with conn:
+            conn.execute(f"DELETE FROM {self.table}")
+
+
+class RedisCacheBackend(CacheBackend):
+    """Cache shared through Redis or any server speaking its protocol (Valkey, Dragonfly, KeyDB).
+
+    Size is bounded by the server's maxmemory policy (allkeys-lru), not by
+    this client; entries of one cache share a key prefix so clear() only
+    touches them.
+    """
+
+    def __init__(self, url: str, prefix: str = "cache"):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("The redis cache backend needs the 'redis' package: poetry install --with redis") from e
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self._client.mget([self._key(key) for key in keys])
+        return {key: json.loads(value) for key, value in zip(keys, values) if value is not None}
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None):
+        if not items:
+            return
+        pipeline = self._client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipeline.set(self._key(key), json.dumps(value), px=int(ttl * 1000) if ttl else None)
+        pipeline.execute()
+
+    def delete_many(self, keys: Iterable[str]):
+        keys = [self._key(key) for key in keys]
+        if keys:
+            self._client.delete(*keys)
+
+    def clear(self):
+        for keys in _chunked(self._client.scan_iter(match=f"{self.prefix}:*", count=1000), 1000):
+            self._client.delete(*keys)
+
+
+def _chunked(iterable: Iterable, size: int) -> Iterable[list]:
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def create_backend(kind: str, path: Optional[str] = None, max_size: int = 100000,
+                   table: str = "cache", url: Optional[str] = None) -> Optional[CacheBackend]:
+    """Build a backend from a settings string: "memory", "sqlite", "redis" or "none" """
+    if kind == "none":
+        return None
+    if kind == "memory":
+        return InMemoryCacheBackend(max_size=max_size)
+    if kind == "sqlite":
+        if not path:
+            raise ValueError("The sqlite cache backend needs a path")
+        return SQLiteCacheBackend(path, max_size=max_size, table=table)
+    if kind == "redis":
+        if not url:
+            raise ValueError("The redis cache backend needs a url")
+        return RedisCacheBackend(url, prefix=table)
+    raise ValueError(f"Unsupported cache backend: {kind}")
+
+
+def normalize_query(text: str) -> str:
+    """Case- and whitespace-insensitive form of a query used in cache keys"""
+    return " ".join(text.lower().split())
+
@@ -0,0 +1,96 @@
+# llm/cache/retrieval_cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from llm.cache.backends import CacheBackend, create_backend, normalize_query
+
+
+class RetrievalCache:
+    """Cache of final retrieval results, in front of the whole retrieval pipeline.
+
+    Keys cover the normalized query, the retrieval parameters and a version
+    of the indexed data. The version comes from version_fn (typically the
+    live collection and the ingestion stamp that every write bumps in
+    Qdrant, re-read at most every version_check_interval seconds), so it
+    moves in every process whatever the backend. A generation counter kept
+    in the backend is added on top for invalidate(), which only reaches
+    processes sharing the backend. Entries written against an older
+    version are never read again and age out through the backend's TTL
+    and size bound.
+    """
+
+    GENERATION_KEY = "__generation__"
+
+    def __init__(self, backend: CacheBackend, version_fn: Optional[Callable[[], Any]] = None,
+                 ttl: Optional[float] = None, version_check_interval: float = 5.0):
+        self.backend = backend
+        self.version_fn = version_fn
+        self.ttl = ttl
+        self.version_check_interval = version_check_interval
+        self._version = None
+        self._version_checked_at = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls, version_fn: Optional[Callable[[], Any]] = None) -> Optional["RetrievalCache"]:
+        """Build the cache from RETRIEVAL_CACHE_* environment variables; None when disabled"""
+        backend = create_backend(
+            os.getenv("RETRIEVAL_CACHE_BACKEND", "memory"),
+            path=os.getenv("RETRIEVAL_CACHE_PATH", ".cache/retrieval.sqlite"),
+            max_size=int(os.getenv("RETRIEVAL_CACHE_MAX_SIZE", "10000")),
+            table="retrieval",
+            url=os.getenv("RETRIEVAL_CACHE_URL")
+        )
+        if backend is None:
+            return None
+        ttl = os.getenv("RETRIEVAL_CACHE_TTL", "3600")
+        return cls(backend, version_fn=version_fn, ttl=float(ttl) if ttl else None)
+
+    def version(self) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            if self._version is None or now - self._version_checked_at >= self.version_check_interval:
+                data_version = self.version_fn() if self.version_fn else None
+                self._version = [data_version, self.backend.get(self.GENERATION_KEY) or 0]
+                self._version_checked_at = now
+            return self._version
+
+    def key(self, query: str, **params) -> str:
+        raw = json.dumps(
+            {"query": normalize_query(query), "params": params, "version": self.version()},
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, query: str, **params) -> Optional[Any]:
+        value = self.backend.get(self.key(query, **params))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, query: str, value: Any, **params):
+        self.backend.set(self.key(query, **params), value, ttl=self.ttl)
+
+    def invalidate(self):
+        """Drop every cached result, in this process and in others sharing the backend"""
+        generation = (self.backend.get(self.GENERATION_KEY) or 0) + 1
+        self.backend.set(self.GENERATION_KEY, generation)
+        with self._lock:
+            self._version = None
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
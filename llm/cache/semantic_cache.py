@@ -0,0 +1,172 @@
+# llm/cache/semantic_cache.py
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+@dataclass
+class SemanticCacheHit:
+    query: str
+    answer: str
+    context: Any
+    similarity: float
+
+
+class SemanticCache:
+    """Answer cache matched by query similarity instead of exact text.
+
+    Normalized query embeddings sit in a preallocated float32 matrix, so a
+    lookup is a single matrix-vector product. Entries carry the id of the
+    model that generated the answer and the version of the indexed data
+    from version_fn (re-read at most every version_check_interval seconds),
+    and are only matched while both are current, so swapping a model or
+    re-ingesting never serves answers from before. Entries are further
+    confined to the scope they were stored under, e.g. the filters
+    resolved from the query, so a paraphrase about another author or
+    article never matches. Expired entries are skipped and reclaimed
+    lazily; when the index is full the least recently used entry is
+    replaced.
+    """
+
+    def __init__(self, model_version: str, threshold: float = 0.95, ttl: Optional[float] = 24 * 60 * 60,
+                 max_entries: int = 5000, version_fn: Optional[Callable[[], Any]] = None,
+                 version_check_interval: float = 5.0):
+        self.model_version = model_version
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version_fn = version_fn
+        self.version_check_interval = version_check_interval
+        self._version = None
+        self._version_checked_at = 0.0
+        self._version_lock = threading.Lock()
+
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._live = np.zeros(max_entries, dtype=bool)
+        self._expires_at = np.full(max_entries, np.inf)
+        self._last_used = np.zeros(max_entries)
+        self._versions: List[Optional[str]] = [None] * max_entries
+        self._entries: List[Optional[Dict]] = [None] * max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @classmethod
+    def from_env(cls, model_version: str, version_fn: Optional[Callable[[], Any]] = None) -> Optional["SemanticCache"]:
+        """Build the cache from SEMANTIC_CACHE_* environment variables; None when disabled"""
+        if os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() not in ("1", "true", "yes"):
+            return None
+        ttl = os.getenv("SEMANTIC_CACHE_TTL", str(24 * 60 * 60))
+        return cls(
+            model_version,
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+            ttl=float(ttl) if ttl else None,
+            max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000")),
+            version_fn=version_fn
+        )
+
+    def version(self) -> str:
+        """Model id and data version the current entries are stored and matched under"""
+        now = time.monotonic()
+        with self._version_lock:
+            if self._version is None or now - self._version_checked_at >= self.version_check_interval:
+                data_version = self.version_fn() if self.version_fn else None
+                self._version = json.dumps([self.model_version, data_version], sort_keys=True, default=str)
+                self._version_checked_at = now
+            return self._version
+
+    def _entry_key(self, scope: Any) -> str:
+        return json.dumps([self.version(), scope], sort_keys=True, default=str)
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _expire(self, now: float):
+        expired = self._live & (self._expires_at <= now)
+        if expired.any():
+            self._live[expired] = False
+            self.expirations += int(expired.sum())
+            for slot in np.flatnonzero(expired):
+                self._entries[slot] = None
+
+    def lookup(self, embedding: Sequence[float], scope: Any = None) -> Optional[SemanticCacheHit]:
+        """Most similar cached query of the current version and the same scope, if it clears the threshold"""
+        vector = self._normalize(embedding)
+        entry_key = self._entry_key(scope)
+        now = time.time()
+        with self._lock:
+            if self._matrix is None:
+                self.misses += 1
+                return None
+            self._expire(now)
+            candidates = np.flatnonzero(self._live)
+            candidates = [slot for slot in candidates if self._versions[slot] == entry_key]
+            if not candidates:
+                self.misses += 1
+                return None
+            similarities = self._matrix[candidates] @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+            slot = candidates[best]
+            self._last_used[slot] = now
+            self.hits += 1
+            entry = self._entries[slot]
+            return SemanticCacheHit(
+                query=entry["query"],
+                answer=entry["answer"],
+                context=entry["context"],
+                similarity=float(similarities[best])
+            )
+
+    def put(self, embedding: Sequence[float], query: str, answer: str, context: Any = None, scope: Any = None):
+        vector = self._normalize(embedding)
+        entry_key = self._entry_key(scope)
+        now = time.time()
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            self._expire(now)
+            free = np.flatnonzero(~self._live)
+            if len(free):
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+            self._matrix[slot] = vector
+            self._live[slot] = True
+            self._expires_at[slot] = now + self.ttl if self.ttl else np.inf
+            self._last_used[slot] = now
+            self._versions[slot] = entry_key
+            self._entries[slot] = {"query": query, "answer": answer, "context": context}
+
+    def clear(self):
+        with self._lock:
+            self._live[:] = False
+            self._entries = [None] * self.max_entries
+
+    def __len__(self) -> int:
+        return int(self._live.sum())
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self),
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "model_version": self.model_version,
+        }
@@ -3,6 +3,8 @@ import re
 from typing import List, Dict
 import hashlib
 
+from llm.rag.metadata_extractor import parse_year
+
 class ArticleChunkingHandler:
     def __init__(self, chunk_size=1000, chunk_overlap=200):
         self.chunk_size = chunk_size
@@ -25,15 +27,15 @@ class ArticleChunkingHandler:
                 current_chunk += sentence + " "
             else:
                 if current_chunk.strip():
-                    chunks.append(self._create_chunk(cleaned_article, current_chunk.strip()))
+                    chunks.append(self._create_chunk(cleaned_article, current_chunk.strip(), len(chunks)))
                 current_chunk = sentence + " "
         
         if current_chunk.strip():
-            chunks.append(self._create_chunk(cleaned_article, current_chunk.strip()))
+            chunks.append(self._create_chunk(cleaned_article, current_chunk.strip(), len(chunks)))
         
         return chunks
     
-    def _create_chunk(self, article: Dict, chunk_content: str) -> Dict:
+    def _create_chunk(self, article: Dict, chunk_content: str, chunk_index: int = 0) -> Dict:
         """Create chunk document matching your Qdrant payload structure"""
         chunk_id = hashlib.md5(chunk_content.encode()).hexdigest()
         
@@ -44,9 +46,15 @@ class ArticleChunkingHandler:
             'title': article.get('title', ''),
             'authors': article.get('authors', ''),
             'url': article.get('url', ''),
+            # Filterable fields, matched by the metadata extracted from queries
+            'doi': article.get('doi'),
+            'journal': article.get('journal'),
+            'year': parse_year(article.get('publication_date')),
+            'author_list': [author.strip() for author in (article.get('authors') or '').split(',') if author.strip()],
             'metadata': {
                 'chunk_size': len(chunk_content),
                 'original_length': len(article.get('content', '')),
-                'chunk_id': chunk_id
+                'chunk_id': chunk_id,
+                'chunk_index': chunk_index
             }
         }
\ No newline at end of file
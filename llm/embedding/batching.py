@@ -0,0 +1,167 @@
+# llm/embedding/batching.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+
+class EmbeddingBatcher:
+    """Dynamic micro-batching for concurrent single-text embedding requests.
+
+    Callers submit one text and get a Future back. A worker thread collects
+    requests until either max_batch_size texts are waiting or max_wait_ms has
+    passed since the first one arrived, then runs a single encode call and
+    resolves every future with its own row.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 3.0,
+    ):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[Optional[Tuple[str, Future]]]" = queue.Queue()
+        self._closed = False
+        # Guards _closed and the queue together, so nothing is enqueued behind the shutdown sentinel
+        self._close_lock = threading.Lock()
+
+        self.batches = 0
+        self.items = 0
+
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        future: Future = Future()
+        with self._close_lock:
+            if self._closed:
+                raise RuntimeError("EmbeddingBatcher is closed")
+            self._queue.put((text, future))
+        return future
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.submit(text).result()
+
+    def close(self):
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._worker.join()
+
+    def __enter__(self) -> "EmbeddingBatcher":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _collect(self) -> Tuple[List[Tuple[str, Future]], bool]:
+        first = self._queue.get()
+        if first is None:
+            return [], True
+
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+
+        return batch, False
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch, stop = self._collect()
+            if batch:
+                self._process(batch)
+
+        # Nothing can follow the sentinel, but fail rather than hang if anything ever does
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(RuntimeError("EmbeddingBatcher is closed"))
+
+    def _process(self, batch: List[Tuple[str, Future]]):
+        batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            embeddings = self.encode_fn([text for text, _ in batch])
+        except Exception:
+            # Isolate the failure: re-run one by one so only the bad input errors out
+            for text, future in batch:
+                try:
+                    future.set_result(self.encode_fn([text])[0])
+                except Exception as e:
+                    future.set_exception(e)
+            return
+
+        for (_, future), embedding in zip(batch, embeddings):
+            future.set_result(embedding)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+        }
+
+
+if __name__ == "__main__":
+    # Throughput vs p99 latency for different batch windows under concurrent load
+    import argparse
+    from concurrent.futures import ThreadPoolExecutor
+    from sentence_transformers import SentenceTransformer
+
+    parser = argparse.ArgumentParser(description="Benchmark embedding micro-batching")
+    parser.add_argument("--model", type=str, default="all-MiniLM-L6-v2")
+    parser.add_argument("--requests", type=int, default=512)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--windows", type=str, default="0,1,2,5,10")
+    args = parser.parse_args()
+
+    model = SentenceTransformer(args.model)
+    texts = [f"What is the role of gene BRCA{i % 7} in disease {i}?" for i in range(args.requests)]
+
+    def run(embed: Callable[[str], np.ndarray]):
+        latencies = []
+
+        def timed(text):
+            start = time.perf_counter()
+            embed(text)
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(timed, texts))
+        elapsed = time.perf_counter() - start
+        return len(texts) / elapsed, np.percentile(latencies, 99) * 1000
+
+    throughput, p99 = run(lambda text: model.encode([text])[0])
+    print(f"unbatched     : {throughput:8.1f} req/s  p99 {p99:7.1f} ms")
+    for window in [float(w) for w in args.windows.split(",")]:
+        with EmbeddingBatcher(model.encode, max_batch_size=64, max_wait_ms=window) as batcher:
+            throughput, p99 = run(batcher.embed)
+            avg = batcher.stats()["avg_batch_size"]
+        print(f"window {window:4.1f} ms: {throughput:8.1f} req/s  p99 {p99:7.1f} ms  avg batch {avg:5.1f}")
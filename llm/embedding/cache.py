@@ -0,0 +1,208 @@
+# llm/embedding/cache.py
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import portalocker
+
+KEY_SIZE = 20  # sha1 digest length in bytes
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache keyed by (model id, sha1 of the text).
+
+    Vectors are appended to a float32 matrix on disk (read back through a
+    memory map) and the row of every key is recorded in a parallel key file,
+    so the offset index is rebuilt on start-up without parsing any vectors.
+    A bounded in-memory LRU sits in front of the disk store.
+
+    Several processes (the API and the feature pipeline) may share a cache
+    directory: appends happen under an exclusive file lock, and rows other
+    processes appended are picked up on the next miss or write.
+    """
+
+    def __init__(self, model_id: str, cache_dir: Optional[str] = None, max_memory_items: int = 10000):
+        self.model_id = model_id
+        self.max_memory_items = max_memory_items
+        self.cache_dir = None
+        if cache_dir:
+            safe_model_id = model_id.replace("/", "__")
+            self.cache_dir = os.path.join(cache_dir, safe_model_id)
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._index: Dict[bytes, int] = {}
+        self._dim: Optional[int] = None
+        self._matrix: Optional[np.memmap] = None
+        self._rows = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.cache_dir:
+            self._load_index()
+
+    @property
+    def _keys_path(self) -> str:
+        return os.path.join(self.cache_dir, "keys.bin")
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.cache_dir, "vectors.f32")
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.cache_dir, "meta.json")
+
+    @property
+    def _lock_path(self) -> str:
+        return os.path.join(self.cache_dir, "cache.lock")
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha1(f"{self.model_id}\0{text}".encode("utf-8")).digest()
+
+    def _load_index(self):
+        if self._dim is None:
+            if not os.path.exists(self._meta_path):
+                return
+            try:
+                with open(self._meta_path) as f:
+                    self._dim = json.load(f)["dim"]
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️  Ignoring unreadable embedding cache metadata {self._meta_path}: {e}")
+                return
+
+        # Missing or short files, e.g. after an interrupted write, leave the rows both files hold
+        rows = self._trusted_rows()
+        if rows <= self._rows:
+            return
+        with open(self._keys_path, "rb") as f:
+            f.seek(self._rows * KEY_SIZE)
+            keys = f.read((rows - self._rows) * KEY_SIZE)
+        for i in range(rows - self._rows):
+            self._index[keys[i * KEY_SIZE:(i + 1) * KEY_SIZE]] = self._rows + i
+        self._rows = rows
+        self._matrix = None
+
+    def _trusted_rows(self) -> int:
+        # A crash between the two appends leaves one file longer than the other;
+        # only rows present in both are trusted.
+        key_rows = os.path.getsize(self._keys_path) // KEY_SIZE if os.path.exists(self._keys_path) else 0
+        vector_bytes = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        return min(key_rows, vector_bytes // (self._dim * 4))
+
+    def _init_store(self, dim: int):
+        self._dim = dim
+        with open(self._meta_path, "w") as f:
+            json.dump({"model_id": self.model_id, "dim": dim}, f)
+        open(self._keys_path, "wb").close()
+        open(self._vectors_path, "wb").close()
+
+    def _append(self, keys: List[bytes], rows: List[np.ndarray]):
+        """Append rows under the inter-process lock and return the first row number they got"""
+        with portalocker.Lock(self._lock_path, mode="a", flags=portalocker.LOCK_EX):
+            # Another process may have created the store or appended rows since we last looked
+            if self._dim is None and os.path.exists(self._meta_path):
+                self._load_index()
+            if self._dim is None:
+                self._init_store(len(rows[0]))
+            self._load_index()
+            # Drop the tail of an interrupted append, so new rows stay aligned across both files
+            for path, row_size in ((self._keys_path, KEY_SIZE), (self._vectors_path, self._dim * 4)):
+                with open(path, "ab") as f:
+                    f.truncate(self._rows * row_size)
+
+            # Vectors go first so a crash never leaves a key pointing past the matrix.
+            with open(self._vectors_path, "ab") as f:
+                f.write(np.stack(rows).tobytes())
+            with open(self._keys_path, "ab") as f:
+                f.write(b"".join(keys))
+            first_row = self._rows
+            self._rows += len(keys)
+            return first_row
+
+    def _read_row(self, row: int) -> np.ndarray:
+        if self._matrix is None or row >= self._matrix.shape[0]:
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self._rows, self._dim))
+
+        return np.array(self._matrix[row])
+
+    def _remember(self, key: bytes, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        key = self.key(text)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+            row = self._index.get(key)
+            if row is None and self.cache_dir:
+                # Pick up rows other processes appended since the last look
+                self._load_index()
+                row = self._index.get(key)
+            if row is not None:
+                vector = self._read_row(row)
+                self._remember(key, vector)
+                self.hits += 1
+                self.disk_hits += 1
+                return vector
+
+            self.misses += 1
+            return None
+
+    def put_many(self, texts: Sequence[str], vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            new = {}
+            for text, vector in zip(texts, vectors):
+                key = self.key(text)
+                self._remember(key, vector)
+                if self.cache_dir and key not in self._index:
+                    new[key] = vector
+
+            if not new:
+                return
+
+            first_row = self._append(list(new), list(new.values()))
+            for i, key in enumerate(new):
+                self._index[key] = first_row + i
+
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Return embeddings for texts in order, calling encode_fn only for unique misses."""
+        cached = [self.get(text) for text in texts]
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+
+        if missing:
+            computed = np.asarray(encode_fn(missing), dtype=np.float32)
+            self.put_many(missing, computed)
+            by_text = dict(zip(missing, computed))
+            cached = [vector if vector is not None else by_text[text] for text, vector in zip(texts, cached)]
+
+        if not cached:
+            return np.empty((0, self._dim or 0), dtype=np.float32)
+
+        return np.stack(cached)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "model_id": self.model_id,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_items": len(self._memory),
+            "disk_items": self._rows,
+        }
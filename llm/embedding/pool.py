@@ -0,0 +1,103 @@
+# llm/embedding/pool.py
+import multiprocessing
+import os
+from typing import Any, Callable, List, Optional
+
+import numpy as np
+
+_worker_model = None
+
+
+def load_sentence_transformer(model_name: str, device: str = "cpu"):
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name, device=device)
+
+
+def _init_worker(model_name: str, device: str, threads_per_worker: int, model_factory: Callable[..., Any]):
+    """Load the model once per worker and pin torch to its share of the cores"""
+    global _worker_model
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    os.environ["OMP_NUM_THREADS"] = str(threads_per_worker)
+
+    import torch
+
+    torch.set_num_threads(threads_per_worker)
+    _worker_model = model_factory(model_name, device=device)
+    _worker_model.eval()
+
+
+def _encode_shard(texts: List[str]) -> np.ndarray:
+    return _worker_model.encode(texts, convert_to_numpy=True).astype(np.float32, copy=False)
+
+
+class EmbeddingPool:
+    """Process pool for bulk embedding.
+
+    Each worker loads the model once and gets cpu_count // num_workers torch
+    threads so workers do not oversubscribe the cores. Inputs are sharded into
+    chunks of shard_size texts and the results are returned in input order.
+
+    Workers build their model with model_factory(model_name, device=device),
+    which must be picklable. Pass the factory the serving process uses, so
+    ingestion embeds on the same inference backend as queries.
+    """
+
+    def __init__(self, model_name: str, num_workers: Optional[int] = None, device: str = "cpu",
+                 threads_per_worker: Optional[int] = None, shard_size: int = 256,
+                 model_factory: Callable[..., Any] = load_sentence_transformer):
+        self.model_name = model_name
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // self.num_workers)
+        self.shard_size = shard_size
+
+        context = multiprocessing.get_context("spawn")
+        self._pool = context.Pool(
+            processes=self.num_workers,
+            initializer=_init_worker,
+            initargs=(model_name, device, self.threads_per_worker, model_factory)
+        )
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        shards = [texts[i:i + self.shard_size] for i in range(0, len(texts), self.shard_size)]
+        # Pool.map preserves shard order, so stacking restores input order
+        return np.vstack(self._pool.map(_encode_shard, shards))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self) -> "EmbeddingPool":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    # Scaling benchmark: texts/sec for 1, 2, 4, ... N workers
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Benchmark multi-process embedding")
+    parser.add_argument("--model", type=str, default="all-MiniLM-L6-v2")
+    parser.add_argument("--texts", type=int, default=8192)
+    parser.add_argument("--max_workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    texts = [f"Sentence {i} about the clinical outcomes of treatment arm {i % 13}." * (1 + i % 4)
+             for i in range(args.texts)]
+
+    workers = 1
+    while workers <= args.max_workers:
+        with EmbeddingPool(args.model, num_workers=workers) as pool:
+            pool.encode(texts[:workers * pool.shard_size])  # warm up every worker
+            start = time.perf_counter()
+            pool.encode(texts)
+            elapsed = time.perf_counter() - start
+        print(f"{workers:3d} workers x {pool.threads_per_worker:2d} threads: {len(texts) / elapsed:9.1f} texts/s")
+        workers *= 2
@@ -1,24 +1,75 @@
 # llm/embedding/service.py
+import os
+import time
+from contextlib import contextmanager
 from sentence_transformers import SentenceTransformer
-from typing import List, Dict
+from typing import List, Dict, Optional, Sequence
+from llm.embedding.cache import EmbeddingCache
+from llm.embedding.batching import EmbeddingBatcher
+from llm.embedding.pool import EmbeddingPool
 
 class EmbeddingService:
-    def __init__(self, model_name="all-MiniLM-L6-v2"):
+    def __init__(self, model_name="all-MiniLM-L6-v2", cache_dir: Optional[str] = None, use_cache: bool = True,
+                 batch_wait_ms: Optional[float] = None, max_batch_size: int = 32):
+        self.model_name = model_name
         self.model = SentenceTransformer(model_name)
         self.embedding_size = self.model.get_sentence_embedding_dimension()
+        self.cache = None
+        if use_cache:
+            self.cache = EmbeddingCache(
+                model_name,
+                cache_dir=cache_dir or os.getenv("EMBEDDING_CACHE_DIR", ".cache/embeddings"),
+                max_memory_items=int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "10000"))
+            )
+        # Concurrent embed_text calls are coalesced into one forward pass when a batch window is set
+        if batch_wait_ms is None and os.getenv("EMBEDDING_BATCH_WAIT_MS"):
+            batch_wait_ms = float(os.getenv("EMBEDDING_BATCH_WAIT_MS"))
+        self.batcher = None
+        if batch_wait_ms is not None:
+            self.batcher = EmbeddingBatcher(self._encode, max_batch_size=max_batch_size, max_wait_ms=batch_wait_ms)
+        self.pool = None
+    
+    @contextmanager
+    def multi_process(self, num_workers: Optional[int] = None, **pool_kwargs):
+        """Route embed_batch through a process pool for the duration of the block"""
+        with EmbeddingPool(self.model_name, num_workers=num_workers, **pool_kwargs) as pool:
+            self.pool = pool
+            try:
+                yield self
+            finally:
+                self.pool = None
+    
+    def _encode(self, texts: List[str]):
+        encode_fn = self.model.encode
+        # Single texts stay in-process; shipping them to a worker costs more than encoding them
+        if self.pool is not None and len(texts) > 1:
+            encode_fn = self.pool.encode
+        if self.cache is None:
+            return encode_fn(texts)
+        return self.cache.encode(texts, encode_fn)
     
     def embed_text(self, text: str) -> List[float]:
         """Generate embedding for single text"""
-        return self.model.encode(text).tolist()
+        if self.batcher is not None:
+            return self.batcher.embed(text).tolist()
+        return self._encode([text])[0].tolist()
     
     def embed_batch(self, texts: List[str]) -> List[List[float]]:
         """Generate embeddings in batch"""
-        return self.model.encode(texts).tolist()
+        return self._encode(texts).tolist()
+    
+    def cache_stats(self) -> Dict:
+        """Hit/miss statistics of the embedding cache"""
+        return self.cache.stats() if self.cache else {}
 
 class ArticleEmbeddingHandler:
-    def __init__(self, model_name="all-MiniLM-L6-v2"):
+    def __init__(self, model_name="all-MiniLM-L6-v2", batch_size: int = 64,
+                 bucket_boundaries: Sequence[int] = (64, 128, 256)):
         self.embedding_service = EmbeddingService(model_name)
         self.model_name = model_name
+        self.batch_size = batch_size
+        self.bucket_boundaries = sorted(bucket_boundaries)
+        self.last_run_stats: Dict = {}
     
     def embed_chunks(self, chunks: List[Dict]) -> List[Dict]:
         """Add embeddings to chunks"""
@@ -28,6 +79,76 @@ class ArticleEmbeddingHandler:
         chunk_texts = [chunk['chunk_content'] for chunk in chunks]
         embeddings = self.embedding_service.embed_batch(chunk_texts)
         
+        return self._attach_embeddings(chunks, embeddings)
+    
+    def embed_chunks_bucketed(self, chunks: List[Dict]) -> List[Dict]:
+        """Embed chunks collected across articles in length-bucketed, fixed-size batches.
+
+        Chunks are sorted by token length and grouped by bucket_boundaries so
+        each batch pads to roughly the same length; vectors are scattered back
+        to the original chunk order. A batch that fails is retried chunk by
+        chunk, and only the chunks that still fail are left out of the result.
+        """
+        if not chunks:
+            return []
+        
+        start = time.perf_counter()
+        tokenizer = self.embedding_service.model.tokenizer
+        chunk_texts = [chunk['chunk_content'] for chunk in chunks]
+        token_lengths = [len(ids) for ids in tokenizer(chunk_texts, add_special_tokens=True)['input_ids']]
+        
+        buckets: Dict[int, List[int]] = {}
+        for idx in sorted(range(len(chunks)), key=lambda i: token_lengths[i]):
+            bucket = next((b for b in self.bucket_boundaries if token_lengths[idx] <= b), None)
+            buckets.setdefault(bucket if bucket is not None else -1, []).append(idx)
+        
+        # With a process pool, hand each worker one fixed-size batch per call
+        pool = self.embedding_service.pool
+        step = self.batch_size * (pool.num_workers if pool else 1)
+        
+        embeddings: List[Optional[List[float]]] = [None] * len(chunks)
+        num_batches = 0
+        for indices in buckets.values():
+            for i in range(0, len(indices), step):
+                batch_indices = indices[i:i + step]
+                for j, embedding in zip(batch_indices, self._embed_isolated(batch_indices, chunk_texts, chunks)):
+                    embeddings[j] = embedding
+                num_batches += 1
+        failed = sum(embedding is None for embedding in embeddings)
+        if failed:
+            print(f"⚠️ Skipped {failed} chunks that could not be embedded")
+        
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        self.last_run_stats = {
+            'chunks': len(chunks),
+            'tokens': sum(token_lengths),
+            'batches': num_batches,
+            'failed': failed,
+            'buckets': {b: len(idx) for b, idx in buckets.items()},
+            'seconds': elapsed,
+            'chunks_per_sec': len(chunks) / elapsed,
+            'tokens_per_sec': sum(token_lengths) / elapsed,
+        }
+        
+        embedded = [(chunk, embedding) for chunk, embedding in zip(chunks, embeddings) if embedding is not None]
+        return self._attach_embeddings([chunk for chunk, _ in embedded], [embedding for _, embedding in embedded])
+    
+    def _embed_isolated(self, indices: List[int], texts: List[str], chunks: List[Dict]) -> List[Optional[List[float]]]:
+        """Embed one batch; when it fails, embed its chunks one at a time so one bad chunk costs only itself"""
+        try:
+            return self.embedding_service.embed_batch([texts[j] for j in indices])
+        except Exception as e:
+            print(f"⚠️ Embedding batch of {len(indices)} chunks failed, retrying them one by one: {e}")
+        embeddings = []
+        for j in indices:
+            try:
+                embeddings.append(self.embedding_service.embed_batch([texts[j]])[0])
+            except Exception as e:
+                print(f"❌ Error embedding chunk {j} of article {chunks[j].get('pmid', 'unknown')}: {e}")
+                embeddings.append(None)
+        return embeddings
+    
+    def _attach_embeddings(self, chunks: List[Dict], embeddings: List[List[float]]) -> List[Dict]:
         embedded_chunks = []
         for i, chunk in enumerate(chunks):
             embedded_chunk = chunk.copy()
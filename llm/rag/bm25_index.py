@@ -0,0 +1,355 @@
+# llm/rag/bm25_index.py
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def chunk_key(pmid: str, chunk_id: str) -> str:
+    """Index key of a chunk; chunk ids are content hashes, so they are scoped by article"""
+    return f"{pmid}:{chunk_id}"
+
+
+def score_texts(query: str, texts: Sequence[str], k1: float = 1.5, b: float = 0.75) -> np.ndarray:
+    """BM25 of query against a small candidate set, with IDF taken from the candidates themselves"""
+    counts = [Counter(tokenize(text)) for text in texts]
+    scores = np.zeros(len(texts), dtype=np.float64)
+    if not counts:
+        return scores
+    lengths = np.asarray([sum(c.values()) for c in counts], dtype=np.float64)
+    avgdl = lengths.mean() or 1.0
+    for term, qtf in Counter(tokenize(query)).items():
+        tf = np.asarray([c.get(term, 0) for c in counts], dtype=np.float64)
+        df = int((tf > 0).sum())
+        if not df:
+            continue
+        idf = math.log(1 + (len(texts) - df + 0.5) / (df + 0.5))
+        scores += qtf * idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths / avgdl))
+    return scores
+
+
+class BM25Index:
+    """Corpus-level BM25 inverted index, persisted as CSR postings arrays.
+
+    Postings live in three flat arrays (offsets per term, doc ids, term
+    frequencies) saved as .npy files and memory-mapped on load, so the serve
+    path never tokenizes the corpus. Documents added after loading go into an
+    in-memory delta segment and deletions are tombstoned; save() merges both
+    into fresh arrays. Loading is lazy: nothing is read until the first query.
+
+    Each save writes a new generation directory and then publishes it by
+    atomically replacing the CURRENT manifest, so readers never mix arrays of
+    two generations. A loaded index re-reads the manifest at most every
+    check_interval seconds and reloads when another process published a
+    newer generation.
+    """
+
+    ARRAYS = ("offsets", "postings_docs", "postings_tfs", "doc_lengths")
+    MANIFEST = "CURRENT"
+
+    def __init__(self, index_dir: str, k1: float = 1.5, b: float = 0.75, check_interval: float = 5.0):
+        self.index_dir = index_dir
+        self.k1 = k1
+        self.b = b
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._dirty = False
+        self._generation: Optional[str] = None
+        self._checked_at = 0.0
+
+    @property
+    def exists(self) -> bool:
+        return self._current_generation() is not None
+
+    def _current_generation(self) -> Optional[str]:
+        """Generation directory named by the manifest; "" is the pre-manifest layout with files in index_dir"""
+        try:
+            with open(os.path.join(self.index_dir, self.MANIFEST)) as f:
+                return json.load(f)["generation"]
+        except FileNotFoundError:
+            return "" if os.path.exists(os.path.join(self.index_dir, "meta.json")) else None
+
+    def _is_stale(self) -> bool:
+        # Unsaved local changes win over a generation published by another writer
+        if self._dirty or time.monotonic() - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = time.monotonic()
+        return self._current_generation() != self._generation
+
+    def _ensure_loaded(self):
+        if self._loaded and not self._is_stale():
+            return
+        with self._lock:
+            if self._loaded and not self._is_stale():
+                return
+            self._load()
+
+    def _load(self):
+        # A writer may delete the generation the manifest named before its files are opened; read it again then
+        for attempt in range(3):
+            try:
+                return self._load_generation(self._current_generation())
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+
+    def _load_generation(self, generation: Optional[str]):
+        self._loaded = False
+        self._generation = generation
+        self._checked_at = time.monotonic()
+        self._vocab: Dict[str, int] = {}
+        self._doc_keys: List[str] = []
+        self._doc_groups: List[str] = []
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._postings_docs = np.empty(0, dtype=np.int32)
+        self._postings_tfs = np.empty(0, dtype=np.int32)
+        self._doc_lengths = np.empty(0, dtype=np.int32)
+        if self._generation is not None:
+            generation_dir = os.path.join(self.index_dir, self._generation)
+            with open(os.path.join(generation_dir, "meta.json")) as f:
+                meta = json.load(f)
+            self._vocab = meta["vocab"]
+            self._doc_keys = meta["doc_keys"]
+            self._doc_groups = meta["doc_groups"]
+            for name in self.ARRAYS:
+                setattr(self, f"_{name}", np.load(os.path.join(generation_dir, f"{name}.npy"), mmap_mode="r"))
+        self._key_to_doc = {key: doc for doc, key in enumerate(self._doc_keys)}
+        self._group_docs: Dict[str, List[int]] = {}
+        for doc, group in enumerate(self._doc_groups):
+            self._group_docs.setdefault(group, []).append(doc)
+        self._delta: Dict[int, Tuple[List[int], List[int]]] = {}
+        self._delta_lengths: List[int] = []
+        self._deleted = np.zeros(len(self._doc_keys), dtype=bool)
+        self._dirty = False
+        self._refresh_stats()
+        self._loaded = True
+
+    def _refresh_stats(self):
+        lengths = self._all_lengths()
+        alive = ~self._deleted
+        self._num_docs = int(alive.sum())
+        self._avgdl = float(lengths[alive].mean()) if self._num_docs else 0.0
+        self._avgdl = self._avgdl or 1.0
+
+    def _all_lengths(self) -> np.ndarray:
+        if not self._delta_lengths:
+            return np.asarray(self._doc_lengths)
+        return np.concatenate([self._doc_lengths, np.asarray(self._delta_lengths, dtype=np.int32)])
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return self._num_docs
+
+    def groups(self) -> List[str]:
+        self._ensure_loaded()
+        return list(self._group_docs)
+
+    def add_documents(self, documents: Sequence[Tuple[str, str, str]]):
+        """Add (key, group, text) documents; keys already indexed are skipped"""
+        self._ensure_loaded()
+        with self._lock:
+            for key, group, text in documents:
+                existing = self._key_to_doc.get(key)
+                if existing is not None and not self._deleted[existing]:
+                    continue
+                doc = len(self._doc_keys)
+                self._doc_keys.append(key)
+                self._doc_groups.append(group)
+                self._key_to_doc[key] = doc
+                self._group_docs.setdefault(group, []).append(doc)
+                tokens = tokenize(text)
+                self._delta_lengths.append(len(tokens))
+                for term, tf in Counter(tokens).items():
+                    term_id = self._vocab.setdefault(term, len(self._vocab))
+                    docs, tfs = self._delta.setdefault(term_id, ([], []))
+                    docs.append(doc)
+                    tfs.append(tf)
+            grown = np.zeros(len(self._doc_keys) - len(self._deleted), dtype=bool)
+            self._deleted = np.concatenate([self._deleted, grown])
+            self._dirty = True
+            self._refresh_stats()
+
+    def delete_group(self, group: str):
+        """Tombstone every document of a group (e.g. all chunks of one article)"""
+        self._ensure_loaded()
+        with self._lock:
+            for doc in self._group_docs.pop(group, []):
+                self._deleted[doc] = True
+                if self._key_to_doc.get(self._doc_keys[doc]) == doc:
+                    del self._key_to_doc[self._doc_keys[doc]]
+            self._dirty = True
+            self._refresh_stats()
+
+    def replace_group(self, group: str, documents: Sequence[Tuple[str, str]]):
+        """Re-index a group from (key, text) pairs, dropping documents that no longer exist.
+
+        Keys are content hashes, so documents whose key is already indexed are
+        left untouched and only new or removed chunks cost any work.
+        """
+        self._ensure_loaded()
+        new_keys = {key for key, _ in documents}
+        with self._lock:
+            kept = []
+            for doc in self._group_docs.get(group, []):
+                key = self._doc_keys[doc]
+                if key in new_keys:
+                    kept.append(doc)
+                else:
+                    self._deleted[doc] = True
+                    if self._key_to_doc.get(key) == doc:
+                        del self._key_to_doc[key]
+            self._group_docs[group] = kept
+            self._dirty = True
+        self.add_documents([(key, group, text) for key, text in documents])
+
+    def _postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        docs = np.empty(0, dtype=np.int32)
+        tfs = np.empty(0, dtype=np.int32)
+        if term_id + 1 < len(self._offsets):
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            docs, tfs = self._postings_docs[start:end], self._postings_tfs[start:end]
+        if term_id in self._delta:
+            # Delta docs are numbered after the base segment, so the result stays sorted
+            delta_docs, delta_tfs = self._delta[term_id]
+            docs = np.concatenate([docs, np.asarray(delta_docs, dtype=np.int32)])
+            tfs = np.concatenate([tfs, np.asarray(delta_tfs, dtype=np.int32)])
+        if self._deleted.any():
+            alive = ~self._deleted[docs]
+            docs, tfs = docs[alive], tfs[alive]
+        return docs, tfs
+
+    def _idf(self, df: int) -> float:
+        return math.log(1 + (self._num_docs - df + 0.5) / (df + 0.5))
+
+    def score(self, query: str, candidates: Sequence[Tuple[str, Optional[str]]]) -> np.ndarray:
+        """BM25 scores of (key, text) candidates against the corpus statistics.
+
+        Indexed candidates are scored from the postings; a candidate missing
+        from the index falls back to term frequencies computed from its text.
+        """
+        self._ensure_loaded()
+        # The lock keeps a concurrent reload from swapping arrays mid-query
+        with self._lock:
+            return self._score(query, candidates)
+
+    def _score(self, query: str, candidates: Sequence[Tuple[str, Optional[str]]]) -> np.ndarray:
+        scores = np.zeros(len(candidates), dtype=np.float64)
+        if not self._num_docs:
+            return scores
+
+        lengths = self._all_lengths()
+        indexed = [(i, self._key_to_doc[key]) for i, (key, _) in enumerate(candidates) if key in self._key_to_doc]
+        rows = np.asarray([i for i, _ in indexed], dtype=np.int64)
+        doc_ids = np.asarray([doc for _, doc in indexed], dtype=np.int32)
+        order = np.argsort(doc_ids)
+        rows, doc_ids = rows[order], doc_ids[order]
+
+        unindexed = [(i, Counter(tokenize(text or ""))) for i, (key, text) in enumerate(candidates)
+                     if key not in self._key_to_doc]
+
+        for term, qtf in Counter(tokenize(query)).items():
+            term_id = self._vocab.get(term)
+            if term_id is None:
+                continue
+            docs, tfs = self._postings(term_id)
+            if not len(docs):
+                continue
+            idf = self._idf(len(docs)) * qtf
+
+            if len(doc_ids):
+                pos = np.searchsorted(docs, doc_ids)
+                clipped = np.minimum(pos, len(docs) - 1)
+                tf = np.where(docs[clipped] == doc_ids, tfs[clipped], 0).astype(np.float64)
+                dl = lengths[doc_ids]
+                scores[rows] += idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * dl / self._avgdl))
+
+            for i, counts in unindexed:
+                tf = counts.get(term, 0)
+                dl = sum(counts.values())
+                scores[i] += idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * dl / self._avgdl))
+
+        return scores
+
+    def save(self):
+        """Merge the delta segment and tombstones into a new generation and publish it atomically"""
+        self._ensure_loaded()
+        with self._lock:
+            num_base_terms = len(self._offsets) - 1
+            base_terms = np.repeat(np.arange(num_base_terms, dtype=np.int64), np.diff(self._offsets))
+            delta_terms, delta_docs, delta_tfs = [], [], []
+            for term_id, (docs, tfs) in self._delta.items():
+                delta_terms.extend([term_id] * len(docs))
+                delta_docs.extend(docs)
+                delta_tfs.extend(tfs)
+
+            terms = np.concatenate([base_terms, np.asarray(delta_terms, dtype=np.int64)])
+            docs = np.concatenate([self._postings_docs, np.asarray(delta_docs, dtype=np.int32)])
+            tfs = np.concatenate([self._postings_tfs, np.asarray(delta_tfs, dtype=np.int32)])
+
+            alive = ~self._deleted
+            remap = np.full(len(self._doc_keys), -1, dtype=np.int64)
+            remap[alive] = np.arange(int(alive.sum()))
+            keep = alive[docs]
+            terms, docs, tfs = terms[keep], remap[docs[keep]].astype(np.int32), tfs[keep]
+
+            order = np.lexsort((docs, terms))
+            terms, docs, tfs = terms[order], docs[order], tfs[order]
+            offsets = np.zeros(len(self._vocab) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(terms, minlength=len(self._vocab)), out=offsets[1:])
+
+            arrays = {
+                "offsets": offsets,
+                "postings_docs": docs,
+                "postings_tfs": tfs,
+                "doc_lengths": self._all_lengths()[alive].astype(np.int32),
+            }
+            meta = {
+                "vocab": self._vocab,
+                "doc_keys": [key for key, keep_doc in zip(self._doc_keys, alive) if keep_doc],
+                "doc_groups": [group for group, keep_doc in zip(self._doc_groups, alive) if keep_doc],
+                "k1": self.k1,
+                "b": self.b,
+            }
+
+            generation = self._next_generation()
+            generation_dir = os.path.join(self.index_dir, generation)
+            # Left over by a writer that died before publishing it
+            shutil.rmtree(generation_dir, ignore_errors=True)
+            os.makedirs(generation_dir)
+            for name, array in arrays.items():
+                np.save(os.path.join(generation_dir, f"{name}.npy"), array)
+            with open(os.path.join(generation_dir, "meta.json"), "w") as f:
+                json.dump(meta, f)
+
+            tmp_path = os.path.join(self.index_dir, f"{self.MANIFEST}.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump({"generation": generation}, f)
+            os.replace(tmp_path, os.path.join(self.index_dir, self.MANIFEST))
+            self._remove_old_generations(keep={generation, self._generation})
+
+            self._load()
+
+    def _next_generation(self) -> str:
+        numbers = [int(name.split("-")[1]) for name in os.listdir(self.index_dir)
+                   if re.fullmatch(r"gen-\d+", name)] if os.path.isdir(self.index_dir) else []
+        return f"gen-{max(numbers, default=0) + 1:06d}"
+
+    def _remove_old_generations(self, keep):
+        """Drop all but the new and the previous generation; readers may still be switching off the previous one"""
+        for name in os.listdir(self.index_dir):
+            if re.fullmatch(r"gen-\d+", name) and name not in keep:
+                shutil.rmtree(os.path.join(self.index_dir, name), ignore_errors=True)
@@ -0,0 +1,153 @@
+# llm/rag/metadata_extractor.py
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from qdrant_client.http import models
+
+from llm.odm.mongo_client import get_database
+
+YEAR = r"(?:19|20)\d{2}"
+
+# Alternatives are tried left to right at every position, so the more specific ones come first:
+# DOIs and year ranges before explicit PMIDs, and those before the bare 7-8 digit fallback.
+STRUCTURED_PATTERNS = [
+    r"\b(?P<doi>10\.\d{4,9}/[^\s\"'<>,;]+)",
+    rf"\b(?:between\s+|from\s+)?(?P<year_start>{YEAR})\s*(?:-|–|to|and|until)\s*(?P<year_end>{YEAR})\b",
+    rf"\b(?:since|after|from)\s+(?P<year_since>{YEAR})\b",
+    rf"\b(?:before|until|prior\s+to)\s+(?P<year_before>{YEAR})\b",
+    # A bare "in 2020" is as often about the study ("cohorts in 2020") as the paper, so it needs a publication cue
+    rf"\b(?:published\s+in|(?:in\s+)?(?:the\s+)?year)\s+(?P<year>{YEAR})\b",
+    r"\b(?:pmid|pubmed(?:\s+id)?|article|reference)\s*[:#]?\s*(?P<pmid>\d{1,8})\b",
+    r"\b(?P<bare_pmid>\d{7,8})\b",
+]
+
+# Journal and author names only become filters after one of these cues. Many names are ordinary
+# topic words ("Cancer", "Cell", "Blood"), and matching them anywhere turned topics into hard filters.
+NAME_CUES = {
+    "journal": r"(?:(?:in|from)\s+(?:the\s+)?journal|(?:published|appeared)\s+in|journal)",
+    "author": r"(?:(?:written|authored|published)\s+by|by|authors?)",
+}
+
+
+@dataclass
+class ExtractedMetadata:
+    pmids: List[str] = field(default_factory=list)
+    dois: List[str] = field(default_factory=list)
+    year_from: Optional[int] = None
+    year_to: Optional[int] = None
+    journals: List[str] = field(default_factory=list)
+    authors: List[str] = field(default_factory=list)
+
+    def is_empty(self) -> bool:
+        return not (self.pmids or self.dois or self.journals or self.authors) and \
+            self.year_from is None and self.year_to is None
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    def has_names(self) -> bool:
+        return bool(self.journals or self.authors)
+
+    def to_filter(self, include_names: bool = True) -> Optional[models.Filter]:
+        """Qdrant payload filter: match for single values, match-any for several, range for years
+
+        include_names=False leaves out the journal and author conditions, for
+        retrying a search that came back empty with the names as the index
+        does not spell them.
+        """
+        conditions = []
+        fields = [("pmid", self.pmids), ("doi", self.dois)]
+        if include_names:
+            fields += [("journal", self.journals), ("author_list", self.authors)]
+        for key, values in fields:
+            if len(values) == 1:
+                conditions.append(models.FieldCondition(key=key, match=models.MatchValue(value=values[0])))
+            elif values:
+                conditions.append(models.FieldCondition(key=key, match=models.MatchAny(any=values)))
+        if self.year_from is not None or self.year_to is not None:
+            conditions.append(models.FieldCondition(
+                key="year",
+                range=models.Range(gte=self.year_from, lte=self.year_to)
+            ))
+        if not conditions:
+            return None
+        return models.Filter(must=conditions)
+
+
+class MetadataExtractor:
+    """Single-pass extractor of the metadata a query can be filtered on.
+
+    The structured patterns and the known journal and author names are
+    compiled into one alternation, so a query is scanned once by finditer
+    regardless of how many kinds of metadata it may contain. Names are
+    only picked up after an explicit cue such as "published in" or "by",
+    possibly as a list ("by Smith and Jones"); they are matched
+    case-insensitively and mapped back to their stored spelling, which is
+    what the payload filters compare against.
+    """
+
+    def __init__(self, journals: Iterable[str] = (), authors: Iterable[str] = ()):
+        self._journals = {journal.lower(): journal for journal in journals if journal}
+        self._authors = {author.lower(): author for author in authors if author}
+        self._name_patterns = {}
+        patterns = list(STRUCTURED_PATTERNS)
+        for group, names in (("journal", self._journals), ("author", self._authors)):
+            if names:
+                # Longest names first so "Nature Medicine" wins over "Nature"
+                alternation = "|".join(re.escape(name) for name in sorted(names, key=len, reverse=True))
+                # Lookarounds instead of \b, since names may start or end with punctuation
+                name = rf"(?<!\w)(?:{alternation})(?!\w)"
+                self._name_patterns[group] = re.compile(name, re.IGNORECASE)
+                patterns.append(rf"\b{NAME_CUES[group]}:?\s+(?:the\s+)?"
+                                rf"(?P<{group}>{name}(?:\s*(?:,|and|or|&)\s*{name})*)")
+        self._pattern = re.compile("|".join(patterns), re.IGNORECASE)
+
+    @classmethod
+    def from_database(cls) -> "MetadataExtractor":
+        """Build the name vocabularies from the articles in MongoDB"""
+        journals, authors = set(), set()
+        try:
+            for article in get_database()["articles"].find({}, {"journal": 1, "authors": 1}):
+                if article.get("journal"):
+                    journals.add(article["journal"].strip())
+                for author in (article.get("authors") or "").split(","):
+                    if author.strip():
+                        authors.add(author.strip())
+        except Exception as e:
+            print(f"⚠️  Could not load journal and author names, extracting structured metadata only: {e}")
+        return cls(journals=journals, authors=authors)
+
+    def extract(self, text: str) -> ExtractedMetadata:
+        metadata = ExtractedMetadata()
+        for match in self._pattern.finditer(text):
+            group, value = next((name, value) for name, value in match.groupdict().items() if value is not None
+                                and name != "year_end")
+            if group == "doi":
+                metadata.dois.append(value.rstrip(".)"))
+            elif group in ("pmid", "bare_pmid"):
+                metadata.pmids.append(value)
+            elif group == "year_start":
+                start, end = sorted((int(value), int(match.group("year_end"))))
+                metadata.year_from, metadata.year_to = start, end
+            elif group == "year_since":
+                metadata.year_from = int(value)
+            elif group == "year_before":
+                metadata.year_to = int(value) - 1
+            elif group == "year":
+                metadata.year_from = metadata.year_to = int(value)
+            elif group == "journal":
+                metadata.journals.extend(self._journals[name.group().lower()]
+                                         for name in self._name_patterns[group].finditer(value))
+            elif group == "author":
+                metadata.authors.extend(self._authors[name.group().lower()]
+                                        for name in self._name_patterns[group].finditer(value))
+        for values in (metadata.pmids, metadata.dois, metadata.journals, metadata.authors):
+            values[:] = list(dict.fromkeys(values))
+        return metadata
+
+
+def parse_year(publication_date: Optional[str]) -> Optional[int]:
+    """Publication year of a PubMed date string such as "2021 Mar 15" """
+    match = re.search(rf"\b{YEAR}\b", publication_date or "")
+    return int(match.group()) if match else None
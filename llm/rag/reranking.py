@@ -1,17 +1,21 @@
 # llm/rag/reranking.py 
 #advanced answering
 import logging
+import os
 from typing import List
 from llm.domain.query import Query
 from llm.rag.base import RAGStep
+from llm.rag.bm25_index import BM25Index, chunk_key
 from rank_bm25 import BM25Okapi
 
 #logger = logging.getLogger(__name__)
 
 class Reranker(RAGStep):
-    def __init__(self, mock: bool = False) -> None:
+    def __init__(self, mock: bool = False, bm25_index_dir: str = None) -> None:
         super().__init__(mock=mock)
         self._model = None  
+        # Nothing is read from disk until the first query
+        self._bm25_index = BM25Index(bm25_index_dir or os.getenv("BM25_INDEX_DIR", ".cache/bm25_index"))
     
     def generate(self, query: Query, chunks: List[dict], keep_top_k: int) -> List[dict]:
         if self._mock:
@@ -19,11 +23,20 @@ class Reranker(RAGStep):
             return chunks[:keep_top_k]
         
 
-        tokenized_chunks = [chunk.get("chunk_content", "").lower().split() for chunk in chunks]
+        if self._bm25_index.exists:
+            # Corpus-level IDF from the ingestion-time index instead of the ~9 retrieved candidates
+            candidates = [
+                (chunk_key(chunk.get("pmid", ""), chunk.get("chunk_metadata", {}).get("chunk_id", "")),
+                 chunk.get("chunk_content", ""))
+                for chunk in chunks
+            ]
+            scores = self._bm25_index.score(query.content, candidates)
+        else:
+            tokenized_chunks = [chunk.get("chunk_content", "").lower().split() for chunk in chunks]
 
-        bm25 = BM25Okapi(tokenized_chunks)
-        tokenized_query = query.content.lower().split()
-        scores = bm25.get_scores(tokenized_query)
+            bm25 = BM25Okapi(tokenized_chunks)
+            tokenized_query = query.content.lower().split()
+            scores = bm25.get_scores(tokenized_query)
         scored_chunks = list(zip(scores, chunks))
         scored_chunks.sort(key=lambda x: x[0], reverse=True)
         
@@ -1,67 +1,180 @@
-import concurrent.futures
-from typing import List
+import logging
+import os
+import time
+from typing import List, Optional
+from qdrant_client.http import models
 from llm.domain.query import Query
 from llm.rag.query_expansion import QueryExpansion
 from llm.rag.self_query import SelfQuery
 from llm.rag.reranking import Reranker
 from llm.embedding.service import EmbeddingService
 from llm.vector_store.qdrant_client import QdrantVectorStore
+from llm.vector_store.payload_indexes import ARTICLE_CHUNK_INDEXES
+from llm.vector_store.collection_versions import ARTICLE_CHUNKS_ALIAS
+from llm.rag.sparse import SparseEncoder
+from llm.cache.retrieval_cache import RetrievalCache
+from llm.rag.metadata_extractor import ExtractedMetadata
 
 
 class ContextRetriever:
-    def __init__(self, mock: bool = False) -> None:
+    def __init__(self, mock: bool = False, hybrid: bool = True, use_cache: bool = True) -> None:
         self._query_expander = QueryExpansion(mock=mock)
         self._metadata_extractor = SelfQuery(mock=mock)
         self._reranker = Reranker(mock=mock)
         self._embedding_service = EmbeddingService()
+        # Searches go through the alias, which rebuilds switch to a new collection version atomically
         self._vector_store = QdrantVectorStore()
+        self._versions = self._vector_store.versioned(ARTICLE_CHUNKS_ALIAS)
+        self._live_collection = None
+        self._live_checked_at = None
+        self._live_check_interval = float(os.getenv("COLLECTION_LIVE_CHECK_INTERVAL", "5"))
+        self._stamps = self._vector_store.ingestion_stamps()
+        # Collections loaded before the indexes were declared get them here; a no-op once they exist
+        self._vector_store.ensure_payload_indexes(ARTICLE_CHUNKS_ALIAS, ARTICLE_CHUNK_INDEXES)
+        self.last_timings = {}
+        self._hybrid = hybrid
+        self._sparse_encoder = SparseEncoder()
+        self._cache = RetrievalCache.from_env(version_fn=self.corpus_version) if use_cache else None
+    
+    @property
+    def embedding_service(self) -> EmbeddingService:
+        return self._embedding_service
+    
+    def resolve(self, query: str) -> Query:
+        """Run self-query alone, e.g. to key an answer cache on the resolved filters"""
+        return self._metadata_extractor.generate(Query.from_str(query))
+    
+    @staticmethod
+    def filters(query: Query) -> dict:
+        """Filters resolved from the query, which decide what can be retrieved for it"""
+        return {"pmid": query.pmid, "metadata": query.metadata.get("extracted_metadata")}
     
     def search(self, query: str, k: int = 3, expand_to_n_queries: int = 3) -> List[dict]:
-        query_model = Query.from_str(query)
+        timings = {}
+        start = time.perf_counter()
+        query_model = self.resolve(query)
+        timings["self_query"] = time.perf_counter() - start
         
-        query_model = self._metadata_extractor.generate(query_model)
+        # Metadata extraction is a regex, so the filters can be part of the key without running the rest of the pipeline
+        cache_params = {"k": k, "expand_to_n_queries": expand_to_n_queries, **self.filters(query_model),
+                        "hybrid": self._hybrid}
+        cached_chunks = self._cache_get(query, cache_params)
+        if cached_chunks is not None:
+            self.last_timings = {**timings, "cache_hit": True}
+            return cached_chunks
         
+        start = time.perf_counter()
         expanded_queries = self._query_expander.generate(query_model, expand_to_n_queries)
+        timings["expansion"] = time.perf_counter() - start
         
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            search_tasks = [
-                executor.submit(self._search_single_query, query, k)
-                for query in expanded_queries
-            ]
-            
-            # Collect results
-            all_chunks = []
-            for future in concurrent.futures.as_completed(search_tasks):
-                try:
-                    chunks = future.result()
-                    all_chunks.extend(chunks)
-                except Exception:
-                    pass
+        # Embed every distinct expanded query in one forward pass
+        start = time.perf_counter()
+        unique_queries = list({q.content: q for q in expanded_queries}.values())
+        query_embeddings = self._embedding_service.embed_batch([q.content for q in unique_queries])
+        timings["embedding"] = time.perf_counter() - start
+        
+        # All expanded queries go to Qdrant in a single batched request
+        start = time.perf_counter()
+        all_chunks = self._search_batch(unique_queries, k, query_embeddings)
+        if not all_chunks and self._has_name_filter(query_model):
+            # The index may spell the journal or author differently; better the topic without the name than nothing
+            logging.info("No chunks matched the journal or author filter, searching without it")
+            all_chunks = self._search_batch(unique_queries, k, query_embeddings, include_names=False)
+        timings["search"] = time.perf_counter() - start
         #deduplicate chunks 
         unique_chunks = self._deduplicate_chunks(all_chunks)
         
-        if unique_chunks:
-            ranked_chunks = self._reranker.generate(query_model, unique_chunks, k)
-            return ranked_chunks
-        else:
-            return []
+        start = time.perf_counter()
+        ranked_chunks = self._reranker.generate(query_model, unique_chunks, k) if unique_chunks else []
+        timings["rerank"] = time.perf_counter() - start
+        
+        self.last_timings = timings
+        logging.info("Retrieval stage timings (ms): " +
+                     ", ".join(f"{stage}={seconds * 1000:.1f}" for stage, seconds in timings.items()))
+        self._cache_set(query, ranked_chunks, cache_params)
+        return ranked_chunks
+    
+    def corpus_version(self) -> list:
+        """Changes whenever the indexed chunks do, in every process"""
+        live_collection = self._refresh_live_collection(max_age=0.0)
+        # The ingestion stamp changes on every pipeline write, also when upserts keep the point count
+        return [live_collection, self._vector_store.client.get_collection(ARTICLE_CHUNKS_ALIAS).points_count,
+                self._stamps.stamp(ARTICLE_CHUNKS_ALIAS)]
+    
+    def _refresh_live_collection(self, max_age: float) -> Optional[str]:
+        """Collection the alias serves, re-read when the last check is older than max_age seconds"""
+        now = time.monotonic()
+        if self._live_checked_at is None or now - self._live_checked_at >= max_age:
+            live_collection = self._versions.live()
+            if live_collection != self._live_collection:
+                # A swapped-in version may be quantized differently, so its search params are read again
+                self._vector_store.collection_configs.pop(ARTICLE_CHUNKS_ALIAS, None)
+                self._live_collection = live_collection
+            self._live_checked_at = now
+        return self._live_collection
+    
+    def _cache_get(self, query: str, params: dict) -> Optional[List[dict]]:
+        if self._cache is None:
+            return None
+        try:
+            return self._cache.get(query, **params)
+        except Exception as e:
+            logging.warning(f"Retrieval cache lookup failed: {e}")
+            return None
+    
+    def _cache_set(self, query: str, chunks: List[dict], params: dict):
+        if self._cache is None or not chunks:
+            return
+        try:
+            self._cache.set(query, chunks, **params)
+        except Exception as e:
+            logging.warning(f"Retrieval cache write failed: {e}")
+    
+    @staticmethod
+    def _query_filter(query: Query, include_names: bool = True) -> Optional[models.Filter]:
+        """Payload filter for the metadata extracted from the query, pmid included"""
+        extracted = query.metadata.get("extracted_metadata")
+        return ExtractedMetadata(**extracted).to_filter(include_names) if extracted else None
+    
+    @staticmethod
+    def _has_name_filter(query: Query) -> bool:
+        extracted = query.metadata.get("extracted_metadata")
+        return bool(extracted) and ExtractedMetadata(**extracted).has_names()
     
-    def _search_single_query(self, query: Query, k: int) -> List[dict]:
-        #query embedding 
-        query_embedding = self._embedding_service.embed_text(query.content)
+    def _search_batch(self, queries: List[Query], k: int, query_embeddings: List[List[float]],
+                      include_names: bool = True) -> List[dict]:
+        query_filters = [self._query_filter(query, include_names) for query in queries]
+        # Checked here rather than only through the cache's version, so a swap is seen with the cache disabled too
+        self._refresh_live_collection(max_age=self._live_check_interval)
+        # Filtered searches only rank matching points, so they need less over-fetch to fill k after reranking
+        overfetch = 1 if any(query_filters) else 2
         
-        # Using pmid for filteting if pmid is given in query 
-        pmid_filter = query.pmid
+        results = None
+        if self._hybrid:
+            try:
+                results = self._vector_store.search_batch(
+                    collection_name=ARTICLE_CHUNKS_ALIAS,
+                    query_vectors=query_embeddings,
+                    query_sparse_vectors=[self._sparse_encoder.encode_query(query.content) for query in queries],
+                    limit=k * overfetch,
+                    query_filters=query_filters
+                )
+            except Exception as e:
+                logging.warning(f"Hybrid search failed, falling back to dense search: {e}")
         
-        # Searching in  vector store
-        search_results = self._vector_store.search_similar(
-            collection_name="article_chunks",
-            query_vector=query_embedding,
-            limit=k * 3, 
-            pmid_filter=pmid_filter
-        )
+        if results is None:
+            try:
+                results = self._vector_store.search_batch(
+                    collection_name=ARTICLE_CHUNKS_ALIAS,
+                    query_vectors=query_embeddings,
+                    limit=k * (overfetch + 1),
+                    query_filters=query_filters
+                )
+            except Exception as e:
+                logging.warning(f"Batched search failed: {e}")
+                results = []
         
-        return search_results
+        return [chunk for chunks in results for chunk in chunks]
     
     def _deduplicate_chunks(self, chunks: List[dict]) -> List[dict]:
         seen = set()
@@ -1,8 +1,9 @@
 # llm/rag/self_query.py 
 import logging
-import re
+from typing import Optional
 from llm.domain.query import Query
 from llm.rag.base import RAGStep, PromptTemplateFactory
+from llm.rag.metadata_extractor import MetadataExtractor
 
 #logger = logging.getLogger(__name__)
 
@@ -25,38 +26,26 @@ Query: {question}
 Response:"""
 
 class SelfQuery(RAGStep):
+    _extractor: Optional[MetadataExtractor] = None
+    
     def generate(self, query: Query) -> Query:
-        if self._mock:
-            pmid = self._extract_pmid_with_regex(query.content)
-            if pmid:
-                query.pmid = pmid
-                query.metadata["extracted_pmid"] = pmid
+        # Extraction is a single compiled regex pass, so the prompt template is kept for reference only
+        metadata = self._get_extractor().extract(query.content)
+        if metadata.is_empty():
             return query
-            
-        template = SelfQueryTemplate().create_template()
-        prompt = template.format(question=query.content)
-        pmid = self._extract_pmid_with_regex(query.content)
-        if pmid:
-            query.pmid = pmid
-            query.metadata["extracted_pmid"] = pmid
-            
+        
+        if metadata.pmids:
+            query.pmid = metadata.pmids[0]
+            query.metadata["extracted_pmid"] = query.pmid
+        query.metadata["extracted_metadata"] = metadata.to_dict()
+        
         return query
     
-    def _extract_pmid_with_regex(self, text: str) -> str:
-        """Extract PMID using regex patterns"""
-        patterns = [
-            r"pmid[: ]*(\d+)",
-            r"PMID[: ]*(\d+)",
-            r"pubmed[: ]*(\d+)",
-            r"PubMed[: ]*(\d+)",
-            r"article[: ]*(\d+)",
-            r"reference[: ]*(\d+)",
-            r"(\d{7,8})"  #general pattern for 7-8 digit numbers pmid format 
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                return match.group(1).strip()
-                
-        return None
\ No newline at end of file
+    def _get_extractor(self) -> MetadataExtractor:
+        """Shared extractor, built once from the journal and author names in MongoDB"""
+        if self._mock:
+            # Structured metadata only, without touching the database
+            return MetadataExtractor()
+        if SelfQuery._extractor is None:
+            SelfQuery._extractor = MetadataExtractor.from_database()
+        return SelfQuery._extractor
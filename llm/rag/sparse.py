@@ -0,0 +1,54 @@
+# llm/rag/sparse.py
+import zlib
+from collections import Counter
+from typing import Dict, List, Sequence
+
+from qdrant_client.http import models
+
+from llm.rag.bm25_index import tokenize
+
+SPARSE_VECTOR_NAME = "bm25"
+
+
+def sparse_vectors_config() -> Dict[str, models.SparseVectorParams]:
+    # Qdrant applies the corpus IDF at query time, so stored weights only carry the tf part of BM25
+    return {SPARSE_VECTOR_NAME: models.SparseVectorParams(modifier=models.Modifier.IDF)}
+
+
+def term_index(term: str) -> int:
+    """Vocabulary-free term id, stable across processes and ingestion runs"""
+    return zlib.crc32(term.encode("utf-8")) & 0x7FFFFFFF
+
+
+class SparseEncoder:
+    """BM25-style lexical vectors for Qdrant named sparse vectors.
+
+    Documents get saturated term frequencies normalized by length against a
+    fixed average length; queries get weight 1 per distinct term. Together
+    with the IDF modifier on the collection the dot product is BM25.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, avg_doc_length: float = 150.0):
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_length = avg_doc_length
+
+    def _to_sparse(self, weights: Dict[int, float]) -> models.SparseVector:
+        indices = sorted(weights)
+        return models.SparseVector(indices=indices, values=[weights[i] for i in indices])
+
+    def encode_document(self, text: str) -> models.SparseVector:
+        tokens = tokenize(text)
+        norm = self.k1 * (1 - self.b + self.b * len(tokens) / self.avg_doc_length)
+        weights: Dict[int, float] = {}
+        for term, tf in Counter(tokens).items():
+            index = term_index(term)
+            # Hash collisions are rare enough to simply sum
+            weights[index] = weights.get(index, 0.0) + tf * (self.k1 + 1) / (tf + norm)
+        return self._to_sparse(weights)
+
+    def encode_documents(self, texts: Sequence[str]) -> List[models.SparseVector]:
+        return [self.encode_document(text) for text in texts]
+
+    def encode_query(self, text: str) -> models.SparseVector:
+        return self._to_sparse({term_index(term): 1.0 for term in set(tokenize(text))})
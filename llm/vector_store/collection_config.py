@@ -0,0 +1,193 @@
+# llm/vector_store/collection_config.py
+from dataclasses import dataclass
+from typing import Dict, Optional
+from qdrant_client.http import models
+from llm.rag.sparse import sparse_vectors_config
+
+
+@dataclass(frozen=True)
+class CollectionConfig:
+    """Storage and index layout of a Qdrant collection.
+
+    quantization is one of None, "scalar" (int8), "product" or "binary".
+    Quantized vectors stay in RAM while the original fp32 vectors can live
+    on disk and are only read back for rescoring.
+    """
+    quantization: Optional[str] = None
+    on_disk: bool = False
+    on_disk_payload: bool = False
+    hnsw_m: Optional[int] = None
+    hnsw_ef_construct: Optional[int] = None
+    rescore: bool = True
+    oversampling: Optional[float] = None
+    sparse_vectors: bool = False
+
+    @classmethod
+    def from_collection_info(cls, info: models.CollectionInfo) -> "CollectionConfig":
+        """Layout of an existing collection as Qdrant reports it.
+
+        Oversampling and rescoring are query-time settings that Qdrant does
+        not store, so they come from the preset of the detected quantization.
+        """
+        params = info.config.params
+        vectors = params.vectors.get("") if isinstance(params.vectors, dict) else params.vectors
+        quantization_config = info.config.quantization_config
+        quantization = None
+        if isinstance(quantization_config, models.ScalarQuantization):
+            quantization = "scalar"
+        elif isinstance(quantization_config, models.ProductQuantization):
+            quantization = "product"
+        elif isinstance(quantization_config, models.BinaryQuantization):
+            quantization = "binary"
+        preset = PRESETS.get(quantization or "default", PRESETS["default"])
+        hnsw_config = info.config.hnsw_config
+        return cls(
+            quantization=quantization,
+            on_disk=bool(getattr(vectors, "on_disk", False)),
+            on_disk_payload=bool(params.on_disk_payload),
+            hnsw_m=hnsw_config.m if hnsw_config else None,
+            hnsw_ef_construct=hnsw_config.ef_construct if hnsw_config else None,
+            rescore=preset.rescore,
+            oversampling=preset.oversampling,
+            sparse_vectors=bool(params.sparse_vectors),
+        )
+
+    def vectors_config(self, vector_size: int) -> models.VectorParams:
+        return models.VectorParams(
+            size=vector_size,
+            distance=models.Distance.COSINE,
+            on_disk=self.on_disk
+        )
+
+    def hnsw_config(self) -> Optional[models.HnswConfigDiff]:
+        if self.hnsw_m is None and self.hnsw_ef_construct is None:
+            return None
+        return models.HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct)
+
+    def quantization_config(self) -> Optional[models.QuantizationConfig]:
+        if self.quantization is None:
+            return None
+        if self.quantization == "scalar":
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(
+                    type=models.ScalarType.INT8,
+                    quantile=0.99,
+                    always_ram=True
+                )
+            )
+        if self.quantization == "product":
+            return models.ProductQuantization(
+                product=models.ProductQuantizationConfig(
+                    compression=models.CompressionRatio.X16,
+                    always_ram=True
+                )
+            )
+        if self.quantization == "binary":
+            return models.BinaryQuantization(
+                binary=models.BinaryQuantizationConfig(always_ram=True)
+            )
+        raise ValueError(f"Unsupported quantization: {self.quantization}")
+
+    def create_kwargs(self, vector_size: int) -> Dict:
+        """Keyword arguments for QdrantClient.create_collection"""
+        return {
+            "vectors_config": self.vectors_config(vector_size),
+            "sparse_vectors_config": sparse_vectors_config() if self.sparse_vectors else None,
+            "hnsw_config": self.hnsw_config(),
+            "quantization_config": self.quantization_config(),
+            "on_disk_payload": self.on_disk_payload,
+        }
+
+    def search_params(self, hnsw_ef: Optional[int] = None, exact: bool = False) -> Optional[models.SearchParams]:
+        """Per-query search parameters, including rescoring for quantized collections"""
+        quantization = None
+        if self.quantization is not None:
+            quantization = models.QuantizationSearchParams(
+                rescore=self.rescore,
+                oversampling=self.oversampling
+            )
+        if hnsw_ef is None and not exact and quantization is None:
+            return None
+        return models.SearchParams(hnsw_ef=hnsw_ef, exact=exact, quantization=quantization)
+
+
+PRESETS: Dict[str, CollectionConfig] = {
+    "default": CollectionConfig(),
+    "scalar": CollectionConfig(quantization="scalar", on_disk=True, oversampling=1.5),
+    "product": CollectionConfig(quantization="product", on_disk=True, oversampling=3.0),
+    "binary": CollectionConfig(quantization="binary", on_disk=True, oversampling=3.0),
+}
+
+
+def estimate_ram_bytes(config: CollectionConfig, num_vectors: int, vector_size: int) -> int:
+    """Rough RAM needed for vectors: quantized codes in RAM, fp32 only when not on disk"""
+    fp32 = 0 if config.on_disk else num_vectors * vector_size * 4
+    codes = {
+        None: 0,
+        "scalar": num_vectors * vector_size,
+        "product": num_vectors * vector_size * 4 // 16,
+        "binary": num_vectors * vector_size // 8,
+    }[config.quantization]
+    return fp32 + codes
+
+
+if __name__ == "__main__":
+    # Memory / recall@10 / latency for every preset against a local Qdrant
+    import argparse
+    import time
+    import httpx
+    import numpy as np
+    from qdrant_client import QdrantClient
+
+    parser = argparse.ArgumentParser(description="Benchmark collection presets")
+    parser.add_argument("--host", type=str, default="localhost")
+    parser.add_argument("--port", type=int, default=6333)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--hnsw_ef", type=int, default=None)
+    args = parser.parse_args()
+
+    client = QdrantClient(host=args.host, port=args.port, timeout=120)
+
+    def resident_bytes() -> Optional[int]:
+        """Resident memory of the Qdrant server, from its Prometheus metrics"""
+        try:
+            metrics = httpx.get(f"http://{args.host}:{args.port}/metrics", timeout=10).text
+        except httpx.HTTPError:
+            return None
+        for line in metrics.splitlines():
+            if line.startswith("memory_resident_bytes "):
+                return int(float(line.split()[1]))
+        return None
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.vectors, args.dim)).astype(np.float32)
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    exact_top10 = [set(np.argsort(-normalized @ q)[:10].tolist()) for q in queries]
+
+    for name, preset in PRESETS.items():
+        collection_name = f"preset_benchmark_{name}"
+        if client.collection_exists(collection_name):
+            client.delete_collection(collection_name)
+        rss_before = resident_bytes()
+        client.create_collection(collection_name=collection_name, **preset.create_kwargs(args.dim))
+        client.upload_collection(collection_name, vectors=vectors, ids=range(args.vectors), wait=True)
+
+        latencies, recalls = [], []
+        for q, expected in zip(queries, exact_top10):
+            start = time.perf_counter()
+            hits = client.search(collection_name, query_vector=q, limit=10,
+                                 search_params=preset.search_params(hnsw_ef=args.hnsw_ef))
+            latencies.append(time.perf_counter() - start)
+            recalls.append(len(expected & {hit.id for hit in hits}) / 10)
+
+        # Measured after the queries, so on-disk vectors read back for rescoring are counted too
+        rss_after = resident_bytes()
+        measured = f"{(rss_after - rss_before) / 2**20:8.1f}" if rss_before and rss_after else "     n/a"
+        ram = estimate_ram_bytes(preset, args.vectors, args.dim) / 2**20
+        print(f"{name:8s} server RSS +{measured} MiB (vectors ~{ram:8.1f} MiB)  recall@10 {np.mean(recalls):.3f}  "
+              f"p50 {np.percentile(latencies, 50) * 1000:6.2f} ms  p99 {np.percentile(latencies, 99) * 1000:6.2f} ms")
+        client.delete_collection(collection_name)
@@ -0,0 +1,153 @@
+# llm/vector_store/collection_versions.py
+import json
+import os
+import re
+import time
+from typing import Dict, List, Optional
+from qdrant_client.http import models
+
+# Stable name readers search; during blue/green rebuilds it is an alias of the live article_chunks_v{n}
+ARTICLE_CHUNKS_ALIAS = "article_chunks"
+
+
+class VersionedCollection:
+    """Blue/green versions of a collection behind a stable alias.
+
+    A rebuild writes into a fresh `{alias}_v{n}` collection while searches
+    keep going to the live one through the alias, then switches the alias
+    in a single update_collection_aliases call, which Qdrant applies
+    atomically. Retired versions are deleted once they have been out of
+    service for grace_seconds, so searches that resolved the alias just
+    before a swap can finish. Retirement times are kept in a JSON file;
+    a version with no recorded time counts as retired when first seen.
+    """
+
+    def __init__(self, client, alias: str, grace_seconds: float = 3600.0, state_dir: str = ".cache/collections"):
+        self.client = client
+        self.alias = alias
+        self.grace_seconds = grace_seconds
+        self.state_path = os.path.join(state_dir, f"{alias}_versions.json")
+        self._version_pattern = re.compile(rf"^{re.escape(alias)}_v(\d+)$")
+
+    @classmethod
+    def from_env(cls, client, alias: str) -> "VersionedCollection":
+        """Build from COLLECTION_* environment variables"""
+        return cls(
+            client,
+            alias,
+            grace_seconds=float(os.getenv("COLLECTION_GC_GRACE_SECONDS", "3600")),
+            state_dir=os.getenv("COLLECTION_VERSIONS_DIR", ".cache/collections")
+        )
+
+    def versions(self) -> List[str]:
+        """Names of all versions, oldest first"""
+        names = [collection.name for collection in self.client.get_collections().collections]
+        versions = [(int(match.group(1)), name) for name in names
+                    for match in [self._version_pattern.match(name)] if match]
+        return [name for _, name in sorted(versions)]
+
+    def version_number(self, collection_name: str) -> int:
+        match = self._version_pattern.match(collection_name)
+        return int(match.group(1)) if match else 0
+
+    def live(self) -> Optional[str]:
+        """Collection the alias points to, None when the alias does not exist"""
+        for alias in self.client.get_aliases().aliases:
+            if alias.alias_name == self.alias:
+                return alias.collection_name
+        return None
+
+    def next_name(self) -> str:
+        versions = self.versions()
+        return f"{self.alias}_v{self.version_number(versions[-1]) + 1 if versions else 1}"
+
+    def wait_until_indexed(self, collection_name: str, timeout: float = 600.0, poll_interval: float = 1.0) -> bool:
+        """Block until Qdrant has finished optimizing the collection, so it serves at full speed once live"""
+        deadline = time.monotonic() + timeout
+        while True:
+            info = self.client.get_collection(collection_name)
+            if info.status == models.CollectionStatus.GREEN:
+                return True
+            if info.status == models.CollectionStatus.GREY:
+                # Pending optimizations only start on the next update; an empty one triggers them
+                self.client.update_collection(collection_name, optimizers_config=models.OptimizersConfigDiff())
+            if time.monotonic() >= deadline:
+                print(f"⚠️  {collection_name} still {info.status.value} after {timeout:.0f}s, switching anyway")
+                return False
+            time.sleep(poll_interval)
+
+    def swap(self, collection_name: str) -> Optional[str]:
+        """Point the alias at collection_name and return the collection it pointed to before"""
+        previous = self.live()
+        operations = []
+        if previous is not None:
+            operations.append(models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=self.alias)))
+        elif self.client.collection_exists(self.alias):
+            # One-time migration: a plain collection holds the alias name, and an alias cannot shadow it
+            print(f"⚠️  Replacing the unversioned {self.alias} collection with an alias, "
+                  f"searches fail until the alias is created")
+            self.client.delete_collection(self.alias)
+        operations.append(models.CreateAliasOperation(
+            create_alias=models.CreateAlias(collection_name=collection_name, alias_name=self.alias)
+        ))
+        self.client.update_collection_aliases(change_aliases_operations=operations)
+        if previous is not None and previous != collection_name:
+            self._mark_retired([previous])
+        print(f"🔀 {self.alias} now serves {collection_name}" + (f" (was {previous})" if previous else ""))
+        return previous
+
+    def collect_garbage(self, grace_seconds: Optional[float] = None) -> List[str]:
+        """Delete versions older than the live one that have been retired for longer than the grace period.
+
+        Versions newer than the live one may be a rebuild in progress and are
+        never deleted here.
+        """
+        grace_seconds = self.grace_seconds if grace_seconds is None else grace_seconds
+        live = self.live()
+        if live is None:
+            return []
+        # Another alias may still point to an old version, e.g. one pinned for an evaluation
+        aliased = {alias.collection_name for alias in self.client.get_aliases().aliases}
+        retired = [name for name in self.versions()
+                   if self.version_number(name) < self.version_number(live) and name not in aliased]
+        retired_at = self._mark_retired(retired)
+
+        now = time.time()
+        deleted = []
+        for name in retired:
+            if now - retired_at[name] >= grace_seconds:
+                self.client.delete_collection(name)
+                deleted.append(name)
+        if deleted:
+            print(f"🗑️ Deleted retired versions of {self.alias}: {', '.join(deleted)}")
+            self._save_state({name: at for name, at in retired_at.items() if name not in deleted})
+        return deleted
+
+    def _mark_retired(self, collection_names: List[str]) -> Dict[str, float]:
+        """Record the retirement time of the given versions unless already known, and return all known times"""
+        retired_at = self._load_state()
+        now = time.time()
+        missing = [name for name in collection_names if name not in retired_at]
+        if missing:
+            retired_at.update((name, now) for name in missing)
+            self._save_state(retired_at)
+        return retired_at
+
+    def _load_state(self) -> Dict[str, float]:
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path) as f:
+                return json.load(f).get("retired_at", {})
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Ignoring unreadable collection version state {self.state_path}: {e}")
+            return {}
+
+    def _save_state(self, retired_at: Dict[str, float]):
+        if os.path.dirname(self.state_path):
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        # Write then rename, so an interrupted write never leaves a corrupt state file
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"alias": self.alias, "retired_at": retired_at}, f)
+        os.replace(tmp_path, self.state_path)
@@ -0,0 +1,770 @@
+# llm/vector_store/embedded.py
+import asyncio
+import json
+import math
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import portalocker
+from httpx import Headers
+from qdrant_client.http import models
+from qdrant_client.http.exceptions import UnexpectedResponse
+from qdrant_client.hybrid.fusion import distribution_based_score_fusion, reciprocal_rank_fusion
+
+PointId = Union[int, str]
+
+KEYWORD_TYPES = ("keyword", "tenant")
+
+
+def _not_found(collection_name: str) -> UnexpectedResponse:
+    # Same error as the Qdrant server, so callers handling a missing collection work with both backends
+    return UnexpectedResponse(
+        status_code=404,
+        reason_phrase="Not Found",
+        content=f"Collection `{collection_name}` doesn't exist!".encode(),
+        headers=Headers()
+    )
+
+
+def _normalize_id(point_id: Any) -> PointId:
+    if isinstance(point_id, int):
+        return point_id
+    return str(uuid.UUID(str(point_id)))
+
+
+def _to_sparse(vector: Any) -> Dict[int, float]:
+    if isinstance(vector, dict):
+        vector = models.SparseVector(**vector)
+    return dict(zip(vector.indices, vector.values))
+
+
+def _payload_values(payload: Dict, key: str) -> List[Any]:
+    """Values of a (dotted) payload key, flattening lists the way Qdrant matches them"""
+    values = [payload]
+    for part in key.split("."):
+        values = [value.get(part) for value in values if isinstance(value, dict)]
+        values = [item for value in values for item in (value if isinstance(value, list) else [value])]
+    return [value for value in values if value is not None]
+
+
+def _condition_matches(payload: Dict, condition: models.FieldCondition) -> bool:
+    values = _payload_values(payload, condition.key)
+    if condition.match is not None:
+        match = condition.match
+        if isinstance(match, models.MatchValue):
+            return match.value in values
+        if isinstance(match, models.MatchAny):
+            return any(value in match.any for value in values)
+        if isinstance(match, models.MatchExcept):
+            return not any(value in match.except_ for value in values)
+        raise ValueError(f"Unsupported match in the embedded vector backend: {type(match).__name__}")
+    if condition.range is not None:
+        bounds = condition.range
+        return any(
+            isinstance(value, (int, float))
+            and (bounds.gt is None or value > bounds.gt) and (bounds.gte is None or value >= bounds.gte)
+            and (bounds.lt is None or value < bounds.lt) and (bounds.lte is None or value <= bounds.lte)
+            for value in values
+        )
+    raise ValueError(f"Unsupported condition on '{condition.key}' in the embedded vector backend")
+
+
+class EmbeddedCollection:
+    """One collection of the embedded backend.
+
+    Dense vectors live in a float32 matrix (memory-mapped from vectors.f32
+    when the collection is persisted) that is searched exhaustively, so
+    results are exact. Payloads and sparse vectors are kept in memory and
+    written through to a SQLite file next to it. Keyword payload indexes are
+    inverted indexes from value to slots, so filters on them don't scan the
+    payloads.
+    """
+
+    def __init__(self, directory: Optional[str], meta: Dict):
+        self.directory = directory
+        self.meta = meta
+        self.dim: Optional[int] = meta.get("size")
+        self.distance: Optional[str] = meta.get("distance")
+        self._lock = threading.RLock()
+
+        self._capacity = 0
+        self._matrix: Optional[np.ndarray] = None
+        self._live = np.zeros(0, dtype=bool)
+        self._ids: List[Optional[PointId]] = []
+        self._payloads: List[Optional[Dict]] = []
+        self._sparse: List[Optional[Dict[str, Dict[int, float]]]] = []
+        self._slots: Dict[PointId, int] = {}
+        self._free: List[int] = []
+        self._document_frequencies: Dict[str, Counter] = {name: Counter() for name in meta.get("sparse", {})}
+        self._keyword_indexes: Dict[str, Dict[Any, set]] = {}
+
+        if directory is None:
+            self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        else:
+            os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(os.path.join(directory, "points.sqlite"), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS points "
+                "(slot INTEGER PRIMARY KEY, point_id TEXT NOT NULL, payload TEXT NOT NULL, sparse TEXT)"
+            )
+        self._load()
+
+    # ---- storage -------------------------------------------------------------
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.directory, "vectors.f32")
+
+    def _save_meta(self):
+        if self.directory is not None:
+            with open(os.path.join(self.directory, "meta.json"), "w") as f:
+                json.dump(self.meta, f)
+
+    def _load(self):
+        rows = self._conn.execute("SELECT slot, point_id, payload, sparse FROM points ORDER BY slot").fetchall()
+        self._reserve(max([slot + 1 for slot, *_ in rows] + [self.meta.get("capacity", 0)]))
+        for slot, point_id, payload, sparse in rows:
+            sparse = {name: {int(i): v for i, v in vector.items()} for name, vector in json.loads(sparse).items()} \
+                if sparse else None
+            self._place(slot, json.loads(point_id), json.loads(payload), sparse)
+        self._free = [slot for slot in range(self._capacity - 1, -1, -1) if not self._live[slot]]
+        for field_name, schema in self.meta.get("payload_schema", {}).items():
+            if schema["type"] in KEYWORD_TYPES:
+                self._build_keyword_index(field_name)
+
+    def _reserve(self, needed: int):
+        """Grow every per-slot array (and the vectors file) to hold at least `needed` slots"""
+        if needed <= self._capacity:
+            return
+        capacity = max(needed, 2 * self._capacity, 1024)
+        if self.dim:
+            if self.directory is None:
+                matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+                if self._matrix is not None:
+                    matrix[:self._capacity] = self._matrix
+            else:
+                if self._matrix is not None:
+                    self._matrix.flush()
+                    del self._matrix
+                with open(self._vectors_path, "ab") as f:
+                    f.truncate(capacity * self.dim * 4)
+                matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+            self._matrix = matrix
+        extra = capacity - self._capacity
+        self._live = np.concatenate([self._live, np.zeros(extra, dtype=bool)])
+        self._ids.extend([None] * extra)
+        self._payloads.extend([None] * extra)
+        self._sparse.extend([None] * extra)
+        self._free = list(range(capacity - 1, self._capacity - 1, -1)) + self._free
+        self._capacity = capacity
+        self.meta["capacity"] = capacity
+        self._save_meta()
+
+    def _place(self, slot: int, point_id: PointId, payload: Dict, sparse: Optional[Dict[str, Dict[int, float]]]):
+        self._live[slot] = True
+        self._ids[slot] = point_id
+        self._payloads[slot] = payload
+        self._sparse[slot] = sparse
+        self._slots[point_id] = slot
+        for name, vector in (sparse or {}).items():
+            self._document_frequencies.setdefault(name, Counter()).update(vector.keys())
+        for field_name, index in self._keyword_indexes.items():
+            for value in _payload_values(payload, field_name):
+                index.setdefault(value, set()).add(slot)
+
+    def _clear_slot(self, slot: int):
+        for name, vector in (self._sparse[slot] or {}).items():
+            self._document_frequencies[name].subtract(vector.keys())
+        for field_name, index in self._keyword_indexes.items():
+            for value in _payload_values(self._payloads[slot], field_name):
+                index.get(value, set()).discard(slot)
+        del self._slots[self._ids[slot]]
+        self._live[slot] = False
+        self._ids[slot] = self._payloads[slot] = self._sparse[slot] = None
+
+    def _build_keyword_index(self, field_name: str):
+        index: Dict[Any, set] = {}
+        for slot in np.flatnonzero(self._live):
+            for value in _payload_values(self._payloads[slot], field_name):
+                index.setdefault(value, set()).add(int(slot))
+        self._keyword_indexes[field_name] = index
+
+    # ---- writes --------------------------------------------------------------
+
+    def _split_vector(self, vector: Any) -> Tuple[Optional[np.ndarray], Optional[Dict[str, Dict[int, float]]]]:
+        if isinstance(vector, dict):
+            dense = vector.get("")
+            sparse = {name: _to_sparse(value) for name, value in vector.items() if name != ""}
+            unknown = set(sparse) - set(self.meta.get("sparse", {}))
+            if unknown:
+                raise ValueError(f"Unsupported named vectors in the embedded vector backend: {sorted(unknown)}")
+        else:
+            dense, sparse = vector, None
+        if dense is None or (not isinstance(dense, np.ndarray) and len(dense) == 0):
+            return None, sparse or None
+        dense = np.asarray(dense, dtype=np.float32)
+        if self.distance == models.Distance.COSINE.value:
+            # Stored normalized, like Qdrant does, so search is a plain dot product
+            dense = dense / max(float(np.linalg.norm(dense)), 1e-12)
+        return dense, sparse or None
+
+    def upsert(self, points: Sequence[models.PointStruct]):
+        with self._lock:
+            rows = []
+            for point in points:
+                point_id = _normalize_id(point.id)
+                dense, sparse = self._split_vector(point.vector)
+                if point_id in self._slots:
+                    slot = self._slots[point_id]
+                    self._clear_slot(slot)
+                else:
+                    if not self._free:
+                        self._reserve(self._capacity + 1)
+                    slot = self._free.pop()
+                if dense is not None:
+                    self._matrix[slot] = dense
+                payload = point.payload or {}
+                self._place(slot, point_id, payload, sparse)
+                rows.append((slot, json.dumps(point_id), json.dumps(payload, default=str),
+                             json.dumps(sparse) if sparse else None))
+            if self._matrix is not None and self.directory is not None:
+                self._matrix.flush()
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO points (slot, point_id, payload, sparse) VALUES (?, ?, ?, ?)", rows
+                )
+
+    def delete(self, slots: Iterable[int]):
+        with self._lock:
+            slots = [int(slot) for slot in slots if self._live[slot]]
+            for slot in slots:
+                self._clear_slot(slot)
+            self._free.extend(slots)
+            with self._conn:
+                self._conn.executemany("DELETE FROM points WHERE slot = ?", [(slot,) for slot in slots])
+
+    def set_payload_index(self, field_name: str, schema: Optional[Dict]):
+        with self._lock:
+            payload_schema = self.meta.setdefault("payload_schema", {})
+            self._keyword_indexes.pop(field_name, None)
+            if schema is None:
+                payload_schema.pop(field_name, None)
+            else:
+                payload_schema[field_name] = schema
+                if schema["type"] in KEYWORD_TYPES:
+                    self._build_keyword_index(field_name)
+            self._save_meta()
+
+    # ---- reads ---------------------------------------------------------------
+
+    def slots_of(self, point_ids: Iterable[Any]) -> List[int]:
+        slots = (self._slots.get(_normalize_id(point_id)) for point_id in point_ids)
+        return [slot for slot in slots if slot is not None]
+
+    def filter_mask(self, query_filter: Optional[models.Filter]) -> np.ndarray:
+        if query_filter is None:
+            return self._live.copy()
+        return self._live & self._filter_mask(query_filter)
+
+    def _filter_mask(self, query_filter: models.Filter) -> np.ndarray:
+        def as_list(conditions):
+            if conditions is None:
+                return []
+            return conditions if isinstance(conditions, list) else [conditions]
+
+        mask = np.ones(self._capacity, dtype=bool)
+        for condition in as_list(query_filter.must):
+            mask &= self._condition_mask(condition)
+        should = as_list(query_filter.should)
+        if should:
+            any_mask = np.zeros(self._capacity, dtype=bool)
+            for condition in should:
+                any_mask |= self._condition_mask(condition)
+            mask &= any_mask
+        for condition in as_list(query_filter.must_not):
+            mask &= ~self._condition_mask(condition)
+        return mask
+
+    def _condition_mask(self, condition: Any) -> np.ndarray:
+        mask = np.zeros(self._capacity, dtype=bool)
+        if isinstance(condition, models.Filter):
+            return self._filter_mask(condition)
+        if isinstance(condition, models.HasIdCondition):
+            mask[self.slots_of(condition.has_id)] = True
+            return mask
+        if not isinstance(condition, models.FieldCondition):
+            raise ValueError(f"Unsupported condition in the embedded vector backend: {type(condition).__name__}")
+        index = self._keyword_indexes.get(condition.key)
+        if index is not None and isinstance(condition.match, (models.MatchValue, models.MatchAny)):
+            values = [condition.match.value] if isinstance(condition.match, models.MatchValue) else condition.match.any
+            slots = set().union(*(index.get(value, set()) for value in values))
+            mask[list(slots)] = True
+            return mask
+        for slot in np.flatnonzero(self._live):
+            mask[slot] = _condition_matches(self._payloads[slot], condition)
+        return mask
+
+    def dense_scores(self, query_vector: Sequence[float], slots: np.ndarray) -> np.ndarray:
+        if self._matrix is None:
+            raise ValueError("The collection has no dense vectors")
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        if self.distance == models.Distance.COSINE.value:
+            query_vector = query_vector / max(float(np.linalg.norm(query_vector)), 1e-12)
+        return self._matrix[slots] @ query_vector
+
+    def sparse_scores(self, name: str, query_vector: Any, slots: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Dot products with the stored sparse vectors, IDF-weighted when the collection uses the modifier"""
+        query = _to_sparse(query_vector)
+        if self.meta.get("sparse", {}).get(name, {}).get("idf"):
+            num_points = sum(1 for slot in np.flatnonzero(self._live) if name in (self._sparse[slot] or {}))
+            frequencies = self._document_frequencies.get(name, Counter())
+            query = {
+                i: value * math.log((num_points - frequencies[i] + 0.5) / (frequencies[i] + 0.5) + 1)
+                for i, value in query.items()
+            }
+        scores, matched = [], []
+        for slot in slots:
+            vector = (self._sparse[slot] or {}).get(name)
+            if not vector:
+                continue
+            common = query.keys() & vector.keys()
+            # Like Qdrant, points sharing no term with the query are not results
+            if common:
+                scores.append(sum(query[i] * vector[i] for i in common))
+                matched.append(slot)
+        return np.asarray(scores, dtype=np.float32), np.asarray(matched, dtype=np.int64)
+
+    def record(self, slot: int, score: Optional[float] = None, with_payload: Any = True,
+               with_vectors: Any = False) -> Union[models.ScoredPoint, models.Record]:
+        payload = self._payloads[slot] if with_payload else None
+        if isinstance(with_payload, list):
+            payload = {key: value for key, value in self._payloads[slot].items() if key in with_payload}
+        vector = None
+        if with_vectors:
+            dense = self._matrix[slot].tolist() if self._matrix is not None else None
+            sparse = self._sparse[slot]
+            if sparse:
+                vector = {name: models.SparseVector(indices=list(values), values=list(values.values()))
+                          for name, values in sparse.items()}
+                if dense is not None:
+                    vector[""] = dense
+            else:
+                vector = dense
+        if score is None:
+            return models.Record(id=self._ids[slot], payload=payload, vector=vector)
+        return models.ScoredPoint(id=self._ids[slot], version=0, score=float(score), payload=payload, vector=vector)
+
+    def count(self) -> int:
+        return int(self._live.sum())
+
+    def close(self):
+        with self._lock:
+            if self._matrix is not None and self.directory is not None:
+                self._matrix.flush()
+            self._matrix = None
+            self._conn.close()
+
+
+class EmbeddedVectorClient:
+    """In-process stand-in for QdrantClient, for edge deployments and CI.
+
+    Implements the subset of the QdrantClient API this repository uses
+    (collections, upserts, search, query with prefetch and fusion, scroll,
+    retrieve, count, delete and payload indexes) over EmbeddedCollection, so
+    QdrantVectorStore and VectorBaseDocument run on it unchanged. Collections
+    persist under `path`, one directory each, and collection aliases in
+    aliases.json; with no path they only live in memory.
+
+    The collections are read from disk once and then only follow this
+    client's own writes, so a directory is opened by one client at a time:
+    the client holds an exclusive lock on it until close(), and a second
+    client, in this or another process, fails right away instead of
+    silently diverging. Processes that need to share vectors, e.g. the
+    feature pipeline next to a running server, need a Qdrant server.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.RLock()
+        self._collections: Dict[str, EmbeddedCollection] = {}
+        self._aliases: Dict[str, str] = {}
+        self._directory_lock: Optional[portalocker.Lock] = None
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            self._directory_lock = portalocker.Lock(os.path.join(path, ".lock"), mode="a", timeout=0,
+                                                    fail_when_locked=True)
+            try:
+                self._directory_lock.acquire()
+            except portalocker.LockException as e:
+                raise RuntimeError(f"The embedded vector index at {path} is already open in another client or "
+                                   f"process; close it first, or use a Qdrant server to share the index") from e
+            for name in sorted(os.listdir(path)):
+                meta_path = os.path.join(path, name, "meta.json")
+                if os.path.exists(meta_path):
+                    with open(meta_path) as f:
+                        self._collections[name] = EmbeddedCollection(os.path.join(path, name), json.load(f))
+            aliases_path = os.path.join(path, "aliases.json")
+            if os.path.exists(aliases_path):
+                with open(aliases_path) as f:
+                    self._aliases = {alias: name for alias, name in json.load(f).items() if name in self._collections}
+
+    def _collection(self, collection_name: str) -> EmbeddedCollection:
+        # Like Qdrant, every point and search operation accepts an alias in place of the collection name
+        collection = self._collections.get(self._aliases.get(collection_name, collection_name))
+        if collection is None:
+            raise _not_found(collection_name)
+        return collection
+
+    def _save_aliases(self):
+        if self.path is None:
+            return
+        aliases_path = os.path.join(self.path, "aliases.json")
+        with open(f"{aliases_path}.tmp", "w") as f:
+            json.dump(self._aliases, f)
+        os.replace(f"{aliases_path}.tmp", aliases_path)
+
+    # ---- collections ---------------------------------------------------------
+
+    def collection_exists(self, collection_name: str, **kwargs) -> bool:
+        return self._aliases.get(collection_name, collection_name) in self._collections
+
+    def create_collection(self, collection_name: str, vectors_config: Any = None,
+                          sparse_vectors_config: Optional[Dict[str, models.SparseVectorParams]] = None,
+                          **kwargs) -> bool:
+        """HNSW, quantization and on-disk options are accepted and ignored: search here is always exact"""
+        if isinstance(vectors_config, dict):
+            unnamed = vectors_config.get("")
+            if set(vectors_config) - {""}:
+                raise ValueError("The embedded vector backend supports only the unnamed dense vector")
+            vectors_config = unnamed
+        meta = {
+            "size": vectors_config.size if vectors_config else None,
+            "distance": models.Distance(vectors_config.distance).value if vectors_config else None,
+            "sparse": {
+                name: {"idf": params.modifier == models.Modifier.IDF}
+                for name, params in (sparse_vectors_config or {}).items()
+            },
+            "payload_schema": {},
+        }
+        if meta["distance"] not in (None, models.Distance.COSINE.value, models.Distance.DOT.value):
+            raise ValueError(f"Unsupported distance in the embedded vector backend: {meta['distance']}")
+        with self._lock:
+            if collection_name in self._collections or collection_name in self._aliases:
+                raise UnexpectedResponse(
+                    status_code=409,
+                    reason_phrase="Conflict",
+                    content=f"Collection `{collection_name}` already exists!".encode(),
+                    headers=Headers()
+                )
+            directory = os.path.join(self.path, collection_name) if self.path is not None else None
+            collection = EmbeddedCollection(directory, meta)
+            collection._save_meta()
+            self._collections[collection_name] = collection
+        return True
+
+    def recreate_collection(self, collection_name: str, **kwargs) -> bool:
+        self.delete_collection(collection_name)
+        return self.create_collection(collection_name, **kwargs)
+
+    def delete_collection(self, collection_name: str, **kwargs) -> bool:
+        with self._lock:
+            collection = self._collections.pop(collection_name, None)
+            if collection is None:
+                return False
+            collection.close()
+            if collection.directory is not None:
+                shutil.rmtree(collection.directory, ignore_errors=True)
+            # Aliases of a deleted collection go with it
+            self._aliases = {alias: name for alias, name in self._aliases.items() if name != collection_name}
+            self._save_aliases()
+        return True
+
+    def get_collections(self) -> models.CollectionsResponse:
+        return models.CollectionsResponse(
+            collections=[models.CollectionDescription(name=name) for name in self._collections]
+        )
+
+    def update_collection_aliases(self, change_aliases_operations: Sequence[Any], **kwargs) -> bool:
+        """Apply all alias operations at once: readers see the aliases either before or after the whole batch"""
+        with self._lock:
+            aliases = dict(self._aliases)
+            for operation in change_aliases_operations:
+                if isinstance(operation, models.DeleteAliasOperation):
+                    aliases.pop(operation.delete_alias.alias_name, None)
+                elif isinstance(operation, models.RenameAliasOperation):
+                    rename = operation.rename_alias
+                    if rename.old_alias_name not in aliases:
+                        raise _not_found(rename.old_alias_name)
+                    aliases[rename.new_alias_name] = aliases.pop(rename.old_alias_name)
+                elif isinstance(operation, models.CreateAliasOperation):
+                    create = operation.create_alias
+                    if create.collection_name not in self._collections:
+                        raise _not_found(create.collection_name)
+                    if create.alias_name in self._collections:
+                        raise ValueError(f"Alias {create.alias_name} would shadow the collection of the same name")
+                    aliases[create.alias_name] = create.collection_name
+                else:
+                    raise ValueError(f"Unsupported alias operation: {type(operation).__name__}")
+            self._aliases = aliases
+            self._save_aliases()
+        return True
+
+    def get_aliases(self, **kwargs) -> models.CollectionsAliasesResponse:
+        return models.CollectionsAliasesResponse(aliases=[
+            models.AliasDescription(alias_name=alias, collection_name=name) for alias, name in self._aliases.items()
+        ])
+
+    def get_collection_aliases(self, collection_name: str, **kwargs) -> models.CollectionsAliasesResponse:
+        return models.CollectionsAliasesResponse(aliases=[
+            models.AliasDescription(alias_name=alias, collection_name=name)
+            for alias, name in self._aliases.items() if name == collection_name
+        ])
+
+    def get_collection(self, collection_name: str) -> models.CollectionInfo:
+        collection = self._collection(collection_name)
+        vectors = models.VectorParams(size=collection.dim, distance=collection.distance) if collection.dim else {}
+        sparse_vectors = {
+            name: models.SparseVectorParams(modifier=models.Modifier.IDF if params["idf"] else None)
+            for name, params in collection.meta.get("sparse", {}).items()
+        } or None
+        payload_schema = {
+            field_name: models.PayloadIndexInfo(
+                data_type=models.PayloadSchemaType.KEYWORD if schema["type"] == "tenant" else schema["type"],
+                params=models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD, is_tenant=True)
+                if schema["type"] == "tenant" else None,
+                points=collection.count()
+            )
+            for field_name, schema in collection.meta.get("payload_schema", {}).items()
+        }
+        return models.CollectionInfo(
+            status=models.CollectionStatus.GREEN,
+            optimizer_status=models.OptimizersStatusOneOf.OK,
+            indexed_vectors_count=collection.count(),
+            points_count=collection.count(),
+            segments_count=1,
+            payload_schema=payload_schema,
+            config=models.CollectionConfig(
+                params=models.CollectionParams(vectors=vectors, sparse_vectors=sparse_vectors),
+                hnsw_config=models.HnswConfig(m=16, ef_construct=100, full_scan_threshold=10000),
+                optimizer_config=models.OptimizersConfig(
+                    deleted_threshold=0.2,
+                    vacuum_min_vector_number=1000,
+                    default_segment_number=0,
+                    flush_interval_sec=5
+                ),
+                wal_config=models.WalConfig(wal_capacity_mb=32, wal_segments_ahead=0),
+                quantization_config=None
+            )
+        )
+
+    def create_payload_index(self, collection_name: str, field_name: str, field_schema: Any = None,
+                             wait: bool = True, **kwargs) -> models.UpdateResult:
+        if isinstance(field_schema, models.KeywordIndexParams):
+            field_type = "tenant" if field_schema.is_tenant else "keyword"
+        else:
+            field_type = models.PayloadSchemaType(field_schema).value
+        self._collection(collection_name).set_payload_index(field_name, {"type": field_type})
+        return models.UpdateResult(operation_id=0, status=models.UpdateStatus.COMPLETED)
+
+    def delete_payload_index(self, collection_name: str, field_name: str, wait: bool = True,
+                             **kwargs) -> models.UpdateResult:
+        self._collection(collection_name).set_payload_index(field_name, None)
+        return models.UpdateResult(operation_id=0, status=models.UpdateStatus.COMPLETED)
+
+    # ---- writes --------------------------------------------------------------
+
+    def upsert(self, collection_name: str, points: Sequence[models.PointStruct], wait: bool = True,
+               **kwargs) -> models.UpdateResult:
+        if isinstance(points, models.Batch):
+            raise ValueError("The embedded vector backend takes a list of PointStruct, not a Batch")
+        self._collection(collection_name).upsert(list(points))
+        return models.UpdateResult(operation_id=0, status=models.UpdateStatus.COMPLETED)
+
+    def upload_points(self, collection_name: str, points: Iterable[models.PointStruct], batch_size: int = 64,
+                      **kwargs):
+        points = list(points)
+        for i in range(0, len(points), batch_size):
+            self.upsert(collection_name, points[i:i + batch_size])
+
+    def upload_collection(self, collection_name: str, vectors: Any, payload: Optional[Iterable[Dict]] = None,
+                          ids: Optional[Iterable[PointId]] = None, batch_size: int = 64, **kwargs):
+        vectors = list(vectors)
+        payload = list(payload) if payload is not None else [None] * len(vectors)
+        ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in vectors]
+        self.upload_points(
+            collection_name,
+            [
+                models.PointStruct(id=point_id, vector=vector.tolist() if isinstance(vector, np.ndarray) else vector,
+                                   payload=point_payload)
+                for point_id, vector, point_payload in zip(ids, vectors, payload)
+            ],
+            batch_size=batch_size
+        )
+
+    def delete(self, collection_name: str, points_selector: Any, wait: bool = True,
+               **kwargs) -> models.UpdateResult:
+        collection = self._collection(collection_name)
+        if isinstance(points_selector, models.FilterSelector):
+            slots = np.flatnonzero(collection.filter_mask(points_selector.filter))
+        elif isinstance(points_selector, models.Filter):
+            slots = np.flatnonzero(collection.filter_mask(points_selector))
+        else:
+            point_ids = points_selector.points if isinstance(points_selector, models.PointIdsList) \
+                else points_selector
+            slots = collection.slots_of(point_ids)
+        collection.delete(slots)
+        return models.UpdateResult(operation_id=0, status=models.UpdateStatus.COMPLETED)
+
+    # ---- reads ---------------------------------------------------------------
+
+    def count(self, collection_name: str, count_filter: Optional[models.Filter] = None,
+              exact: bool = True, **kwargs) -> models.CountResult:
+        collection = self._collection(collection_name)
+        return models.CountResult(count=int(collection.filter_mask(count_filter).sum()))
+
+    def retrieve(self, collection_name: str, ids: Sequence[PointId], with_payload: Any = True,
+                 with_vectors: Any = False, **kwargs) -> List[models.Record]:
+        collection = self._collection(collection_name)
+        with collection._lock:
+            return [collection.record(slot, with_payload=with_payload, with_vectors=with_vectors)
+                    for slot in collection.slots_of(ids)]
+
+    def scroll(self, collection_name: str, scroll_filter: Optional[models.Filter] = None, limit: int = 10,
+               offset: Optional[PointId] = None, with_payload: Any = True, with_vectors: Any = False,
+               **kwargs) -> Tuple[List[models.Record], Optional[PointId]]:
+        """Pages in storage order; the returned offset is the id of the first point of the next page"""
+        collection = self._collection(collection_name)
+        with collection._lock:
+            slots = np.flatnonzero(collection.filter_mask(scroll_filter))
+            if offset is not None:
+                start = collection.slots_of([offset])
+                slots = slots[slots >= start[0]] if start else slots[:0]
+            records = [collection.record(slot, with_payload=with_payload, with_vectors=with_vectors)
+                       for slot in slots[:limit]]
+            next_offset = collection._ids[slots[limit]] if len(slots) > limit else None
+        return records, next_offset
+
+    def search(self, collection_name: str, query_vector: Any, query_filter: Optional[models.Filter] = None,
+               limit: int = 10, offset: int = 0, with_payload: Any = True, with_vectors: Any = False,
+               score_threshold: Optional[float] = None, **kwargs) -> List[models.ScoredPoint]:
+        return self._query(self._collection(collection_name), query_vector, None, None, query_filter, limit + offset,
+                           with_payload, with_vectors, score_threshold)[offset:]
+
+    def query_points(self, collection_name: str, query: Any = None, using: Optional[str] = None,
+                     prefetch: Any = None, query_filter: Optional[models.Filter] = None, limit: int = 10,
+                     offset: Optional[int] = None, with_payload: Any = True, with_vectors: Any = False,
+                     score_threshold: Optional[float] = None, **kwargs) -> models.QueryResponse:
+        offset = offset or 0
+        points = self._query(self._collection(collection_name), query, using, prefetch, query_filter, limit + offset,
+                             with_payload, with_vectors, score_threshold)
+        return models.QueryResponse(points=points[offset:])
+
+    def query_batch_points(self, collection_name: str, requests: Sequence[models.QueryRequest],
+                           **kwargs) -> List[models.QueryResponse]:
+        return [
+            self.query_points(
+                collection_name,
+                query=request.query,
+                using=request.using,
+                prefetch=request.prefetch,
+                query_filter=request.filter,
+                limit=request.limit or 10,
+                offset=request.offset,
+                with_payload=True if request.with_payload is None else request.with_payload,
+                with_vectors=request.with_vector or False,
+                score_threshold=request.score_threshold
+            )
+            for request in requests
+        ]
+
+    def _query(self, collection: EmbeddedCollection, query: Any, using: Optional[str], prefetch: Any,
+               query_filter: Optional[models.Filter], limit: int, with_payload: Any, with_vectors: Any,
+               score_threshold: Optional[float] = None, candidates: Optional[np.ndarray] = None
+               ) -> List[models.ScoredPoint]:
+        with collection._lock:
+            mask = collection.filter_mask(query_filter)
+            if candidates is not None:
+                mask &= candidates
+
+            if prefetch:
+                prefetches = prefetch if isinstance(prefetch, list) else [prefetch]
+                # Like Qdrant, the outer filter also applies to every prefetch
+                responses = [
+                    self._query(collection, p.query, p.using, p.prefetch,
+                                models.Filter(must=[f for f in (query_filter, p.filter) if f is not None]),
+                                p.limit or 10, with_payload, with_vectors, p.score_threshold, candidates)
+                    for p in prefetches
+                ]
+                if isinstance(query, models.FusionQuery):
+                    fuse = reciprocal_rank_fusion if query.fusion == models.Fusion.RRF \
+                        else distribution_based_score_fusion
+                    return fuse(responses, limit=limit)
+                # Any other query rescores the union of the prefetched points
+                prefetched = np.zeros_like(mask)
+                prefetched[collection.slots_of(point.id for response in responses for point in response)] = True
+                mask &= prefetched
+
+            if isinstance(query, models.NearestQuery):
+                query = query.nearest
+            slots = np.flatnonzero(mask)
+            if query is None or not len(slots):
+                return []
+            if isinstance(query, (models.SparseVector, dict)) or (using and using in collection.meta.get("sparse", {})):
+                scores, slots = collection.sparse_scores(using, query, slots)
+            elif using:
+                raise ValueError(f"Unsupported named vector in the embedded vector backend: {using}")
+            else:
+                scores = collection.dense_scores(query, slots)
+
+            if score_threshold is not None:
+                keep = scores >= score_threshold
+                scores, slots = scores[keep], slots[keep]
+            top = np.argsort(-scores, kind="stable")[:limit]
+            return [collection.record(slots[i], scores[i], with_payload, with_vectors) for i in top]
+
+    def close(self):
+        with self._lock:
+            for collection in self._collections.values():
+                collection.close()
+            self._collections = {}
+            self._aliases = {}
+            if self._directory_lock is not None:
+                self._directory_lock.release()
+                self._directory_lock = None
+
+
+class AsyncEmbeddedVectorClient:
+    """Async facade over an EmbeddedVectorClient: every method runs the sync one in a worker thread"""
+
+    def __init__(self, client: EmbeddedVectorClient):
+        self._client = client
+
+    def __getattr__(self, name: str):
+        method = getattr(self._client, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+        return call
+
+
+_clients: Dict[Optional[str], EmbeddedVectorClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_embedded_client(path: Optional[str] = None) -> EmbeddedVectorClient:
+    """Process-wide client per directory, so every store in the process sees the same collections"""
+    key = os.path.abspath(path) if path is not None else None
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = EmbeddedVectorClient(key)
+        return _clients[key]
+
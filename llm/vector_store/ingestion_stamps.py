@@ -0,0 +1,52 @@
+# llm/vector_store/ingestion_stamps.py
+import time
+import uuid
+from typing import Optional
+from qdrant_client.http import models
+from qdrant_client.http.exceptions import UnexpectedResponse
+
+# Small vectorless collection holding one point per stamped collection or alias
+INGESTION_STAMPS_COLLECTION = "ingestion_stamps"
+
+
+class IngestionStamps:
+    """Stamps that change on every write to a collection.
+
+    Writers call bump() once an ingestion has finished writing, and caches
+    put stamp() into their keys. The stamp is stored in Qdrant next to the
+    data, so every process searching the collection sees the new one, even
+    with per-process cache backends and even when upserts replace points
+    without changing the point count.
+    """
+
+    def __init__(self, client, collection_name: str = INGESTION_STAMPS_COLLECTION):
+        self.client = client
+        self.collection_name = collection_name
+
+    @staticmethod
+    def _point_id(name: str) -> str:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"ingestion_stamp:{name}"))
+
+    def stamp(self, name: str) -> Optional[str]:
+        """Current stamp of the collection or alias, None when it was never stamped"""
+        if not self.client.collection_exists(self.collection_name):
+            return None
+        records = self.client.retrieve(self.collection_name, ids=[self._point_id(name)], with_payload=True)
+        return records[0].payload.get("stamp") if records else None
+
+    def bump(self, name: str) -> str:
+        """Give the collection or alias a new stamp and return it"""
+        if not self.client.collection_exists(self.collection_name):
+            try:
+                self.client.create_collection(self.collection_name, vectors_config={})
+            except UnexpectedResponse:
+                # Another writer created it in the meantime
+                if not self.client.collection_exists(self.collection_name):
+                    raise
+        stamp = uuid.uuid4().hex
+        self.client.upsert(self.collection_name, points=[models.PointStruct(
+            id=self._point_id(name),
+            vector={},
+            payload={"collection": name, "stamp": stamp, "written_at": time.time()}
+        )])
+        return stamp
@@ -0,0 +1,113 @@
+# llm/vector_store/payload_indexes.py
+from typing import Dict, List, Union
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+FIELD_TYPES = ("keyword", "integer", "datetime", "tenant")
+
+# Payload fields every filtered search over article chunks can use
+ARTICLE_CHUNK_INDEXES: Dict[str, str] = {
+    "pmid": "keyword",
+    "doi": "keyword",
+    "journal": "keyword",
+    "year": "integer",
+    "author_list": "keyword",
+}
+
+# Every conversation lookup is scoped to one session, so session_id is a tenant key
+CONVERSATION_INDEXES: Dict[str, str] = {
+    "session_id": "tenant",
+    "timestamp": "datetime",
+}
+
+
+def field_schema(field_type: str) -> Union[models.PayloadSchemaType, models.KeywordIndexParams]:
+    """Qdrant index schema of a declared field type"""
+    if field_type == "tenant":
+        # A keyword index whose points Qdrant keeps together on disk, so per-tenant filters read contiguous segments
+        return models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD, is_tenant=True)
+    if field_type in FIELD_TYPES:
+        return models.PayloadSchemaType(field_type)
+    raise ValueError(f"Unsupported payload index type: {field_type}. Choose one of {FIELD_TYPES}")
+
+
+def _matches(index: models.PayloadIndexInfo, field_type: str) -> bool:
+    is_tenant = bool(getattr(index.params, "is_tenant", False))
+    if field_type == "tenant":
+        return index.data_type == models.PayloadSchemaType.KEYWORD and is_tenant
+    return index.data_type == models.PayloadSchemaType(field_type) and not is_tenant
+
+
+def ensure_payload_indexes(client: QdrantClient, collection_name: str, indexes: Dict[str, str],
+                           wait: bool = True) -> List[str]:
+    """Create the declared payload indexes that are missing and rebuild those with another type.
+
+    Indexes that already match are left alone, so this is safe to call on
+    every startup. Returns the fields whose index was created or rebuilt.
+    """
+    # Reject unknown types before touching the collection
+    for field_type in indexes.values():
+        field_schema(field_type)
+    payload_schema = client.get_collection(collection_name).payload_schema or {}
+
+    changed = []
+    for field_name, field_type in indexes.items():
+        current = payload_schema.get(field_name)
+        if current is not None and _matches(current, field_type):
+            continue
+        if current is not None:
+            client.delete_payload_index(collection_name, field_name, wait=wait)
+        client.create_payload_index(collection_name, field_name=field_name,
+                                    field_schema=field_schema(field_type), wait=wait)
+        changed.append(field_name)
+    return changed
+
+
+if __name__ == "__main__":
+    # Filtered search latency with and without payload indexes against a local Qdrant
+    import argparse
+    import time
+    import numpy as np
+
+    parser = argparse.ArgumentParser(description="Benchmark filtered search with and without payload indexes")
+    parser.add_argument("--host", type=str, default="localhost")
+    parser.add_argument("--port", type=int, default=6333)
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--pmids", type=int, default=10000, help="Distinct pmid values")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    client = QdrantClient(host=args.host, port=args.port, timeout=120)
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.vectors, args.dim)).astype(np.float32)
+    payloads = [{"pmid": str(i % args.pmids), "year": 1990 + i % 35} for i in range(args.vectors)]
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    filters = [
+        models.Filter(must=[models.FieldCondition(key="pmid", match=models.MatchValue(value=str(i % args.pmids)))])
+        for i in rng.integers(0, args.pmids, args.queries)
+    ]
+
+    for indexed in (False, True):
+        collection_name = f"payload_index_benchmark_{'indexed' if indexed else 'plain'}"
+        if client.collection_exists(collection_name):
+            client.delete_collection(collection_name)
+        client.create_collection(
+            collection_name=collection_name,
+            vectors_config=models.VectorParams(size=args.dim, distance=models.Distance.COSINE)
+        )
+        if indexed:
+            # Indexes declared before the upload are built together with the HNSW graph
+            ensure_payload_indexes(client, collection_name, {"pmid": "keyword", "year": "integer"})
+        client.upload_collection(collection_name, vectors=vectors, payload=payloads, ids=range(args.vectors),
+                                 wait=True)
+
+        latencies = []
+        for query, query_filter in zip(queries, filters):
+            start = time.perf_counter()
+            client.query_points(collection_name, query=query, query_filter=query_filter, limit=10)
+            latencies.append(time.perf_counter() - start)
+
+        print(f"{'indexed' if indexed else 'no index':9s} p50 {np.percentile(latencies, 50) * 1000:7.2f} ms  "
+              f"p99 {np.percentile(latencies, 99) * 1000:7.2f} ms")
+        client.delete_collection(collection_name)
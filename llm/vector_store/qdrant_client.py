@@ -2,73 +2,99 @@
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
 from typing import List, Dict, Optional
+import hashlib
+import os
 import uuid
 import time
-from tenacity import retry, stop_after_attempt, wait_exponential
+from dataclasses import replace
+from llm.vector_store.collection_config import CollectionConfig, PRESETS
+from llm.vector_store.payload_indexes import ensure_payload_indexes
+from llm.vector_store.embedded import get_embedded_client
+from llm.vector_store.upsert_engine import UpsertEngine, UpsertStats
+from llm.vector_store.collection_versions import VersionedCollection
+from llm.vector_store.ingestion_stamps import IngestionStamps
+from llm.rag.sparse import SPARSE_VECTOR_NAME
+
+# Fixed namespace of the uuid5 chunk ids, so the same chunk maps to the same point on every machine and run
+CHUNK_ID_NAMESPACE = uuid.UUID("6f1d2a43-9c1e-5b7a-8e0f-2d4c6b8a1e35")
+# Bumped whenever to_point_struct writes new payload fields, so incremental runs rewrite points stored without them
+PAYLOAD_VERSION = 2
 
 class QdrantVectorStore:
-    def __init__(self, host="localhost", port=6333, batch_size=100, timeout=30):
-        self.client = QdrantClient(
-            host=host, 
-            port=port,
-            timeout=timeout
-        )
+    def __init__(self, host="localhost", port=6333, batch_size=100, timeout=30, backend: Optional[str] = None,
+                 path: Optional[str] = None):
+        # VECTOR_BACKEND=embedded runs everything in-process on EMBEDDED_VECTOR_PATH, without a Qdrant server
+        backend = backend or os.getenv("VECTOR_BACKEND", "qdrant")
+        if backend == "embedded":
+            self.client = get_embedded_client(path or os.getenv("EMBEDDED_VECTOR_PATH", "data/vector_index"))
+        elif backend == "qdrant":
+            self.client = QdrantClient(
+                host=host, 
+                port=port,
+                timeout=timeout
+            )
+        else:
+            raise ValueError(f"Unsupported vector backend: {backend}. Choose 'qdrant' or 'embedded'")
         self.batch_size = batch_size
+        self.upsert_engine = UpsertEngine.from_env(self.client, batch_size=batch_size)
+        self.collection_configs: Dict[str, CollectionConfig] = {}
     
-    def create_collection(self, collection_name: str, vector_size: int):
-        """Create Qdrant collection"""
+    def create_collection(self, collection_name: str, vector_size: int,
+                          config: Optional[CollectionConfig] = None, preset: Optional[str] = None,
+                          sparse: bool = False, payload_indexes: Optional[Dict[str, str]] = None):
+        """Create Qdrant collection, optionally quantized and/or stored on disk, with an optional sparse vector.
+
+        payload_indexes maps payload fields to their index type (keyword,
+        integer, datetime or tenant); the indexes are created right away so
+        they are built alongside the vectors instead of after the upload.
+        """
+        if config is None:
+            config = PRESETS[preset or "default"]
+        if sparse:
+            config = replace(config, sparse_vectors=True)
+        self.collection_configs[collection_name] = config
         try:
             self.client.recreate_collection(
                 collection_name=collection_name,
-                vectors_config=models.VectorParams(
-                    size=vector_size,
-                    distance=models.Distance.COSINE
-                )
+                **config.create_kwargs(vector_size)
             )
             print(f"✅ Created collection: {collection_name}")
         except Exception as e:
             print(f"⚠️  Collection may already exist: {e}")
+        if payload_indexes:
+            self.ensure_payload_indexes(collection_name, payload_indexes)
     
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-    def upsert_vectors(self, collection_name: str, points: List[models.PointStruct]):
-        """Insert vectors into Qdrant with retry and batching"""
-        if not points:
-            return
-        
-        # Process in batches to avoid timeout
-        for i in range(0, len(points), self.batch_size):
-            batch = points[i:i + self.batch_size]
-            try:
-                self.client.upsert(
-                    collection_name=collection_name,
-                    points=batch,
-                    wait=True
-                )
-                print(f"✅ Inserted batch {i//self.batch_size + 1}: {len(batch)} points")
-                time.sleep(0.1)  # Small delay between batches
-            except Exception as e:
-                print(f"❌ Failed to insert batch {i//self.batch_size + 1}: {e}")
-                raise
+    def ensure_payload_indexes(self, collection_name: str, payload_indexes: Dict[str, str]) -> List[str]:
+        """Idempotently create or fix the payload indexes of an existing collection"""
+        try:
+            changed = ensure_payload_indexes(self.client, collection_name, payload_indexes)
+        except Exception as e:
+            print(f"⚠️  Could not reconcile payload indexes of {collection_name}: {e}")
+            return []
+        if changed:
+            print(f"🗂️ Indexed payload fields of {collection_name}: {', '.join(changed)}")
+        return changed
+    
+    def upsert_vectors(self, collection_name: str, points: List[models.PointStruct],
+                       load_id: Optional[str] = None) -> UpsertStats:
+        """Insert vectors in pipelined batches; failed batches are retried alone and interrupted loads resume.
+
+        load_id names the load in the upsert checkpoint (the collection name by default).
+        """
+        return self.upsert_engine.upsert(collection_name, points, load_id=load_id)
     
     def search_similar(
         self, 
         collection_name: str, 
         query_vector: List[float], 
         limit: int = 10,
-        pmid_filter: Optional[str] = None
+        pmid_filter: Optional[str] = None,
+        hnsw_ef: Optional[int] = None,
+        exact: bool = False,
+        query_filter: Optional[models.Filter] = None
     ) -> List[Dict]:
-        """Search for similar vectors with optional pmid filtering"""
-        # Create filter if pmid is provided
-        qdrant_filter = None
-        if pmid_filter:
-            qdrant_filter = models.Filter(
-                must=[
-                    models.FieldCondition(
-                        key="pmid",
-                        match=models.MatchValue(value=pmid_filter)
-                    )
-                ]
-            )
+        """Search for similar vectors with optional payload filtering and per-query HNSW overrides"""
+        qdrant_filter = self._build_filter(pmid_filter, query_filter)
         
         # Perform the search
         results = self.client.search(
@@ -76,25 +102,175 @@ class QdrantVectorStore:
             query_vector=query_vector,
             limit=limit,
             query_filter=qdrant_filter,
+            search_params=self._search_params(collection_name, hnsw_ef, exact),
             with_payload=True
         )
         
-        # Convert to list of dictionaries with consistent format
-        return [
-            {
-                "id": result.id,
-                "score": result.score,
-                "payload": result.payload,
-                "chunk_content": result.payload.get("chunk_content", ""),
-                "pmid": result.payload.get("pmid", ""),
-                "title": result.payload.get("title", ""),
-                "authors": result.payload.get("authors", ""),
-                "url": result.payload.get("url", ""),
-                "embedding_model": result.payload.get("embedding_model", ""),
-                "chunk_metadata": result.payload.get("chunk_metadata", {})
-            }
-            for result in results
-        ]
+        return [self._to_result(result) for result in results]
+    
+    def hybrid_search(
+        self,
+        collection_name: str,
+        query_vector: List[float],
+        query_sparse_vector: models.SparseVector,
+        limit: int = 10,
+        pmid_filter: Optional[str] = None,
+        prefetch_limit: Optional[int] = None,
+        hnsw_ef: Optional[int] = None,
+        query_filter: Optional[models.Filter] = None
+    ) -> List[Dict]:
+        """Run dense and sparse searches in one request and fuse them with reciprocal rank fusion"""
+        qdrant_filter = self._build_filter(pmid_filter, query_filter)
+        prefetch_limit = prefetch_limit or limit * 2
+        
+        response = self.client.query_points(
+            collection_name=collection_name,
+            prefetch=[
+                models.Prefetch(
+                    query=query_vector,
+                    filter=qdrant_filter,
+                    limit=prefetch_limit,
+                    params=self._search_params(collection_name, hnsw_ef)
+                ),
+                models.Prefetch(
+                    query=query_sparse_vector,
+                    using=SPARSE_VECTOR_NAME,
+                    filter=qdrant_filter,
+                    limit=prefetch_limit
+                ),
+            ],
+            query=models.FusionQuery(fusion=models.Fusion.RRF),
+            limit=limit,
+            with_payload=True
+        )
+        
+        return [self._to_result(point) for point in response.points]
+    
+    def search_batch(
+        self,
+        collection_name: str,
+        query_vectors: List[List[float]],
+        limit: int = 10,
+        pmid_filters: Optional[List[Optional[str]]] = None,
+        query_sparse_vectors: Optional[List[models.SparseVector]] = None,
+        prefetch_limit: Optional[int] = None,
+        hnsw_ef: Optional[int] = None,
+        query_filters: Optional[List[Optional[models.Filter]]] = None
+    ) -> List[List[Dict]]:
+        """Run one search per query vector in a single round trip, hybrid when sparse query vectors are given"""
+        if not query_vectors:
+            return []
+        pmid_filters = pmid_filters or [None] * len(query_vectors)
+        query_filters = query_filters or [None] * len(query_vectors)
+        search_params = self._search_params(collection_name, hnsw_ef)
+        prefetch_limit = prefetch_limit or limit * 2
+        
+        requests = []
+        for i, (query_vector, pmid_filter, query_filter) in enumerate(zip(query_vectors, pmid_filters,
+                                                                          query_filters)):
+            qdrant_filter = self._build_filter(pmid_filter, query_filter)
+            if query_sparse_vectors is None:
+                requests.append(models.QueryRequest(
+                    query=query_vector,
+                    filter=qdrant_filter,
+                    params=search_params,
+                    limit=limit,
+                    with_payload=True
+                ))
+                continue
+            requests.append(models.QueryRequest(
+                prefetch=[
+                    models.Prefetch(query=query_vector, filter=qdrant_filter, limit=prefetch_limit,
+                                    params=search_params),
+                    models.Prefetch(query=query_sparse_vectors[i], using=SPARSE_VECTOR_NAME,
+                                    filter=qdrant_filter, limit=prefetch_limit),
+                ],
+                query=models.FusionQuery(fusion=models.Fusion.RRF),
+                limit=limit,
+                with_payload=True
+            ))
+        
+        responses = self.client.query_batch_points(collection_name=collection_name, requests=requests)
+        return [[self._to_result(point) for point in response.points] for response in responses]
+    
+    @staticmethod
+    def _build_filter(pmid_filter: Optional[str] = None,
+                      query_filter: Optional[models.Filter] = None) -> Optional[models.Filter]:
+        """Combine the pmid filter with any other payload filter into a single Qdrant filter"""
+        if not pmid_filter:
+            return query_filter
+        pmid_condition = models.FieldCondition(
+            key="pmid",
+            match=models.MatchValue(value=pmid_filter)
+        )
+        if query_filter is None:
+            return models.Filter(must=[pmid_condition])
+        return query_filter.model_copy(update={"must": [pmid_condition, *(query_filter.must or [])]})
+    
+    @staticmethod
+    def _to_result(result: models.ScoredPoint) -> Dict:
+        """Convert a scored point to the chunk dictionary format used by the retriever"""
+        return {
+            "id": result.id,
+            "score": result.score,
+            "payload": result.payload,
+            "chunk_content": result.payload.get("chunk_content", ""),
+            "pmid": result.payload.get("pmid", ""),
+            "title": result.payload.get("title", ""),
+            "authors": result.payload.get("authors", ""),
+            "url": result.payload.get("url", ""),
+            "embedding_model": result.payload.get("embedding_model", ""),
+            "chunk_metadata": result.payload.get("chunk_metadata", {})
+        }
+    
+    def _search_params(self, collection_name: str, hnsw_ef: Optional[int] = None,
+                       exact: bool = False) -> Optional[models.SearchParams]:
+        config = self.collection_configs.get(collection_name)
+        if config is None:
+            config = self._config_from_collection(collection_name)
+            self.collection_configs[collection_name] = config
+        return config.search_params(hnsw_ef=hnsw_ef, exact=exact)
+    
+    def _config_from_collection(self, collection_name: str) -> CollectionConfig:
+        """Recover the layout of a collection created by another process"""
+        info = self.get_collection_info(collection_name)
+        return CollectionConfig.from_collection_info(info) if info else PRESETS["default"]
+    
+    def collection_exists(self, collection_name: str) -> bool:
+        return self.client.collection_exists(collection_name)
+    
+    def versioned(self, alias: str) -> VersionedCollection:
+        """Blue/green versions of the collection searched through alias"""
+        return VersionedCollection.from_env(self.client, alias)
+    
+    def ingestion_stamps(self) -> IngestionStamps:
+        """Per-collection stamps that writers bump and caches key on"""
+        return IngestionStamps(self.client)
+    
+    def scroll_payloads(self, collection_name: str, fields: List[str], page_size: int = 1000) -> Dict[str, Dict]:
+        """Ids and selected payload fields of every point, without reading any vectors"""
+        payloads = {}
+        offset = None
+        while True:
+            records, offset = self.client.scroll(
+                collection_name=collection_name,
+                limit=page_size,
+                offset=offset,
+                with_payload=fields,
+                with_vectors=False
+            )
+            payloads.update((str(record.id), record.payload or {}) for record in records)
+            if offset is None:
+                return payloads
+    
+    def delete_points(self, collection_name: str, point_ids: List[str]):
+        """Delete points by id, in batches"""
+        for i in range(0, len(point_ids), self.batch_size):
+            self.client.delete(
+                collection_name=collection_name,
+                points_selector=models.PointIdsList(points=point_ids[i:i + self.batch_size]),
+                wait=True
+            )
     
     def get_collection_info(self, collection_name: str) -> Optional[Dict]:
         """Get information about a collection"""
@@ -117,12 +293,29 @@ class QdrantVectorStore:
 class ArticleVectorMapper:
     """Object-Vector Mapper for article chunks with your data format"""
     
+    @staticmethod
+    def point_id(chunk: Dict) -> str:
+        """Deterministic point id from (pmid, chunk position, content hash)
+
+        Re-indexing an unchanged chunk hits the same point instead of adding a
+        copy, and a changed chunk gets a new id, which is how the feature
+        pipeline tells which chunks to embed and which points to delete.
+        """
+        metadata = chunk.get('metadata', {})
+        content_hash = metadata.get('chunk_id') or hashlib.md5(chunk['chunk_content'].encode()).hexdigest()
+        key = f"{chunk['pmid']}:{metadata.get('chunk_index', 0)}:{content_hash}"
+        return str(uuid.uuid5(CHUNK_ID_NAMESPACE, key))
+    
     @staticmethod
     def to_point_struct(embedded_chunk: Dict) -> models.PointStruct:
         """Convert embedded chunk to Qdrant point with your exact payload structure"""
+        vector = embedded_chunk['embedding']
+        if embedded_chunk.get('sparse_embedding') is not None:
+            # The dense vector stays the unnamed default vector so dense-only search keeps working
+            vector = {"": vector, SPARSE_VECTOR_NAME: embedded_chunk['sparse_embedding']}
         return models.PointStruct(
-            id=str(uuid.uuid4()),
-            vector=embedded_chunk['embedding'],
+            id=ArticleVectorMapper.point_id(embedded_chunk),
+            vector=vector,
             payload={
                 'pmid': embedded_chunk['pmid'],
                 'chunk_content': embedded_chunk['chunk_content'],
@@ -130,16 +323,24 @@ class ArticleVectorMapper:
                 'authors': embedded_chunk['authors'],
                 'url': embedded_chunk['url'],
                 'embedding_model': embedded_chunk['embedding_model'],
-                'chunk_metadata': embedded_chunk.get('metadata', {})
+                'doi': embedded_chunk.get('doi'),
+                'journal': embedded_chunk.get('journal'),
+                'year': embedded_chunk.get('year'),
+                'author_list': embedded_chunk.get('author_list', []),
+                'chunk_metadata': embedded_chunk.get('metadata', {}),
+                'payload_version': PAYLOAD_VERSION
             }
         )
     
     @staticmethod
     def from_point_struct(point: models.ScoredPoint) -> Dict:
         """Convert Qdrant point back to article chunk format"""
+        vector = point.vector
+        if isinstance(vector, dict):
+            vector = vector.get("")
         return {
             'id': point.id,
-            'embedding': point.vector,
+            'embedding': vector,
             'pmid': point.payload.get('pmid'),
             'chunk_content': point.payload.get('chunk_content'),
             'title': point.payload.get('title'),
@@ -148,4 +349,53 @@ class ArticleVectorMapper:
             'embedding_model': point.payload.get('embedding_model'),
             'metadata': point.payload.get('chunk_metadata', {}),
             'score': point.score
-        }
\ No newline at end of file
+        }
+
+if __name__ == "__main__":
+    # Request latency of per-query fan-out vs one batched round trip per collection
+    import argparse
+    import concurrent.futures
+    import numpy as np
+
+    parser = argparse.ArgumentParser(description="Benchmark batched vector search")
+    parser.add_argument("--host", type=str, default="localhost")
+    parser.add_argument("--port", type=int, default=6333)
+    parser.add_argument("--collections", type=int, default=3)
+    parser.add_argument("--vectors", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries_per_request", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=100)
+    args = parser.parse_args()
+
+    store = QdrantVectorStore(host=args.host, port=args.port, timeout=120)
+    rng = np.random.default_rng(0)
+    collection_names = [f"batch_benchmark_{i}" for i in range(args.collections)]
+    for collection_name in collection_names:
+        store.create_collection(collection_name, args.dim)
+        store.client.upload_collection(collection_name, ids=range(args.vectors), wait=True,
+                                       vectors=rng.standard_normal((args.vectors, args.dim)).astype(np.float32))
+
+    def fan_out(query_vectors):
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            tasks = [executor.submit(store.search_similar, name, vector.tolist(), 10)
+                     for vector in query_vectors for name in collection_names]
+            return [task.result() for task in tasks]
+
+    def batched(query_vectors):
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            tasks = [executor.submit(store.search_batch, name, [v.tolist() for v in query_vectors], 10)
+                     for name in collection_names]
+            return [task.result() for task in tasks]
+
+    for name, run in (("fan-out", fan_out), ("batched", batched)):
+        latencies = []
+        for _ in range(args.requests):
+            query_vectors = rng.standard_normal((args.queries_per_request, args.dim)).astype(np.float32)
+            start = time.perf_counter()
+            run(query_vectors)
+            latencies.append(time.perf_counter() - start)
+        print(f"{name:8s} p50 {np.percentile(latencies, 50) * 1000:7.2f} ms  "
+              f"p99 {np.percentile(latencies, 99) * 1000:7.2f} ms")
+
+    for collection_name in collection_names:
+        store.delete_collection(collection_name)
@@ -0,0 +1,228 @@
+# llm/vector_store/upsert_engine.py
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Set
+from qdrant_client.http import models
+from tenacity import Retrying, stop_after_attempt, wait_exponential
+
+
+@dataclass
+class UpsertStats:
+    points: int = 0
+    batches: int = 0
+    skipped_batches: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+
+    @property
+    def points_per_sec(self) -> float:
+        return self.points / self.seconds if self.seconds else 0.0
+
+    def to_dict(self) -> Dict:
+        return {**asdict(self), "points_per_sec": self.points_per_sec}
+
+
+class UpsertCheckpoint:
+    """Batches of a load that Qdrant has acknowledged, kept in a JSON file.
+
+    A checkpoint only applies to the same load: same id, number of points
+    and batch size. Anything else starts from scratch. Each committed batch
+    is recorded with a fingerprint of its point ids, and is only skipped
+    when the batch at that position still has the same fingerprint, so a
+    rerun whose batches hold other points writes them again.
+    """
+
+    def __init__(self, path: str, load_id: str, num_points: int, batch_size: int):
+        self.path = path
+        self._lock = threading.Lock()
+        self._state = {"load_id": load_id, "num_points": num_points, "batch_size": batch_size, "committed": {}}
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    saved = json.load(f)
+                # Checkpoints from before fingerprints stored a list of batch ids and cannot be trusted
+                if all(saved.get(key) == self._state[key] for key in ("load_id", "num_points", "batch_size")) \
+                        and isinstance(saved.get("committed"), dict):
+                    self._state = saved
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Ignoring unreadable upsert checkpoint {path}: {e}")
+        self.committed: Dict[int, str] = {int(batch_id): fingerprint
+                                          for batch_id, fingerprint in self._state["committed"].items()}
+
+    @staticmethod
+    def fingerprint(batch: List[models.PointStruct]) -> str:
+        digest = hashlib.sha1()
+        for point in batch:
+            digest.update(f"{point.id}\n".encode())
+        return digest.hexdigest()
+
+    def is_committed(self, batch_id: int, batch: List[models.PointStruct]) -> bool:
+        return self.committed.get(batch_id) == self.fingerprint(batch)
+
+    def commit(self, batch_id: int, batch: List[models.PointStruct]):
+        with self._lock:
+            self.committed[batch_id] = self.fingerprint(batch)
+            self._state["committed"] = {str(batch_id): fingerprint
+                                        for batch_id, fingerprint in sorted(self.committed.items())}
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # Write then rename, so an interrupted write never leaves a corrupt checkpoint
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._state, f)
+            os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class UpsertEngine:
+    """Pipelined batch upserts with per-batch retries and resumable progress.
+
+    Up to max_in_flight batches are sent concurrently with wait=False, so
+    Qdrant acknowledges each one as soon as it is in its write-ahead log.
+    Once every batch is acknowledged, the last one is sent again with
+    wait=True: updates are applied in log order, so when that returns all
+    of them are searchable. A failing batch is retried on its own with
+    exponential backoff. With a checkpoint_dir, acknowledged batch ids are
+    recorded, so a load that was interrupted skips them when it runs again
+    as long as they hold the same points.
+    """
+
+    def __init__(self, client, batch_size: int = 100, max_in_flight: int = 4, max_retries: int = 5,
+                 checkpoint_dir: Optional[str] = None):
+        self.client = client
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.checkpoint_dir = checkpoint_dir
+
+    @classmethod
+    def from_env(cls, client, batch_size: int = 100) -> "UpsertEngine":
+        """Build the engine from QDRANT_UPSERT_* environment variables"""
+        return cls(
+            client,
+            batch_size=int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", str(batch_size))),
+            max_in_flight=int(os.getenv("QDRANT_UPSERT_CONCURRENCY", "4")),
+            max_retries=int(os.getenv("QDRANT_UPSERT_MAX_RETRIES", "5")),
+            checkpoint_dir=os.getenv("QDRANT_UPSERT_CHECKPOINT_DIR", ".cache/upserts") or None
+        )
+
+    def _checkpoint(self, collection_name: str, load_id: Optional[str], num_points: int) -> Optional[UpsertCheckpoint]:
+        # A single batch has nothing to resume
+        if self.checkpoint_dir is None or num_points <= self.batch_size:
+            return None
+        load_id = load_id or collection_name
+        path = os.path.join(self.checkpoint_dir, f"{load_id}.json")
+        return UpsertCheckpoint(path, load_id, num_points, self.batch_size)
+
+    def _upsert_batch(self, collection_name: str, batch_id: int, batch: List[models.PointStruct],
+                      stats: UpsertStats, wait_for_result: bool = False):
+        for attempt in Retrying(stop=stop_after_attempt(self.max_retries),
+                                wait=wait_exponential(multiplier=0.5, min=0.5, max=10), reraise=True):
+            with attempt:
+                if attempt.retry_state.attempt_number > 1:
+                    stats.retries += 1
+                    print(f"🔁 Retrying batch {batch_id + 1} (attempt {attempt.retry_state.attempt_number})")
+                self.client.upsert(collection_name=collection_name, points=batch, wait=wait_for_result)
+
+    def upsert(self, collection_name: str, points: List[models.PointStruct],
+               load_id: Optional[str] = None) -> UpsertStats:
+        stats = UpsertStats()
+        if not points:
+            return stats
+        start = time.perf_counter()
+        batches = [points[i:i + self.batch_size] for i in range(0, len(points), self.batch_size)]
+        checkpoint = self._checkpoint(collection_name, load_id, len(points))
+        pending_ids = [i for i, batch in enumerate(batches)
+                       if checkpoint is None or not checkpoint.is_committed(i, batch)]
+        stats.skipped_batches = len(batches) - len(pending_ids)
+        if stats.skipped_batches:
+            print(f"⏩ Resuming load: {stats.skipped_batches}/{len(batches)} batches already committed")
+
+        if len(batches) == 1:
+            self._upsert_batch(collection_name, 0, batches[0], stats, wait_for_result=True)
+            stats.points, stats.batches = len(points), 1
+            stats.seconds = time.perf_counter() - start
+            return stats
+
+        in_flight: Dict[Future, int] = {}
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            try:
+                for batch_id in pending_ids:
+                    if len(in_flight) >= self.max_in_flight:
+                        self._collect(wait(in_flight, return_when=FIRST_COMPLETED).done, in_flight, batches,
+                                      checkpoint, stats)
+                    future = executor.submit(self._upsert_batch, collection_name, batch_id, batches[batch_id], stats)
+                    in_flight[future] = batch_id
+                self._collect(wait(in_flight).done, in_flight, batches, checkpoint, stats)
+            except BaseException:
+                for future in in_flight:
+                    future.cancel()
+                raise
+
+        # Consistency barrier
+        self._upsert_batch(collection_name, len(batches) - 1, batches[-1], stats, wait_for_result=True)
+        if checkpoint is not None:
+            checkpoint.clear()
+
+        stats.seconds = time.perf_counter() - start
+        print(f"✅ Upserted {stats.points} points in {stats.batches} batches "
+              f"({stats.points_per_sec:.0f} points/s, {stats.retries} retries)")
+        return stats
+
+    def _collect(self, done: Set[Future], in_flight: Dict[Future, int], batches: List[List[models.PointStruct]],
+                 checkpoint: Optional[UpsertCheckpoint], stats: UpsertStats):
+        for future in done:
+            batch_id = in_flight.pop(future)
+            try:
+                future.result()
+            except Exception as e:
+                print(f"❌ Failed to insert batch {batch_id + 1} after {self.max_retries} attempts: {e}")
+                raise
+            if checkpoint is not None:
+                checkpoint.commit(batch_id, batches[batch_id])
+            stats.points += len(batches[batch_id])
+            stats.batches += 1
+
+
+if __name__ == "__main__":
+    # points/sec for a grid of batch sizes and concurrency levels against a local Qdrant
+    import argparse
+    import uuid
+    import numpy as np
+    from qdrant_client import QdrantClient
+
+    parser = argparse.ArgumentParser(description="Tune upsert batch size and concurrency")
+    parser.add_argument("--host", type=str, default="localhost")
+    parser.add_argument("--port", type=int, default=6333)
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[64, 128, 256, 512])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    client = QdrantClient(host=args.host, port=args.port, timeout=120)
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.vectors, args.dim)).astype(np.float32)
+    points = [models.PointStruct(id=str(uuid.uuid4()), vector=vector.tolist(), payload={"pmid": str(i)})
+              for i, vector in enumerate(vectors)]
+
+    collection_name = "upsert_benchmark"
+    for batch_size in args.batch_sizes:
+        for max_in_flight in args.concurrency:
+            client.recreate_collection(
+                collection_name,
+                vectors_config=models.VectorParams(size=args.dim, distance=models.Distance.COSINE)
+            )
+            engine = UpsertEngine(client, batch_size=batch_size, max_in_flight=max_in_flight)
+            stats = engine.upsert(collection_name, points)
+            assert client.count(collection_name, exact=True).count == len(points)
+            print(f"batch_size {batch_size:4d}  in flight {max_in_flight:2d}  {stats.points_per_sec:9.0f} points/s")
+    client.delete_collection(collection_name)
@@ -0,0 +1,158 @@
+import json
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+from loguru import logger
+from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+from sentence_transformers.cross_encoder import CrossEncoder
+
+from llm_engineering.settings import settings
+
+SUPPORTED_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+PARITY_PROBES = [
+    "What are the side effects of metformin?",
+    "BRCA1 mutations and the risk of breast cancer.",
+    "Deep learning methods for protein structure prediction.",
+    "How does retrieval augmented generation reduce hallucinations?",
+    "",
+]
+
+
+def load_model(
+    model_cls: type[SentenceTransformer] | type[CrossEncoder],
+    model_id: str,
+    backend: str = settings.RAG_MODEL_BACKEND,
+    **kwargs,
+) -> SentenceTransformer | CrossEncoder:
+    """
+    Loads a bi-encoder or cross-encoder on the requested inference backend.
+
+    The ONNX graph (and its int8 dynamically quantized variant) is exported on first use and cached under
+    RAG_ONNX_CACHE_DIR. The first export is checked against the torch model on a fixed probe set: embeddings by
+    cosine similarity, cross-encoder scores by absolute error. If the outputs diverge, the torch model is returned
+    instead.
+
+    Args:
+        model_cls: SentenceTransformer or CrossEncoder.
+        model_id (str): The Hugging Face model id or local path.
+        backend (str): One of "torch", "onnx" or "onnx-int8".
+        **kwargs: Extra keyword arguments forwarded to the model constructor.
+
+    Returns:
+        The loaded model.
+    """
+
+    if backend not in SUPPORTED_BACKENDS:
+        raise ValueError(f"Unsupported backend '{backend}'. Expected one of {SUPPORTED_BACKENDS}.")
+
+    if backend == "torch":
+        return model_cls(model_id, **kwargs)
+
+    export_dir = Path(settings.RAG_ONNX_CACHE_DIR) / model_id.replace("/", "__")
+    parity_file = export_dir / f"parity_{backend}.json"
+
+    if not parity_file.exists():
+        _export(model_cls, model_id, backend, export_dir, **kwargs)
+
+    model = model_cls(
+        str(export_dir), backend="onnx", model_kwargs={"file_name": _onnx_file_name(export_dir, backend)}, **kwargs
+    )
+
+    if not parity_file.exists():
+        reference = model_cls(model_id, **kwargs)
+        if issubclass(model_cls, CrossEncoder):
+            metric = "max_abs_error"
+            value = check_score_parity(_predict_fn(reference), _predict_fn(model))
+            passed = value <= settings.RAG_ONNX_SCORE_TOLERANCE
+        else:
+            metric = "cosine_similarity"
+            value = check_parity(_predict_fn(reference), _predict_fn(model))
+            passed = value >= settings.RAG_ONNX_PARITY_THRESHOLD
+        parity_file.write_text(json.dumps({"backend": backend, metric: value, "passed": passed}))
+
+        if not passed:
+            logger.error(
+                f"ONNX parity check failed for {model_id=} ({backend=}, {metric}={value:.4f}). Falling back to torch."
+            )
+
+            return reference
+    elif not json.loads(parity_file.read_text())["passed"]:
+        return model_cls(model_id, **kwargs)
+
+    logger.info(f"Loaded {model_id=} with the {backend} backend.")
+
+    return model
+
+
+def check_parity(
+    reference_fn: Callable[[list], np.ndarray],
+    candidate_fn: Callable[[list], np.ndarray],
+    probes: list | None = None,
+) -> float:
+    """
+    Returns the minimum cosine similarity between reference and candidate outputs over the probe set.
+    """
+
+    reference = np.atleast_2d(np.asarray(reference_fn(probes), dtype=np.float32))
+    candidate = np.atleast_2d(np.asarray(candidate_fn(probes), dtype=np.float32))
+
+    numerator = np.sum(reference * candidate, axis=-1)
+    denominator = np.linalg.norm(reference, axis=-1) * np.linalg.norm(candidate, axis=-1)
+    similarity = numerator / np.maximum(denominator, 1e-12)
+
+    return float(similarity.min())
+
+
+def check_score_parity(
+    reference_fn: Callable[[list], np.ndarray],
+    candidate_fn: Callable[[list], np.ndarray],
+    probes: list | None = None,
+) -> float:
+    """
+    Returns the maximum absolute difference between reference and candidate scores over the probe set.
+
+    Unlike cosine similarity, this catches a backend that scales or shifts every score.
+    """
+
+    reference = np.asarray(reference_fn(probes), dtype=np.float32).ravel()
+    candidate = np.asarray(candidate_fn(probes), dtype=np.float32).ravel()
+
+    return float(np.max(np.abs(reference - candidate)))
+
+
+def _predict_fn(model: SentenceTransformer | CrossEncoder) -> Callable[[list | None], np.ndarray]:
+    if isinstance(model, CrossEncoder):
+        pairs = [(PARITY_PROBES[0], probe) for probe in PARITY_PROBES]
+
+        return lambda probes: model.predict(probes or pairs)
+
+    return lambda probes: model.encode(probes or PARITY_PROBES)
+
+
+def _export(model_cls, model_id: str, backend: str, export_dir: Path, **kwargs) -> None:
+    logger.info(f"Exporting {model_id=} to ONNX in '{export_dir}'.")
+
+    model = model_cls(model_id, backend="onnx", **kwargs)
+    model.save_pretrained(str(export_dir))
+
+    if backend == "onnx-int8":
+        export_dynamic_quantized_onnx_model(
+            model,
+            quantization_config=settings.RAG_ONNX_QUANTIZATION_CONFIG,
+            model_name_or_path=str(export_dir),
+        )
+
+
+def _onnx_file_name(export_dir: Path, backend: str) -> str:
+    if backend == "onnx-int8":
+        candidates = [f"onnx/model_qint8_{settings.RAG_ONNX_QUANTIZATION_CONFIG}.onnx"]
+    else:
+        candidates = ["onnx/model.onnx", "model.onnx"]
+
+    for candidate in candidates:
+        if (export_dir / candidate).exists():
+            return candidate
+
+    raise FileNotFoundError(f"No exported ONNX model for {backend=} found in '{export_dir}'.")
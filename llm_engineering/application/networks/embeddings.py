@@ -1,3 +1,5 @@
+import functools
+from contextlib import contextmanager
 from functools import cached_property
 from pathlib import Path
 from typing import Optional
@@ -9,8 +11,11 @@ from sentence_transformers.SentenceTransformer import SentenceTransformer
 from sentence_transformers.cross_encoder import CrossEncoder
 from transformers import AutoTokenizer
 
+from llm.embedding.cache import EmbeddingCache
+from llm.embedding.pool import EmbeddingPool
 from llm_engineering.settings import settings
 
+from .backends import load_model
 from .base import SingletonMeta
 
 
@@ -24,17 +29,34 @@ class EmbeddingModelSingleton(metaclass=SingletonMeta):
         model_id: str = settings.TEXT_EMBEDDING_MODEL_ID,
         device: str = settings.RAG_MODEL_DEVICE,
         cache_dir: Optional[Path] = None,
+        use_embedding_cache: bool = settings.EMBEDDING_CACHE_ENABLED,
+        backend: str = settings.RAG_MODEL_BACKEND,
     ) -> None:
         self._model_id = model_id
         self._device = device
+        self._backend = backend
 
-        self._model = SentenceTransformer(
+        self._model = load_model(
+            SentenceTransformer,
             self._model_id,
+            backend=backend,
             device=self._device,
             cache_folder=str(cache_dir) if cache_dir else None,
         )
         self._model.eval()
 
+        # Quantized and full-precision backends give different vectors, so each backend gets its own cache.
+        self._embedding_cache = (
+            EmbeddingCache(
+                f"{self._model_id}@{backend}",
+                cache_dir=settings.EMBEDDING_CACHE_DIR,
+                max_memory_items=settings.EMBEDDING_CACHE_MEMORY_ITEMS,
+            )
+            if use_embedding_cache
+            else None
+        )
+        self._pool: EmbeddingPool | None = None
+
     @property
     def model_id(self) -> str:
         """
@@ -81,6 +103,44 @@ class EmbeddingModelSingleton(metaclass=SingletonMeta):
 
         return self._model.tokenizer
 
+    @property
+    def cache_stats(self) -> dict:
+        """
+        Returns the hit/miss statistics of the embedding cache.
+
+        Returns:
+            dict: The cache statistics, or an empty dict if caching is disabled.
+        """
+
+        return self._embedding_cache.stats() if self._embedding_cache else {}
+
+    @contextmanager
+    def multi_process(self, num_workers: int | None = None, **pool_kwargs):
+        """
+        Encodes batches through a pool of worker processes for the duration of the context.
+
+        Args:
+            num_workers (int | None): The number of worker processes. Defaults to the number of CPU cores.
+            **pool_kwargs: Extra keyword arguments forwarded to EmbeddingPool.
+        """
+
+        # Workers load the model through the same backend as this process, so both produce the same vectors.
+        model_factory = functools.partial(load_model, SentenceTransformer, backend=self._backend)
+        with EmbeddingPool(
+            self._model_id, num_workers=num_workers, device=self._device, model_factory=model_factory, **pool_kwargs
+        ) as pool:
+            self._pool = pool
+            try:
+                yield self
+            finally:
+                self._pool = None
+
+    def _encode(self, input_text: list[str]) -> NDArray[np.float32]:
+        if self._pool is not None and len(input_text) > 1:
+            return self._pool.encode(input_text)
+
+        return self._model.encode(input_text)
+
     def __call__(
         self, input_text: str | list[str], to_list: bool = True
     ) -> NDArray[np.float32] | list[float] | list[list[float]]:
@@ -96,7 +156,12 @@ class EmbeddingModelSingleton(metaclass=SingletonMeta):
         """
 
         try:
-            embeddings = self._model.encode(input_text)
+            if self._embedding_cache is None:
+                embeddings = self._model.encode(input_text) if isinstance(input_text, str) else self._encode(input_text)
+            elif isinstance(input_text, str):
+                embeddings = self._embedding_cache.encode([input_text], self._encode)[0]
+            else:
+                embeddings = self._embedding_cache.encode(input_text, self._encode)
         except Exception:
             logger.error(f"Error generating embeddings for {self._model_id=} and {input_text=}")
 
@@ -113,6 +178,7 @@ class CrossEncoderModelSingleton(metaclass=SingletonMeta):
         self,
         model_id: str = settings.RERANKING_CROSS_ENCODER_MODEL_ID,
         device: str = settings.RAG_MODEL_DEVICE,
+        backend: str = settings.RAG_MODEL_BACKEND,
     ) -> None:
         """
         A singleton class that provides a pre-trained cross-encoder model for scoring pairs of input text.
@@ -120,12 +186,37 @@ class CrossEncoderModelSingleton(metaclass=SingletonMeta):
 
         self._model_id = model_id
         self._device = device
+        self._backend = backend
 
-        self._model = CrossEncoder(
-            model_name=self._model_id,
+        self._model = load_model(
+            CrossEncoder,
+            self._model_id,
+            backend=backend,
             device=self._device,
         )
-        self._model.model.eval()
+        self._model.eval()
+
+    @property
+    def model_id(self) -> str:
+        """
+        Returns the identifier of the pre-trained cross-encoder model to use.
+
+        Returns:
+            str: The identifier of the pre-trained cross-encoder model to use.
+        """
+
+        return self._model_id
+
+    @property
+    def backend(self) -> str:
+        """
+        Returns the inference backend the cross-encoder runs on.
+
+        Returns:
+            str: The inference backend the cross-encoder runs on.
+        """
+
+        return self._backend
 
     def __call__(self, pairs: list[tuple[str, str]], to_list: bool = True) -> NDArray[np.float32] | list[float]:
         scores = self._model.predict(pairs)
@@ -1,3 +1,5 @@
+from contextlib import contextmanager
+
 from loguru import logger
 
 from llm_engineering.domain.base import NoSQLBaseDocument, VectorBaseDocument
@@ -21,6 +23,7 @@ from .embedding_data_handlers import (
     PostEmbeddingHandler,
     QueryEmbeddingHandler,
     RepositoryEmbeddingHandler,
+    embedding_model,
 )
 
 
@@ -104,6 +107,14 @@ class EmbeddingHandlerFactory:
 class EmbeddingDispatcher:
     factory = EmbeddingHandlerFactory
 
+    @classmethod
+    @contextmanager
+    def multi_process(cls, num_workers: int | None = None, **pool_kwargs):
+        """Embed every batch dispatched inside the context through a pool of worker processes."""
+
+        with embedding_model.multi_process(num_workers=num_workers, **pool_kwargs):
+            yield cls
+
     @classmethod
     def dispatch(
         cls, data_model: VectorBaseDocument | list[VectorBaseDocument]
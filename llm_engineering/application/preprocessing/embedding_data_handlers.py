@@ -1,5 +1,8 @@
 from abc import ABC, abstractmethod
-from typing import Generic, TypeVar, cast
+from typing import Generic, TypeVar
+
+import numpy as np
+from numpy.typing import NDArray
 
 from llm_engineering.application.networks import EmbeddingModelSingleton
 from llm_engineering.domain.chunks import ArticleChunk, Chunk, PostChunk, RepositoryChunk
@@ -28,22 +31,23 @@ class EmbeddingDataHandler(ABC, Generic[ChunkT, EmbeddedChunkT]):
 
     def embed_batch(self, data_model: list[ChunkT]) -> list[EmbeddedChunkT]:
         embedding_model_input = [data_model.content for data_model in data_model]
-        embeddings = embedding_model(embedding_model_input, to_list=True)
+        # Keep the batch as one contiguous float32 matrix; each model gets a row view of it.
+        embeddings = embedding_model(embedding_model_input, to_list=False)
 
         embedded_chunk = [
-            self.map_model(data_model, cast(list[float], embedding))
+            self.map_model(data_model, embedding)
             for data_model, embedding in zip(data_model, embeddings, strict=False)
         ]
 
         return embedded_chunk
 
     @abstractmethod
-    def map_model(self, data_model: ChunkT, embedding: list[float]) -> EmbeddedChunkT:
+    def map_model(self, data_model: ChunkT, embedding: NDArray[np.float32]) -> EmbeddedChunkT:
         pass
 
 
 class QueryEmbeddingHandler(EmbeddingDataHandler):
-    def map_model(self, data_model: Query, embedding: list[float]) -> EmbeddedQuery:
+    def map_model(self, data_model: Query, embedding: NDArray[np.float32]) -> EmbeddedQuery:
         return EmbeddedQuery(
             id=data_model.id,
             author_id=data_model.author_id,
@@ -59,7 +63,7 @@ class QueryEmbeddingHandler(EmbeddingDataHandler):
 
 
 class PostEmbeddingHandler(EmbeddingDataHandler):
-    def map_model(self, data_model: PostChunk, embedding: list[float]) -> EmbeddedPostChunk:
+    def map_model(self, data_model: PostChunk, embedding: NDArray[np.float32]) -> EmbeddedPostChunk:
         return EmbeddedPostChunk(
             id=data_model.id,
             content=data_model.content,
@@ -77,7 +81,7 @@ class PostEmbeddingHandler(EmbeddingDataHandler):
 
 
 class ArticleEmbeddingHandler(EmbeddingDataHandler):
-    def map_model(self, data_model: ArticleChunk, embedding: list[float]) -> EmbeddedArticleChunk:
+    def map_model(self, data_model: ArticleChunk, embedding: NDArray[np.float32]) -> EmbeddedArticleChunk:
         return EmbeddedArticleChunk(
             id=data_model.id,
             content=data_model.content,
@@ -96,7 +100,7 @@ class ArticleEmbeddingHandler(EmbeddingDataHandler):
 
 
 class RepositoryEmbeddingHandler(EmbeddingDataHandler):
-    def map_model(self, data_model: RepositoryChunk, embedding: list[float]) -> EmbeddedRepositoryChunk:
+    def map_model(self, data_model: RepositoryChunk, embedding: NDArray[np.float32]) -> EmbeddedRepositoryChunk:
         return EmbeddedRepositoryChunk(
             id=data_model.id,
             content=data_model.content,
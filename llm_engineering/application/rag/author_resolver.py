@@ -0,0 +1,174 @@
+import functools
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+from loguru import logger
+
+from llm.rag.bm25_index import tokenize
+from llm_engineering.domain.documents import UserDocument
+from llm_engineering.settings import settings
+
+UUID_PATTERN = re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.IGNORECASE)
+
+_END = ""  # Tokens are never empty, so the empty string marks the end of a name in the trie.
+
+
+@dataclass(frozen=True)
+class AuthorResolution:
+    user: UserDocument | None
+    ambiguous: bool = False
+
+
+class AuthorResolver:
+    """
+    Finds known authors in a query without calling the LLM.
+
+    Every user's full name is inserted into a token trie, so a single pass over the query tokens finds all the names
+    it contains, and user ids written in the query are looked up directly. A query is only ambiguous, and left to the
+    LLM, when it matches several users or mentions just the first or last name of a known user. The index is rebuilt
+    from MongoDB in the background once it is older than refresh_seconds.
+
+    Until the first load succeeds every query is left to the LLM. A failed first load is retried after retry_seconds,
+    doubling up to refresh_seconds, so an unreachable MongoDB isn't queried synchronously on every request.
+    """
+
+    def __init__(self, refresh_seconds: float = 300.0, retry_seconds: float = 5.0) -> None:
+        self._refresh_seconds = refresh_seconds
+        self._retry_seconds = retry_seconds
+        self._trie: dict = {}
+        self._users_by_id: dict[str, UserDocument] = {}
+        self._partial_names: dict[str, set[str]] = {}
+        self._loaded_at: float | None = None
+        self._retry_delay = 0.0
+        self._retry_at = 0.0
+        self._refresh_lock = threading.Lock()
+
+        self.lookups = 0
+        self.resolved = 0
+        self.ambiguous = 0
+        self.unavailable = 0
+
+    def refresh(self) -> None:
+        users = UserDocument.bulk_find()
+
+        trie: dict = {}
+        partial_names: dict[str, set[str]] = {}
+        for user in users:
+            user_id = str(user.id)
+            node = trie
+            for token in tokenize(user.full_name):
+                node = node.setdefault(token, {})
+            node.setdefault(_END, set()).add(user_id)
+
+            for token in tokenize(user.first_name) + tokenize(user.last_name):
+                partial_names.setdefault(token, set()).add(user_id)
+
+        # Swap the new index in at once, so concurrent lookups see either the old or the new one.
+        self._trie, self._partial_names = trie, partial_names
+        self._users_by_id = {str(user.id): user for user in users}
+        self._loaded_at = time.monotonic()
+
+        logger.info(f"Author index loaded with {len(users)} users.")
+
+    def _maybe_refresh(self) -> bool:
+        """Loads or refreshes the index when due. Returns False while no index has been loaded yet."""
+
+        if self._loaded_at is None:
+            if time.monotonic() < self._retry_at:
+                return False
+
+            with self._refresh_lock:
+                if self._loaded_at is None and time.monotonic() >= self._retry_at:
+                    self._initial_load()
+
+            return self._loaded_at is not None
+
+        if time.monotonic() - self._loaded_at < self._refresh_seconds:
+            return True
+
+        if self._refresh_lock.acquire(blocking=False):
+            # Keep serving the current index while the new one is built.
+            self._loaded_at = time.monotonic()
+            threading.Thread(target=self._background_refresh, daemon=True).start()
+
+        return True
+
+    def _initial_load(self) -> None:
+        try:
+            self.refresh()
+        except Exception:
+            self._retry_delay = min(max(2 * self._retry_delay, self._retry_seconds), self._refresh_seconds)
+            self._retry_at = time.monotonic() + self._retry_delay
+            logger.exception(f"Failed to load the author index. Retrying in {self._retry_delay:.0f}s.")
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh()
+        except Exception:
+            logger.exception("Failed to refresh the author index.")
+        finally:
+            self._refresh_lock.release()
+
+    def resolve(self, text: str) -> AuthorResolution:
+        self.lookups += 1
+        if not self._maybe_refresh():
+            self.unavailable += 1
+
+            return AuthorResolution(user=None, ambiguous=True)
+
+        matched_ids = {user_id.lower() for user_id in UUID_PATTERN.findall(text)}
+        matched_ids &= self._users_by_id.keys()
+
+        tokens = tokenize(text)
+        covered = [False] * len(tokens)
+        for start in range(len(tokens)):
+            node = self._trie
+            for end in range(start, len(tokens)):
+                node = node.get(tokens[end])
+                if node is None:
+                    break
+                if _END in node:
+                    matched_ids.update(node[_END])
+                    covered[start : end + 1] = [True] * (end + 1 - start)
+
+        # A lone first or last name that could belong to someone other than the matched users.
+        partial_match = any(
+            self._partial_names.get(token, set()) - matched_ids
+            for token, is_covered in zip(tokens, covered, strict=True)
+            if not is_covered
+        )
+
+        if len(matched_ids) == 1 and not partial_match:
+            self.resolved += 1
+
+            return AuthorResolution(user=self._users_by_id[matched_ids.pop()])
+
+        if matched_ids or partial_match:
+            self.ambiguous += 1
+
+            return AuthorResolution(user=None, ambiguous=True)
+
+        return AuthorResolution(user=None)
+
+    def stats(self) -> dict:
+        return {
+            "lookups": self.lookups,
+            "resolved": self.resolved,
+            "ambiguous": self.ambiguous,
+            "unavailable": self.unavailable,
+            "match_rate": self.resolved / self.lookups if self.lookups else 0.0,
+            "llm_fallback_rate": (self.ambiguous + self.unavailable) / self.lookups if self.lookups else 0.0,
+            "users": len(self._users_by_id),
+        }
+
+
+@functools.cache
+def get_author_resolver() -> AuthorResolver | None:
+    """Process-wide resolver, so the index is loaded once and shared by every SelfQuery instance."""
+
+    if not settings.AUTHOR_RESOLVER_ENABLED:
+        return None
+
+    return AuthorResolver(refresh_seconds=settings.AUTHOR_RESOLVER_REFRESH_SECONDS)
@@ -0,0 +1,223 @@
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+
+from llm_engineering.settings import settings
+
+NUM_COLLECTIONS = 3
+
+SLA_TIERS: dict[str, float | None] = {
+    "interactive": 300.0,
+    "standard": 1500.0,
+    "batch": None,
+}
+
+# Quality order of the reranking modes, best first.
+RERANK_MODES = ["cross_encoder", "cascade", "vector"]
+
+
+class StageLatencyTracker:
+    """
+    Exponentially weighted moving average of the latency of every retrieval stage, shared by all retrievers in the
+    process. The priors only matter until the first requests have been observed.
+
+    A stage's estimate is pulled back toward its prior the longer the stage goes unobserved, halving the distance
+    every decay_half_life seconds. Otherwise a single slow run could make the planner skip a stage (e.g. query
+    expansion) for good, and without new observations the estimate would never come down again.
+    """
+
+    PRIORS_MS: dict[str, float] = {
+        "self_query": 400.0,
+        "expansion": 800.0,
+        "embedding_per_query": 10.0,
+        "search": 30.0,
+        "cross_encoder_per_pair": 5.0,
+        "vector_rerank": 1.0,
+    }
+
+    def __init__(
+        self,
+        alpha: float = 0.2,
+        decay_half_life: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._alpha = alpha
+        self._decay_half_life = decay_half_life
+        self._clock = clock
+        self._estimates_ms = dict(self.PRIORS_MS)
+        self._observed_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, latency_ms: float) -> None:
+        with self._lock:
+            previous = self._current(stage)
+            if previous is None:
+                self._estimates_ms[stage] = latency_ms
+            else:
+                self._estimates_ms[stage] = (1 - self._alpha) * previous + self._alpha * latency_ms
+            self._observed_at[stage] = self._clock()
+
+    def estimate(self, stage: str) -> float:
+        with self._lock:
+            current = self._current(stage)
+
+        return current if current is not None else 0.0
+
+    def snapshot(self) -> dict[str, float]:
+        with self._lock:
+            return {stage: round(self._current(stage), 2) for stage in self._estimates_ms}
+
+    def _current(self, stage: str) -> float | None:
+        estimate = self._estimates_ms.get(stage)
+        prior = self.PRIORS_MS.get(stage)
+        observed_at = self._observed_at.get(stage)
+        if estimate is None or prior is None or observed_at is None or not self._decay_half_life:
+            return estimate
+
+        weight = 0.5 ** ((self._clock() - observed_at) / self._decay_half_life)
+
+        return prior + weight * (estimate - prior)
+
+
+stage_latencies = StageLatencyTracker(decay_half_life=settings.RETRIEVAL_LATENCY_DECAY_HALF_LIFE)
+
+
+def cascade_size(num_candidates: int, keep_top_k: int, latency_budget_ms: float | None, ms_per_pair: float) -> int:
+    """
+    Number of candidates the cascade sends to the cross-encoder: as many as the latency budget pays for, or
+    RERANKING_CASCADE_TOP_M without a budget, never fewer than are kept.
+    """
+
+    top_m = settings.RERANKING_CASCADE_TOP_M
+    if latency_budget_ms is not None and ms_per_pair:
+        top_m = int(latency_budget_ms // ms_per_pair)
+
+    return max(keep_top_k, min(top_m, num_candidates))
+
+
+@dataclass(frozen=True)
+class RetrievalPlan:
+    expand_to_n_queries: int
+    limit_per_collection: int
+    rerank_mode: str
+    rerank_budget_ms: float | None
+    latency_budget_ms: float | None
+    estimated_ms: float
+    cascade_top_m: int | None = None
+
+    @property
+    def expand(self) -> bool:
+        return self.expand_to_n_queries > 1
+
+    def to_metadata(self) -> dict:
+        return {**asdict(self), "expand": self.expand, "estimated_ms": round(self.estimated_ms, 2)}
+
+
+class RetrievalPlanner:
+    """
+    Picks the retrieval knobs that fit a latency budget: how many query expansions to run (none at all when the
+    budget can't afford the LLM call), how many chunks to fetch per collection and which reranking mode to use.
+    Candidates are tried from the most to the least expensive, and the first whose estimated latency fits wins.
+    """
+
+    def __init__(self, tracker: StageLatencyTracker | None = None) -> None:
+        self._tracker = tracker or stage_latencies
+
+    def plan(
+        self,
+        k: int,
+        expand_to_n_queries: int,
+        latency_budget_ms: float | None = None,
+        sla_tier: str | None = None,
+        rerank_mode: str | None = None,
+        concurrent_expansion: bool = False,
+    ) -> RetrievalPlan:
+        sla_tier = sla_tier or settings.RETRIEVAL_DEFAULT_SLA_TIER
+        if latency_budget_ms is None and sla_tier is not None:
+            if sla_tier not in SLA_TIERS:
+                raise ValueError(f"Unsupported SLA tier '{sla_tier}'. Choose one of {list(SLA_TIERS)}.")
+            latency_budget_ms = SLA_TIERS[sla_tier]
+
+        base_limit = k // NUM_COLLECTIONS
+        default_mode = rerank_mode or settings.RERANKING_MODE
+        if latency_budget_ms is None:
+            return RetrievalPlan(
+                expand_to_n_queries=expand_to_n_queries,
+                limit_per_collection=base_limit,
+                rerank_mode=default_mode,
+                rerank_budget_ms=None,
+                latency_budget_ms=None,
+                estimated_ms=self._estimate(expand_to_n_queries, base_limit, default_mode, concurrent_expansion),
+            )
+
+        # An explicitly requested mode is the ceiling; the planner only ever falls back to cheaper ones.
+        modes = RERANK_MODES[RERANK_MODES.index(default_mode) :] if default_mode in RERANK_MODES else [default_mode]
+        for n_queries in range(expand_to_n_queries, 0, -1):
+            for mode in modes:
+                # With slack, a wider candidate pool per collection gives the reranker more to choose from.
+                for limit in (2 * base_limit, base_limit):
+                    estimated_ms = self._estimate(n_queries, limit, mode, concurrent_expansion)
+                    if estimated_ms <= latency_budget_ms:
+                        rerank_budget_ms = cascade_top_m = None
+                        if mode == "cascade":
+                            rerank_budget_ms, cascade_top_m, estimated_ms = self._plan_cascade(
+                                k, latency_budget_ms, estimated_ms, n_queries, limit
+                            )
+
+                        return RetrievalPlan(
+                            expand_to_n_queries=n_queries,
+                            limit_per_collection=limit,
+                            rerank_mode=mode,
+                            rerank_budget_ms=rerank_budget_ms,
+                            latency_budget_ms=latency_budget_ms,
+                            estimated_ms=estimated_ms,
+                            cascade_top_m=cascade_top_m,
+                        )
+
+        # Nothing fits: run the cheapest plan and fetch only the chunks that will be returned.
+        return RetrievalPlan(
+            expand_to_n_queries=1,
+            limit_per_collection=base_limit,
+            rerank_mode=modes[-1],
+            rerank_budget_ms=None,
+            latency_budget_ms=latency_budget_ms,
+            estimated_ms=self._estimate(1, base_limit, modes[-1], concurrent_expansion),
+        )
+
+    def _estimate(self, n_queries: int, limit: int, mode: str, concurrent_expansion: bool) -> float:
+        self_query_ms = self._tracker.estimate("self_query")
+        expansion_ms = self._tracker.estimate("expansion") if n_queries > 1 else 0.0
+        llm_ms = max(self_query_ms, expansion_ms) if concurrent_expansion else self_query_ms + expansion_ms
+
+        return (
+            llm_ms
+            + n_queries * self._tracker.estimate("embedding_per_query")
+            + self._tracker.estimate("search")
+            + self._rerank_estimate(n_queries, limit, mode)
+        )
+
+    def _rerank_estimate(self, n_queries: int, limit: int, mode: str) -> float:
+        num_candidates = n_queries * limit * NUM_COLLECTIONS
+        if mode == "vector":
+            return self._tracker.estimate("vector_rerank")
+        if mode == "cascade":
+            num_candidates = min(num_candidates, settings.RERANKING_CASCADE_TOP_M)
+
+        return num_candidates * self._tracker.estimate("cross_encoder_per_pair")
+
+    def _plan_cascade(
+        self, k: int, latency_budget_ms: float, estimated_ms: float, n_queries: int, limit: int
+    ) -> tuple[float, int, float]:
+        """
+        The cascade gets whatever the rest of the plan leaves, so it scores more pairs when there is slack. The number
+        of pairs that budget pays for is fixed here and passed to the reranker, and the plan's estimate is redone for
+        it. Returns the rerank budget, the cascade size and the new estimate.
+        """
+
+        rerank_ms = self._rerank_estimate(n_queries, limit, "cascade")
+        rerank_budget_ms = latency_budget_ms - estimated_ms + rerank_ms
+        ms_per_pair = self._tracker.estimate("cross_encoder_per_pair")
+        top_m = cascade_size(n_queries * limit * NUM_COLLECTIONS, k, rerank_budget_ms, ms_per_pair)
+
+        return rerank_budget_ms, top_m, estimated_ms - rerank_ms + top_m * ms_per_pair
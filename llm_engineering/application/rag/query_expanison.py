@@ -18,15 +18,30 @@ class QueryExpansion(RAGStep):
             return [query for _ in range(expand_to_n)]
 
         query_expansion_template = QueryExpansionTemplate()
+        response = self._chain(query_expansion_template, expand_to_n).invoke({"question": query})
+
+        return self._parse(query, response.content, query_expansion_template.separator)
+
+    @opik.track(name="QueryExpansion.agenerate")
+    async def agenerate(self, query: Query, expand_to_n: int) -> list[Query]:
+        assert expand_to_n > 0, f"'expand_to_n' should be greater than 0. Got {expand_to_n}."
+
+        if self._mock:
+            return [query for _ in range(expand_to_n)]
+
+        query_expansion_template = QueryExpansionTemplate()
+        response = await self._chain(query_expansion_template, expand_to_n).ainvoke({"question": query})
+
+        return self._parse(query, response.content, query_expansion_template.separator)
+
+    def _chain(self, query_expansion_template: QueryExpansionTemplate, expand_to_n: int):
         prompt = query_expansion_template.create_template(expand_to_n - 1)
         model = ChatOpenAI(model=settings.OPENAI_MODEL_ID, api_key=settings.OPENAI_API_KEY, temperature=0)
 
-        chain = prompt | model
-
-        response = chain.invoke({"question": query})
-        result = response.content
+        return prompt | model
 
-        queries_content = result.strip().split(query_expansion_template.separator)
+    def _parse(self, query: Query, result: str, separator: str) -> list[Query]:
+        queries_content = result.strip().split(separator)
 
         queries = [query]
         queries += [
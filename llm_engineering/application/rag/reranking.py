@@ -1,10 +1,57 @@
+import time
+
+import numpy as np
 import opik
+from loguru import logger
+from opik import opik_context
 
+from llm.rag.bm25_index import score_texts
+from llm_engineering.application import utils
 from llm_engineering.application.networks import CrossEncoderModelSingleton
 from llm_engineering.domain.embedded_chunks import EmbeddedChunk
 from llm_engineering.domain.queries import Query
+from llm_engineering.settings import settings
 
 from .base import RAGStep
+from .planner import cascade_size, stage_latencies
+from .score_cache import get_score_cache
+
+
+def maximal_marginal_relevance(
+    query_embedding: np.ndarray, embeddings: np.ndarray, keep_top_k: int, lambda_mult: float = 0.7
+) -> list[int]:
+    """
+    Greedy MMR selection.
+
+    Args:
+        query_embedding: Vector of the query.
+        embeddings: Candidate vectors stacked as a (n, dim) matrix.
+        keep_top_k: Number of candidates to select.
+        lambda_mult: Trade-off between relevance (1.0) and diversity (0.0).
+
+    Returns:
+        list[int]: Indices of the selected candidates, in selection order.
+    """
+
+    embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    query_embedding = query_embedding / max(float(np.linalg.norm(query_embedding)), 1e-12)
+
+    relevance = embeddings @ query_embedding
+    similarity = embeddings @ embeddings.T
+
+    selected = [int(np.argmax(relevance))]
+    max_similarity = similarity[selected[0]].copy()
+    available = np.ones(len(embeddings), dtype=bool)
+    available[selected[0]] = False
+    while len(selected) < min(keep_top_k, len(embeddings)):
+        mmr_scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        mmr_scores[~available] = -np.inf
+        best = int(np.argmax(mmr_scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+
+    return selected
 
 
 class Reranker(RAGStep):
@@ -12,14 +59,36 @@ class Reranker(RAGStep):
         super().__init__(mock=mock)
 
         self._model = CrossEncoderModelSingleton()
+        self._score_cache = get_score_cache(self._model.model_id, self._model.backend)
 
     @opik.track(name="Reranker.generate")
-    def generate(self, query: Query, chunks: list[EmbeddedChunk], keep_top_k: int) -> list[EmbeddedChunk]:
+    def generate(
+        self,
+        query: Query,
+        chunks: list[EmbeddedChunk],
+        keep_top_k: int,
+        mode: str | None = None,
+        latency_budget_ms: float | None = None,
+        query_embedding: np.ndarray | None = None,
+        cascade_top_m: int | None = None,
+    ) -> list[EmbeddedChunk]:
         if self._mock:
             return chunks
 
-        query_doc_tuples = [(query.content, chunk.content) for chunk in chunks]
-        scores = self._model(query_doc_tuples)
+        mode = mode or settings.RERANKING_MODE
+        if mode == "vector":
+            if query_embedding is not None and all(chunk.embedding is not None for chunk in chunks):
+                return self._mmr(query_embedding, chunks, keep_top_k)
+
+            logger.warning("Vector reranking needs the query and chunk embeddings. Falling back to the cross-encoder.")
+        elif mode == "cascade":
+            chunks = self._prune(
+                query, chunks, keep_top_k, latency_budget_ms or settings.RERANKING_LATENCY_BUDGET_MS, cascade_top_m
+            )
+        elif mode != "cross_encoder":
+            raise ValueError(f"Unsupported reranking mode '{mode}'.")
+
+        scores = self._score(query, chunks)
 
         scored_query_doc_tuples = list(zip(scores, chunks, strict=False))
         scored_query_doc_tuples.sort(key=lambda x: x[0], reverse=True)
@@ -28,3 +97,152 @@ class Reranker(RAGStep):
         reranked_documents = [doc for _, doc in reranked_documents]
 
         return reranked_documents
+
+    async def agenerate(
+        self,
+        query: Query,
+        chunks: list[EmbeddedChunk],
+        keep_top_k: int,
+        mode: str | None = None,
+        latency_budget_ms: float | None = None,
+        query_embedding: np.ndarray | None = None,
+        cascade_top_m: int | None = None,
+    ) -> list[EmbeddedChunk]:
+        # Cross-encoder inference is CPU bound, so it runs on the bounded executor instead of the event loop.
+        return await utils.run_in_executor(
+            self.generate,
+            query,
+            chunks,
+            keep_top_k,
+            mode=mode,
+            latency_budget_ms=latency_budget_ms,
+            query_embedding=query_embedding,
+            cascade_top_m=cascade_top_m,
+        )
+
+    def _mmr(
+        self, query_embedding: np.ndarray, chunks: list[EmbeddedChunk], keep_top_k: int
+    ) -> list[EmbeddedChunk]:
+        """
+        Model-free reranking over the vectors returned by Qdrant: cosine similarity to the query combined with
+        maximal marginal relevance, so near-duplicate chunks don't crowd out the rest of the context.
+        """
+
+        if not chunks:
+            return []
+
+        selected = maximal_marginal_relevance(
+            query_embedding,
+            np.stack([chunk.embedding for chunk in chunks]),
+            keep_top_k=keep_top_k,
+            lambda_mult=settings.RERANKING_MMR_LAMBDA,
+        )
+
+        return [chunks[i] for i in selected]
+
+    def _prune(
+        self,
+        query: Query,
+        chunks: list[EmbeddedChunk],
+        keep_top_k: int,
+        latency_budget_ms: float | None,
+        top_m: int | None = None,
+    ) -> list[EmbeddedChunk]:
+        """
+        First cascade stage: rank every candidate with a lexical BM25 score computed from the stored text and keep
+        only the top M for the cross-encoder. M is the one the retrieval plan was estimated with when given, and
+        otherwise fits the latency budget.
+        """
+
+        ms_per_pair = stage_latencies.estimate("cross_encoder_per_pair")
+        if top_m is None:
+            top_m = cascade_size(len(chunks), keep_top_k, latency_budget_ms, ms_per_pair)
+        top_m = max(keep_top_k, min(top_m, len(chunks)))
+
+        lexical_scores = score_texts(query.content, [chunk.content for chunk in chunks])
+        top_indices = np.argsort(-lexical_scores, kind="stable")[:top_m]
+        pruned = [chunks[i] for i in top_indices]
+
+        stats = {
+            "lexical_pairs": len(chunks),
+            "cross_encoder_pairs": len(pruned),
+            "latency_budget_ms": latency_budget_ms,
+            "ms_per_pair": ms_per_pair,
+        }
+        logger.info("Cascade reranking.", **stats)
+        opik_context.update_current_span(metadata={"cascade": stats})
+
+        return pruned
+
+    def _predict(self, pairs: list[tuple[str, str]]) -> list[float]:
+        start = time.perf_counter()
+        scores = self._model(pairs)
+        # The running per-pair cost sizes the cascade and the retrieval plans to their latency budgets.
+        stage_latencies.observe("cross_encoder_per_pair", (time.perf_counter() - start) * 1000 / max(len(pairs), 1))
+
+        return scores
+
+    def _score(self, query: Query, chunks: list[EmbeddedChunk]) -> list[float]:
+        if self._score_cache is None:
+            return self._predict([(query.content, chunk.content) for chunk in chunks])
+
+        chunk_ids = [str(chunk.id) for chunk in chunks]
+        cached_scores = self._score_cache.get_many(query.content, chunk_ids)
+
+        # Only the pairs missing from the cache go through the cross-encoder.
+        missing = [chunk for chunk, chunk_id in zip(chunks, chunk_ids, strict=True) if chunk_id not in cached_scores]
+        if missing:
+            new_scores = self._predict([(query.content, chunk.content) for chunk in missing])
+            new_scores = {str(chunk.id): score for chunk, score in zip(missing, new_scores, strict=True)}
+            self._score_cache.set_many(query.content, new_scores)
+            cached_scores.update(new_scores)
+
+        return [cached_scores[chunk_id] for chunk_id in chunk_ids]
+
+
+if __name__ == "__main__":
+    # Latency / quality of the vector (MMR) and cascade modes, using the cross-encoder ranking as the reference.
+    import argparse
+
+    from llm_engineering.application.rag.retriever import ContextRetriever
+
+    parser = argparse.ArgumentParser(description="Compare reranking modes")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument(
+        "queries",
+        nargs="*",
+        default=[
+            "My name is Paul Iusztin. Could you draft a LinkedIn post discussing RAG systems?",
+            "What are the best practices for fine-tuning LLMs on a budget?",
+            "How do vector databases index embeddings?",
+        ],
+    )
+    args = parser.parse_args()
+
+    # The result cache would turn every repeat after the first into a lookup.
+    retriever = ContextRetriever(mock=False, use_cache=False)
+    modes = ["cross_encoder", "cascade", "vector"]
+    latencies: dict[str, list[float]] = {mode: [] for mode in modes}
+    overlaps: dict[str, list[float]] = {mode: [] for mode in modes}
+    for query in args.queries:
+        results = {}
+        for mode in modes:
+            for _ in range(args.repeats):
+                # Score caching would hide the cross-encoder cost after the first repeat.
+                if retriever._reranker._score_cache is not None:
+                    retriever._reranker._score_cache._backend.clear()
+                start = time.perf_counter()
+                results[mode] = retriever.search(query, k=args.k, rerank_mode=mode)
+                latencies[mode].append((time.perf_counter() - start) * 1000)
+
+        reference = {chunk.id for chunk in results["cross_encoder"]}
+        for mode in modes:
+            overlaps[mode].append(len(reference & {chunk.id for chunk in results[mode]}) / max(len(reference), 1))
+
+    for mode in modes:
+        logger.info(
+            f"{mode:14s} p50 {np.percentile(latencies[mode], 50):8.1f} ms  "
+            f"p95 {np.percentile(latencies[mode], 95):8.1f} ms  "
+            f"overlap@{args.k} with cross-encoder {np.mean(overlaps[mode]):.2f}"
+        )
@@ -0,0 +1,107 @@
+import functools
+
+from loguru import logger
+from qdrant_client.http import exceptions
+
+from llm.cache.backends import create_backend
+from llm.cache.retrieval_cache import RetrievalCache
+from llm.vector_store.ingestion_stamps import IngestionStamps
+from llm_engineering.domain.embedded_chunks import (
+    EmbeddedArticleChunk,
+    EmbeddedChunk,
+    EmbeddedPostChunk,
+    EmbeddedRepositoryChunk,
+)
+from llm_engineering.infrastructure.db.qdrant import connection
+from llm_engineering.settings import settings
+
+SEARCHED_CHUNK_TYPES: list[type[EmbeddedChunk]] = [EmbeddedPostChunk, EmbeddedArticleChunk, EmbeddedRepositoryChunk]
+
+
+def collections_version() -> dict[str, list | None]:
+    """
+    Point count and ingestion stamp of every searched collection. Every bulk insert bumps the stamp in Qdrant, so any
+    ingestion, including one that only replaces points, moves all cached results to new keys in every process.
+    """
+
+    stamps = IngestionStamps(connection)
+    version = {}
+    for chunk_type in SEARCHED_CHUNK_TYPES:
+        collection_name = chunk_type.get_collection_name()
+        try:
+            version[collection_name] = [
+                connection.get_collection(collection_name).points_count,
+                stamps.stamp(collection_name),
+            ]
+        except exceptions.UnexpectedResponse:
+            version[collection_name] = None
+
+    return version
+
+
+class RetrievalResultCache:
+    """
+    Caches the final, reranked chunks of ContextRetriever.search keyed by the normalized query, the retrieval
+    parameters and the version of the searched collections.
+    """
+
+    def __init__(self, cache: RetrievalCache) -> None:
+        self._cache = cache
+
+    @classmethod
+    def from_settings(cls) -> "RetrievalResultCache | None":
+        backend = create_backend(
+            settings.RETRIEVAL_CACHE_BACKEND,
+            path=settings.RETRIEVAL_CACHE_PATH,
+            max_size=settings.RETRIEVAL_CACHE_MAX_SIZE,
+            table="retrieval_results",
+            url=settings.RETRIEVAL_CACHE_URL,
+        )
+        if backend is None:
+            return None
+
+        cache = RetrievalCache(
+            backend,
+            version_fn=collections_version,
+            ttl=settings.RETRIEVAL_CACHE_TTL,
+            version_check_interval=settings.RETRIEVAL_CACHE_VERSION_CHECK_INTERVAL,
+        )
+
+        return cls(cache)
+
+    def get(self, query: str, **params) -> list[EmbeddedChunk] | None:
+        try:
+            cached = self._cache.get(query, **params)
+        except Exception:
+            logger.exception("Retrieval cache lookup failed.")
+
+            return None
+
+        if cached is None:
+            return None
+
+        return [
+            EmbeddedChunk.collection_name_to_class(item["collection"])(**item["document"]) for item in cached
+        ]
+
+    def set(self, query: str, chunks: list[EmbeddedChunk], **params) -> None:
+        value = [
+            {"collection": chunk.get_collection_name(), "document": chunk.model_dump(mode="json")} for chunk in chunks
+        ]
+        try:
+            self._cache.set(query, value, **params)
+        except Exception:
+            logger.exception("Retrieval cache write failed.")
+
+    def invalidate(self) -> None:
+        self._cache.invalidate()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+@functools.cache
+def get_result_cache() -> RetrievalResultCache | None:
+    """Process-wide cache, so results are shared by every ContextRetriever instance."""
+
+    return RetrievalResultCache.from_settings()
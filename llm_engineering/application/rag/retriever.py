@@ -1,7 +1,11 @@
+import asyncio
 import concurrent.futures
+import time
 
+import numpy as np
 import opik
 from loguru import logger
+from opik import opik_context
 from qdrant_client.models import FieldCondition, Filter, MatchValue
 
 from llm_engineering.application import utils
@@ -13,17 +17,33 @@ from llm_engineering.domain.embedded_chunks import (
     EmbeddedRepositoryChunk,
 )
 from llm_engineering.domain.queries import EmbeddedQuery, Query
+from llm_engineering.settings import settings
 
+from .planner import RetrievalPlanner, stage_latencies
 from .query_expanison import QueryExpansion
 from .reranking import Reranker
+from .result_cache import get_result_cache
 from .self_query import SelfQuery
 
 
 class ContextRetriever:
-    def __init__(self, mock: bool = False) -> None:
+    def __init__(self, mock: bool = False, use_cache: bool = True) -> None:
         self._query_expander = QueryExpansion(mock=mock)
         self._metadata_extractor = SelfQuery(mock=mock)
         self._reranker = Reranker(mock=mock)
+        self._result_cache = get_result_cache() if use_cache and not mock else None
+        self._planner = RetrievalPlanner()
+
+    def self_query(self, query: str) -> Query:
+        """
+        Runs only the self-query step. Callers that need the resolved author before searching, e.g. to key an answer
+        cache on it, pass the result to search as query_model so the step doesn't run twice.
+        """
+
+        return self._metadata_extractor.generate(Query.from_str(query))
+
+    async def aself_query(self, query: str) -> Query:
+        return await self._metadata_extractor.agenerate(Query.from_str(query))
 
     @opik.track(name="ContextRetriever.search")
     def search(
@@ -31,76 +51,332 @@ class ContextRetriever:
         query: str,
         k: int = 3,
         expand_to_n_queries: int = 3,
+        rerank_mode: str | None = None,
+        latency_budget_ms: float | None = None,
+        sla_tier: str | None = None,
+        query_model: Query | None = None,
     ) -> list:
-        query_model = Query.from_str(query)
-
-        query_model = self._metadata_extractor.generate(query_model)
+        # The author filter comes from an LLM and a refreshing name index, so it is resolved before the cache lookup
+        # and keyed on instead of the query text standing in for it.
+        timings = {}
+        if query_model is None:
+            start = time.perf_counter()
+            query_model = self.self_query(query)
+            timings["self_query"] = time.perf_counter() - start
         logger.info(
             f"Successfully extracted the author_full_name = {query_model.author_full_name} from the query.",
         )
 
-        n_generated_queries = self._query_expander.generate(query_model, expand_to_n=expand_to_n_queries)
+        cache_params = self._cache_params(
+            k, expand_to_n_queries, rerank_mode, latency_budget_ms, sla_tier, author_id=query_model.author_id
+        )
+        if self._result_cache is not None and (cached := self._result_cache.get(query, **cache_params)) is not None:
+            logger.info(f"{len(cached)} documents served from the retrieval cache.")
+            opik_context.update_current_span(metadata={"retrieval_cache_hit": True})
+
+            return cached
+
+        plan = self._planner.plan(
+            k,
+            expand_to_n_queries,
+            latency_budget_ms=latency_budget_ms,
+            sla_tier=sla_tier,
+            rerank_mode=rerank_mode,
+        )
+        logger.info("Retrieval plan.", **plan.to_metadata())
+        opik_context.update_current_span(metadata={"retrieval_plan": plan.to_metadata()})
+
+        if plan.expand:
+            start = time.perf_counter()
+            n_generated_queries = self._query_expander.generate(query_model, expand_to_n=plan.expand_to_n_queries)
+            logger.info(
+                f"Successfully generated {len(n_generated_queries)} search queries.",
+            )
+            timings["expansion"] = time.perf_counter() - start
+        else:
+            n_generated_queries = [query_model]
+
+        # Embed every distinct query in a single forward pass, then batch the vector searches per collection.
+        start = time.perf_counter()
+        unique_queries = list({_query_model.content: _query_model for _query_model in n_generated_queries}.values())
+        embedded_queries: list[EmbeddedQuery] = EmbeddingDispatcher.dispatch(unique_queries)
+        timings["embedding"] = time.perf_counter() - start
+
+        # The vector reranking mode works on the stored chunk vectors, so they have to come back with the search.
+        start = time.perf_counter()
+        n_k_documents = self._search_batch(
+            embedded_queries,
+            k,
+            with_vectors=plan.rerank_mode == "vector",
+            limit=plan.limit_per_collection,
+        )
+        n_k_documents = list(set(n_k_documents))
+        timings["search"] = time.perf_counter() - start
+
+        logger.info(f"{len(n_k_documents)} documents retrieved successfully")
+
+        start = time.perf_counter()
+        if len(n_k_documents) > 0:
+            k_documents = self.rerank(
+                query,
+                chunks=n_k_documents,
+                keep_top_k=k,
+                mode=plan.rerank_mode,
+                latency_budget_ms=plan.rerank_budget_ms,
+                query_embedding=embedded_queries[0].embedding,
+                cascade_top_m=plan.cascade_top_m,
+            )
+        else:
+            k_documents = []
+        timings["rerank"] = time.perf_counter() - start
+
+        self._record_timings(timings, num_queries=len(embedded_queries), rerank_mode=plan.rerank_mode)
+
+        if self._result_cache is not None and k_documents:
+            self._result_cache.set(query, k_documents, **cache_params)
+
+        return k_documents
+
+    @opik.track(name="ContextRetriever.asearch")
+    async def asearch(
+        self,
+        query: str,
+        k: int = 3,
+        expand_to_n_queries: int = 3,
+        rerank_mode: str | None = None,
+        latency_budget_ms: float | None = None,
+        sla_tier: str | None = None,
+        query_model: Query | None = None,
+    ) -> list:
+        """
+        Non-blocking version of search: LLM and Qdrant calls are awaited, while the embedding and reranking models run
+        on the bounded executor, so a single event loop can keep many retrievals in flight.
+        """
+
+        timings = {}
+        resolved = query_model is not None
+        if self._result_cache is not None:
+            # The resolved author is part of the cache key, so self-query can't overlap with expansion here.
+            if not resolved:
+                query_model, timings["self_query"] = await self._timed(self.aself_query(query))
+                resolved = True
+
+            cache_params = self._cache_params(
+                k, expand_to_n_queries, rerank_mode, latency_budget_ms, sla_tier, author_id=query_model.author_id
+            )
+            # The lookup may refresh the collections' version over the synchronous Qdrant client.
+            cached = await utils.run_in_executor(self._result_cache.get, query, **cache_params)
+            if cached is not None:
+                logger.info(f"{len(cached)} documents served from the retrieval cache.")
+                opik_context.update_current_span(metadata={"retrieval_cache_hit": True})
+
+                return cached
+
+        plan = self._planner.plan(
+            k,
+            expand_to_n_queries,
+            latency_budget_ms=latency_budget_ms,
+            sla_tier=sla_tier,
+            rerank_mode=rerank_mode,
+            concurrent_expansion=True,
+        )
+        logger.info("Retrieval plan.", **plan.to_metadata())
+        opik_context.update_current_span(metadata={"retrieval_plan": plan.to_metadata()})
+
+        if not resolved:
+            query_model = Query.from_str(query)
+
+        # Query expansion only needs the query text, so it runs concurrently with the self-query step.
+        if plan.expand:
+            expansion = self._timed(
+                self._query_expander.agenerate(query_model.model_copy(), expand_to_n=plan.expand_to_n_queries)
+            )
+            if resolved:
+                n_generated_queries, timings["expansion"] = await expansion
+            else:
+                results = await asyncio.gather(self._timed(self._metadata_extractor.agenerate(query_model)), expansion)
+                (query_model, timings["self_query"]), (n_generated_queries, timings["expansion"]) = results
+            for generated_query in n_generated_queries:
+                generated_query.author_id = query_model.author_id
+                generated_query.author_full_name = query_model.author_full_name
+        else:
+            if not resolved:
+                query_model, timings["self_query"] = await self._timed(self._metadata_extractor.agenerate(query_model))
+            n_generated_queries = [query_model]
+        logger.info(
+            f"Successfully extracted the author_full_name = {query_model.author_full_name} from the query.",
+        )
         logger.info(
             f"Successfully generated {len(n_generated_queries)} search queries.",
         )
 
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            search_tasks = [executor.submit(self._search, _query_model, k) for _query_model in n_generated_queries]
+        start = time.perf_counter()
+        unique_queries = list({_query_model.content: _query_model for _query_model in n_generated_queries}.values())
+        embedded_queries: list[EmbeddedQuery] = await utils.run_in_executor(
+            EmbeddingDispatcher.dispatch, unique_queries
+        )
+        timings["embedding"] = time.perf_counter() - start
 
-            n_k_documents = [task.result() for task in concurrent.futures.as_completed(search_tasks)]
-            n_k_documents = utils.misc.flatten(n_k_documents)
-            n_k_documents = list(set(n_k_documents))
+        start = time.perf_counter()
+        n_k_documents = await self._asearch_batch(
+            embedded_queries,
+            k,
+            with_vectors=plan.rerank_mode == "vector",
+            limit=plan.limit_per_collection,
+        )
+        n_k_documents = list(set(n_k_documents))
+        timings["search"] = time.perf_counter() - start
 
         logger.info(f"{len(n_k_documents)} documents retrieved successfully")
 
+        start = time.perf_counter()
         if len(n_k_documents) > 0:
-            k_documents = self.rerank(query, chunks=n_k_documents, keep_top_k=k)
+            k_documents = await self._reranker.agenerate(
+                query=Query.from_str(query),
+                chunks=n_k_documents,
+                keep_top_k=k,
+                mode=plan.rerank_mode,
+                latency_budget_ms=plan.rerank_budget_ms,
+                query_embedding=embedded_queries[0].embedding,
+                cascade_top_m=plan.cascade_top_m,
+            )
+            logger.info(f"{len(k_documents)} documents reranked successfully.")
         else:
             k_documents = []
+        timings["rerank"] = time.perf_counter() - start
+
+        self._record_timings(timings, num_queries=len(embedded_queries), rerank_mode=plan.rerank_mode)
+
+        if self._result_cache is not None and k_documents:
+            await utils.run_in_executor(self._result_cache.set, query, k_documents, **cache_params)
 
         return k_documents
 
-    def _search(self, query: Query, k: int = 3) -> list[EmbeddedChunk]:
+    @staticmethod
+    def _cache_params(
+        k: int,
+        expand_to_n_queries: int,
+        rerank_mode: str | None,
+        latency_budget_ms: float | None,
+        sla_tier: str | None,
+        author_id=None,
+    ) -> dict:
+        return {
+            "author_id": str(author_id) if author_id else None,
+            "k": k,
+            "expand_to_n_queries": expand_to_n_queries,
+            "rerank_mode": rerank_mode or settings.RERANKING_MODE,
+            "latency_budget_ms": latency_budget_ms,
+            "sla_tier": sla_tier or settings.RETRIEVAL_DEFAULT_SLA_TIER,
+        }
+
+    @staticmethod
+    async def _timed(awaitable):
+        start = time.perf_counter()
+        result = await awaitable
+
+        return result, time.perf_counter() - start
+
+    @staticmethod
+    def _record_timings(timings: dict[str, float], num_queries: int, rerank_mode: str) -> None:
+        timings_ms = {stage: round(seconds * 1000, 2) for stage, seconds in timings.items()}
+        logger.info("Retrieval stage timings (ms).", **timings_ms)
+        opik_context.update_current_span(metadata={"stage_timings_ms": timings_ms})
+
+        # Feed the live estimates the planner uses for the next requests. The cross-encoder cost per pair is
+        # recorded by the reranker itself.
+        for stage in ("self_query", "expansion", "search"):
+            if stage in timings_ms:
+                stage_latencies.observe(stage, timings_ms[stage])
+        stage_latencies.observe("embedding_per_query", timings_ms["embedding"] / max(num_queries, 1))
+        if rerank_mode == "vector":
+            stage_latencies.observe("vector_rerank", timings_ms["rerank"])
+
+    def _search(self, query: EmbeddedQuery, k: int = 3, with_vectors: bool = False) -> list[EmbeddedChunk]:
+        return self._search_batch([query], k, with_vectors=with_vectors)
+
+    def _search_batch(
+        self, queries: list[EmbeddedQuery], k: int = 3, with_vectors: bool = False, limit: int | None = None
+    ) -> list[EmbeddedChunk]:
+        """
+        Searches every query against every data category with one batched request per collection, instead of one
+        request per (query, collection) pair. The collections are queried concurrently.
+        """
+
         assert k >= 3, "k should be >= 3"
 
-        def _search_data_category(
-            data_category_odm: type[EmbeddedChunk], embedded_query: EmbeddedQuery
-        ) -> list[EmbeddedChunk]:
-            if embedded_query.author_id:
-                query_filter = Filter(
-                    must=[
-                        FieldCondition(
-                            key="author_id",
-                            match=MatchValue(
-                                value=str(embedded_query.author_id),
-                            ),
-                        )
-                    ]
-                )
-            else:
-                query_filter = None
+        query_filters = self._query_filters(queries)
 
-            return data_category_odm.search(
-                query_vector=embedded_query.embedding,
-                limit=k // 3,
-                query_filter=query_filter,
+        def _search_data_category(data_category_odm: type[EmbeddedChunk]) -> list[EmbeddedChunk]:
+            documents = data_category_odm.search_batch(
+                query_vectors=[query.embedding for query in queries],
+                limit=limit or k // 3,
+                query_filters=query_filters,
+                query_texts=[query.content for query in queries],
+                with_vectors=with_vectors,
             )
 
-        embedded_query: EmbeddedQuery = EmbeddingDispatcher.dispatch(query)
+            return utils.misc.flatten(documents)
 
-        post_chunks = _search_data_category(EmbeddedPostChunk, embedded_query)
-        articles_chunks = _search_data_category(EmbeddedArticleChunk, embedded_query)
-        repositories_chunks = _search_data_category(EmbeddedRepositoryChunk, embedded_query)
-
-        retrieved_chunks = post_chunks + articles_chunks + repositories_chunks
+        data_categories = [EmbeddedPostChunk, EmbeddedArticleChunk, EmbeddedRepositoryChunk]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(data_categories)) as executor:
+            retrieved_chunks = utils.misc.flatten(list(executor.map(_search_data_category, data_categories)))
 
         return retrieved_chunks
 
-    def rerank(self, query: str | Query, chunks: list[EmbeddedChunk], keep_top_k: int) -> list[EmbeddedChunk]:
+    async def _asearch_batch(
+        self, queries: list[EmbeddedQuery], k: int = 3, with_vectors: bool = False, limit: int | None = None
+    ) -> list[EmbeddedChunk]:
+        assert k >= 3, "k should be >= 3"
+
+        query_filters = self._query_filters(queries)
+        data_categories = [EmbeddedPostChunk, EmbeddedArticleChunk, EmbeddedRepositoryChunk]
+        documents = await asyncio.gather(
+            *[
+                data_category_odm.asearch_batch(
+                    query_vectors=[query.embedding for query in queries],
+                    limit=limit or k // 3,
+                    query_filters=query_filters,
+                    query_texts=[query.content for query in queries],
+                    with_vectors=with_vectors,
+                )
+                for data_category_odm in data_categories
+            ]
+        )
+
+        return utils.misc.flatten(utils.misc.flatten(documents))
+
+    @staticmethod
+    def _query_filters(queries: list[EmbeddedQuery]) -> list[Filter | None]:
+        return [
+            Filter(must=[FieldCondition(key="author_id", match=MatchValue(value=str(query.author_id)))])
+            if query.author_id
+            else None
+            for query in queries
+        ]
+
+    def rerank(
+        self,
+        query: str | Query,
+        chunks: list[EmbeddedChunk],
+        keep_top_k: int,
+        mode: str | None = None,
+        latency_budget_ms: float | None = None,
+        query_embedding: np.ndarray | None = None,
+        cascade_top_m: int | None = None,
+    ) -> list[EmbeddedChunk]:
         if isinstance(query, str):
             query = Query.from_str(query)
 
-        reranked_documents = self._reranker.generate(query=query, chunks=chunks, keep_top_k=keep_top_k)
+        reranked_documents = self._reranker.generate(
+            query=query,
+            chunks=chunks,
+            keep_top_k=keep_top_k,
+            mode=mode,
+            latency_budget_ms=latency_budget_ms,
+            query_embedding=query_embedding,
+            cascade_top_m=cascade_top_m,
+        )
 
         logger.info(f"{len(reranked_documents)} documents reranked successfully.")
 
@@ -0,0 +1,64 @@
+import functools
+import hashlib
+
+from llm.cache.backends import CacheBackend, create_backend, normalize_query
+from llm_engineering.settings import settings
+
+
+class CrossEncoderScoreCache:
+    """
+    Caches cross-encoder scores keyed by (model id, inference backend, normalized query text, chunk id).
+    """
+
+    def __init__(self, backend: CacheBackend, model_id: str, model_backend: str, ttl: float | None = None) -> None:
+        self._backend = backend
+        self._model_id = model_id
+        self._model_backend = model_backend
+        self._ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_settings(cls, model_id: str, model_backend: str) -> "CrossEncoderScoreCache | None":
+        backend = create_backend(
+            settings.RERANKING_SCORE_CACHE_BACKEND,
+            path=settings.RERANKING_SCORE_CACHE_PATH,
+            max_size=settings.RERANKING_SCORE_CACHE_MAX_SIZE,
+            table="cross_encoder_scores",
+        )
+        if backend is None:
+            return None
+
+        return cls(backend, model_id=model_id, model_backend=model_backend, ttl=settings.RERANKING_SCORE_CACHE_TTL)
+
+    def key(self, query: str, chunk_id: str) -> str:
+        digest = hashlib.sha1(normalize_query(query).encode("utf-8")).hexdigest()
+
+        return f"{self._model_id}@{self._model_backend}:{digest}:{chunk_id}"
+
+    def get_many(self, query: str, chunk_ids: list[str]) -> dict[str, float]:
+        keys = {self.key(query, chunk_id): chunk_id for chunk_id in chunk_ids}
+        found = self._backend.get_many(keys)
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+
+        return {keys[key]: score for key, score in found.items()}
+
+    def set_many(self, query: str, scores: dict[str, float]) -> None:
+        self._backend.set_many(
+            {self.key(query, chunk_id): float(score) for chunk_id, score in scores.items()}, ttl=self._ttl
+        )
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+@functools.cache
+def get_score_cache(model_id: str, model_backend: str) -> CrossEncoderScoreCache | None:
+    """Process-wide cache per model and backend, so scores outlive the per-request Reranker instances."""
+
+    return CrossEncoderScoreCache.from_settings(model_id=model_id, model_backend=model_backend)
@@ -1,29 +1,83 @@
 import opik
 from langchain_openai import ChatOpenAI
 from loguru import logger
+from opik import opik_context
 
 from llm_engineering.application import utils
 from llm_engineering.domain.documents import UserDocument
 from llm_engineering.domain.queries import Query
 from llm_engineering.settings import settings
 
+from .author_resolver import get_author_resolver
 from .base import RAGStep
 from .prompt_templates import SelfQueryTemplate
 
 
 class SelfQuery(RAGStep):
+    def __init__(self, mock: bool = False) -> None:
+        super().__init__(mock=mock)
+
+        self._author_resolver = get_author_resolver() if not mock else None
+
     @opik.track(name="SelfQuery.generate")
     def generate(self, query: Query) -> Query:
         if self._mock:
             return query
 
+        if self._resolve_locally(query):
+            return query
+
+        response = self._chain().invoke({"question": query})
+
+        return self._attach_author(query, response.content)
+
+    @opik.track(name="SelfQuery.agenerate")
+    async def agenerate(self, query: Query) -> Query:
+        if self._mock:
+            return query
+
+        if self._resolve_locally(query):
+            return query
+
+        response = await self._chain().ainvoke({"question": query})
+
+        # The user lookup goes to MongoDB through a blocking driver.
+        return await utils.run_in_executor(self._attach_author, query, response.content)
+
+    def _resolve_locally(self, query: Query) -> bool:
+        """
+        Resolves the author through the in-memory index. Returns False when the LLM has to decide, either because the
+        query is ambiguous or because the index is unavailable.
+        """
+
+        if self._author_resolver is None:
+            return False
+
+        try:
+            resolution = self._author_resolver.resolve(query.content)
+        except Exception:
+            logger.exception("Author resolver failed. Falling back to the LLM.")
+
+            return False
+
+        opik_context.update_current_span(metadata={"author_resolver": self._author_resolver.stats()})
+        if resolution.ambiguous:
+            return False
+
+        if resolution.user is not None:
+            query.author_id = resolution.user.id
+            query.author_full_name = resolution.user.full_name
+
+        return True
+
+    def _chain(self):
         prompt = SelfQueryTemplate().create_template()
         model = ChatOpenAI(model=settings.OPENAI_MODEL_ID, api_key=settings.OPENAI_API_KEY, temperature=0)
 
-        chain = prompt | model
+        return prompt | model
 
-        response = chain.invoke({"question": query})
-        user_full_name = response.content.strip("\n ")
+    def _attach_author(self, query: Query, response_content: str) -> Query:
+        user_full_name = response_content.strip("\n ")
 
         if user_full_name == "none":
             return query
@@ -1,4 +1,5 @@
 from . import misc
+from .concurrency import run_in_executor
 from .split_user_full_name import split_user_full_name
 
-__all__ = ["misc", "split_user_full_name"]
+__all__ = ["misc", "run_in_executor", "split_user_full_name"]
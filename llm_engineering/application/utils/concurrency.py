@@ -0,0 +1,34 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from llm_engineering.settings import settings
+
+R = TypeVar("R")
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Process-wide executor for blocking work (model inference, MongoDB, SageMaker) called from async code."""
+
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.RAG_EXECUTOR_MAX_WORKERS, thread_name_prefix="rag")
+
+    return _executor
+
+
+async def run_in_executor(func: Callable[..., R], *args, **kwargs) -> R:
+    """
+    Runs a blocking callable on the bounded executor without blocking the event loop.
+
+    The caller's context is copied into the worker thread so opik spans opened there nest under the current trace.
+    """
+
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), call)
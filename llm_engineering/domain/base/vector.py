@@ -1,5 +1,6 @@
 import uuid
 from abc import ABC
+from dataclasses import replace
 from typing import Any, Callable, Dict, Generic, Type, TypeVar
 from uuid import UUID
 
@@ -7,16 +8,34 @@ import numpy as np
 from loguru import logger
 from pydantic import UUID4, BaseModel, Field
 from qdrant_client.http import exceptions
-from qdrant_client.http.models import Distance, VectorParams
-from qdrant_client.models import CollectionInfo, PointStruct, Record
-
+from qdrant_client.models import (
+    CollectionInfo,
+    Fusion,
+    FusionQuery,
+    Filter,
+    PointStruct,
+    Prefetch,
+    QueryRequest,
+    Record,
+    SparseVector,
+)
+
+from llm.rag.sparse import SPARSE_VECTOR_NAME, SparseEncoder
+from llm.vector_store.collection_config import PRESETS, CollectionConfig
+from llm.vector_store.ingestion_stamps import IngestionStamps
+from llm.vector_store.payload_indexes import ensure_payload_indexes
 from llm_engineering.application.networks.embeddings import EmbeddingModelSingleton
 from llm_engineering.domain.exceptions import ImproperlyConfigured
 from llm_engineering.domain.types import DataCategory
-from llm_engineering.infrastructure.db.qdrant import connection
+from llm_engineering.infrastructure.db.qdrant import async_connection, connection
 
 T = TypeVar("T", bound="VectorBaseDocument")
 
+sparse_encoder = SparseEncoder()
+
+# Whether each collection was created with the sparse vector, so points and queries match the actual schema.
+_sparse_vector_support: dict[str, bool] = {}
+
 
 class VectorBaseDocument(BaseModel, Generic[T], ABC):
     id: UUID4 = Field(default_factory=uuid.uuid4)
@@ -40,7 +59,10 @@ class VectorBaseDocument(BaseModel, Generic[T], ABC):
             **payload,
         }
         if cls._has_class_attribute("embedding"):
-            attributes["embedding"] = point.vector or None
+            vector = point.vector
+            if isinstance(vector, dict):
+                vector = vector.get("")
+            attributes["embedding"] = vector or None
 
         return cls(**attributes)
 
@@ -52,8 +74,10 @@ class VectorBaseDocument(BaseModel, Generic[T], ABC):
 
         _id = str(payload.pop("id"))
         vector = payload.pop("embedding", {})
-        if vector and isinstance(vector, np.ndarray):
+        if isinstance(vector, np.ndarray):
             vector = vector.tolist()
+        if vector and self.uses_sparse_vectors():
+            vector = {"": vector, SPARSE_VECTOR_NAME: sparse_encoder.encode_document(self.content)}
 
         return PointStruct(id=_id, vector=vector, payload=payload)
 
@@ -81,6 +105,11 @@ class VectorBaseDocument(BaseModel, Generic[T], ABC):
         try:
             cls._bulk_insert(documents)
         except exceptions.UnexpectedResponse:
+            if connection.collection_exists(cls.get_collection_name()):
+                logger.exception(f"Failed to insert documents in '{cls.get_collection_name()}'.")
+
+                return False
+
             logger.info(
                 f"Collection '{cls.get_collection_name()}' does not exist. Trying to create the collection and reinsert the documents."
             )
@@ -94,13 +123,36 @@ class VectorBaseDocument(BaseModel, Generic[T], ABC):
 
                 return False
 
+        # Cached retrieval results in every process key on the stamp, so they miss from now on.
+        IngestionStamps(connection).bump(cls.get_collection_name())
+
         return True
 
     @classmethod
     def _bulk_insert(cls: Type[T], documents: list["VectorBaseDocument"]) -> None:
-        points = [doc.to_point() for doc in documents]
-
-        connection.upsert(collection_name=cls.get_collection_name(), points=points)
+        embeddings = [getattr(doc, "embedding", None) for doc in documents]
+        if not all(isinstance(embedding, np.ndarray) and embedding.size > 0 for embedding in embeddings):
+            points = [doc.to_point() for doc in documents]
+            connection.upsert(collection_name=cls.get_collection_name(), points=points)
+
+            return
+
+        # Hand the vectors to Qdrant as one float32 matrix so they are only converted batch by batch on upload.
+        payloads = [doc.model_dump(exclude={"embedding"}) for doc in documents]
+        ids = [payload.pop("id") for payload in payloads]
+        vectors = np.stack(embeddings)
+        if cls.uses_sparse_vectors():
+            vectors = (
+                {"": row.tolist(), SPARSE_VECTOR_NAME: sparse_encoder.encode_document(doc.content)}
+                for row, doc in zip(vectors, documents, strict=True)
+            )
+        connection.upload_collection(
+            collection_name=cls.get_collection_name(),
+            vectors=vectors,
+            payload=payloads,
+            ids=ids,
+            wait=True,
+        )
 
     @classmethod
     def bulk_find(cls: Type[T], limit: int = 10, **kwargs) -> tuple[list[T], UUID | None]:
@@ -135,9 +187,11 @@ class VectorBaseDocument(BaseModel, Generic[T], ABC):
         return documents, next_offset
 
     @classmethod
-    def search(cls: Type[T], query_vector: list, limit: int = 10, **kwargs) -> list[T]:
+    def search(
+        cls: Type[T], query_vector: list, limit: int = 10, hnsw_ef: int | None = None, exact: bool = False, **kwargs
+    ) -> list[T]:
         try:
-            documents = cls._search(query_vector=query_vector, limit=limit, **kwargs)
+            documents = cls._search(query_vector=query_vector, limit=limit, hnsw_ef=hnsw_ef, exact=exact, **kwargs)
         except exceptions.UnexpectedResponse:
             logger.error(f"Failed to search documents in '{cls.get_collection_name()}'.")
 
@@ -146,20 +200,242 @@ class VectorBaseDocument(BaseModel, Generic[T], ABC):
         return documents
 
     @classmethod
-    def _search(cls: Type[T], query_vector: list, limit: int = 10, **kwargs) -> list[T]:
+    def _search(
+        cls: Type[T], query_vector: list, limit: int = 10, hnsw_ef: int | None = None, exact: bool = False, **kwargs
+    ) -> list[T]:
         collection_name = cls.get_collection_name()
+        search_params = kwargs.pop("search_params", None) or cls.get_collection_config().search_params(
+            hnsw_ef=hnsw_ef, exact=exact
+        )
         records = connection.search(
             collection_name=collection_name,
             query_vector=query_vector,
             limit=limit,
             with_payload=kwargs.pop("with_payload", True),
             with_vectors=kwargs.pop("with_vectors", False),
+            search_params=search_params,
             **kwargs,
         )
         documents = [cls.from_record(record) for record in records]
 
         return documents
 
+    @classmethod
+    def hybrid_search(
+        cls: Type[T], query_vector: list, query_text: str, limit: int = 10, prefetch_limit: int | None = None, **kwargs
+    ) -> list[T]:
+        """
+        Runs the dense and the sparse (BM25) search in a single request and fuses them with reciprocal rank fusion.
+        Collections without the sparse vector, and failed hybrid requests, fall back to the dense search.
+        """
+
+        if not cls.uses_sparse_vectors():
+            return cls.search(query_vector=query_vector, limit=limit, **kwargs)
+
+        try:
+            documents = cls._hybrid_search(
+                query_vector=query_vector,
+                query_sparse_vector=sparse_encoder.encode_query(query_text),
+                limit=limit,
+                prefetch_limit=prefetch_limit,
+                **kwargs,
+            )
+        except exceptions.UnexpectedResponse:
+            logger.warning(f"Hybrid search failed in '{cls.get_collection_name()}'. Falling back to dense search.")
+
+            documents = cls.search(query_vector=query_vector, limit=limit, **kwargs)
+
+        return documents
+
+    @classmethod
+    def _hybrid_search(
+        cls: Type[T],
+        query_vector: list,
+        query_sparse_vector: SparseVector,
+        limit: int = 10,
+        prefetch_limit: int | None = None,
+        **kwargs,
+    ) -> list[T]:
+        query_filter = kwargs.pop("query_filter", None)
+        prefetch_limit = prefetch_limit or limit * 2
+        search_params = kwargs.pop("search_params", None) or cls.get_collection_config().search_params(
+            hnsw_ef=kwargs.pop("hnsw_ef", None)
+        )
+
+        response = connection.query_points(
+            collection_name=cls.get_collection_name(),
+            prefetch=[
+                Prefetch(query=query_vector, filter=query_filter, limit=prefetch_limit, params=search_params),
+                Prefetch(
+                    query=query_sparse_vector, using=SPARSE_VECTOR_NAME, filter=query_filter, limit=prefetch_limit
+                ),
+            ],
+            query=FusionQuery(fusion=Fusion.RRF),
+            limit=limit,
+            with_payload=kwargs.pop("with_payload", True),
+            with_vectors=kwargs.pop("with_vectors", False),
+            **kwargs,
+        )
+        documents = [cls.from_record(point) for point in response.points]
+
+        return documents
+
+    @classmethod
+    def search_batch(
+        cls: Type[T],
+        query_vectors: list,
+        limit: int = 10,
+        query_filters: list[Filter | None] | None = None,
+        query_texts: list[str] | None = None,
+        **kwargs,
+    ) -> list[list[T]]:
+        """
+        Runs one search per query vector in a single round trip to the collection. When query_texts are given and the
+        collection stores sparse vectors, every search is a hybrid (dense + BM25) search fused with RRF; if that fails,
+        the batch is retried as dense searches.
+        """
+
+        try:
+            return cls._search_batch(
+                query_vectors=query_vectors, limit=limit, query_filters=query_filters, query_texts=query_texts, **kwargs
+            )
+        except exceptions.UnexpectedResponse:
+            if query_texts is None or not cls.uses_sparse_vectors():
+                logger.error(f"Failed to batch search documents in '{cls.get_collection_name()}'.")
+
+                return [[] for _ in query_vectors]
+
+        logger.warning(f"Hybrid batch search failed in '{cls.get_collection_name()}'. Falling back to dense search.")
+        try:
+            return cls._search_batch(query_vectors=query_vectors, limit=limit, query_filters=query_filters, **kwargs)
+        except exceptions.UnexpectedResponse:
+            logger.error(f"Failed to batch search documents in '{cls.get_collection_name()}'.")
+
+            return [[] for _ in query_vectors]
+
+    @classmethod
+    def _search_batch(
+        cls: Type[T],
+        query_vectors: list,
+        limit: int = 10,
+        query_filters: list[Filter | None] | None = None,
+        query_texts: list[str] | None = None,
+        **kwargs,
+    ) -> list[list[T]]:
+        if len(query_vectors) == 0:
+            return []
+
+        hybrid = query_texts is not None and cls.uses_sparse_vectors()
+        requests = cls._batch_query_requests(query_vectors, limit, query_filters, query_texts, hybrid, kwargs)
+        responses = connection.query_batch_points(
+            collection_name=cls.get_collection_name(), requests=requests, **kwargs
+        )
+        documents = [[cls.from_record(point) for point in response.points] for response in responses]
+
+        return documents
+
+    @classmethod
+    async def asearch_batch(
+        cls: Type[T],
+        query_vectors: list,
+        limit: int = 10,
+        query_filters: list[Filter | None] | None = None,
+        query_texts: list[str] | None = None,
+        **kwargs,
+    ) -> list[list[T]]:
+        """
+        Same as search_batch, but over the async Qdrant client so the event loop is free while the request is in flight.
+        """
+
+        if len(query_vectors) == 0:
+            return []
+
+        try:
+            return await cls._asearch_batch(query_vectors, limit, query_filters, query_texts, **kwargs)
+        except exceptions.UnexpectedResponse:
+            if query_texts is None or not await cls.auses_sparse_vectors():
+                logger.error(f"Failed to batch search documents in '{cls.get_collection_name()}'.")
+
+                return [[] for _ in query_vectors]
+
+        logger.warning(f"Hybrid batch search failed in '{cls.get_collection_name()}'. Falling back to dense search.")
+        try:
+            return await cls._asearch_batch(query_vectors, limit, query_filters, None, **kwargs)
+        except exceptions.UnexpectedResponse:
+            logger.error(f"Failed to batch search documents in '{cls.get_collection_name()}'.")
+
+            return [[] for _ in query_vectors]
+
+    @classmethod
+    async def _asearch_batch(
+        cls: Type[T],
+        query_vectors: list,
+        limit: int,
+        query_filters: list[Filter | None] | None,
+        query_texts: list[str] | None,
+        **kwargs,
+    ) -> list[list[T]]:
+        # Checked over the async client, so a cold sparse-vector lookup doesn't block the event loop.
+        hybrid = query_texts is not None and await cls.auses_sparse_vectors()
+        requests = cls._batch_query_requests(query_vectors, limit, query_filters, query_texts, hybrid, kwargs)
+        responses = await async_connection.query_batch_points(
+            collection_name=cls.get_collection_name(), requests=requests, **kwargs
+        )
+        documents = [[cls.from_record(point) for point in response.points] for response in responses]
+
+        return documents
+
+    @classmethod
+    def _batch_query_requests(
+        cls: Type[T],
+        query_vectors: list,
+        limit: int,
+        query_filters: list[Filter | None] | None,
+        query_texts: list[str] | None,
+        hybrid: bool,
+        kwargs: dict,
+    ) -> list[QueryRequest]:
+        """Builds one dense or hybrid query per vector, popping the search options it consumes from kwargs."""
+
+        query_filters = query_filters or [None] * len(query_vectors)
+        prefetch_limit = kwargs.pop("prefetch_limit", None) or limit * 2
+        search_params = kwargs.pop("search_params", None) or cls.get_collection_config().search_params(
+            hnsw_ef=kwargs.pop("hnsw_ef", None), exact=kwargs.pop("exact", False)
+        )
+        with_payload = kwargs.pop("with_payload", True)
+        with_vectors = kwargs.pop("with_vectors", False)
+
+        requests = []
+        for i, (query_vector, query_filter) in enumerate(zip(query_vectors, query_filters, strict=True)):
+            if hybrid:
+                request = QueryRequest(
+                    prefetch=[
+                        Prefetch(query=query_vector, filter=query_filter, limit=prefetch_limit, params=search_params),
+                        Prefetch(
+                            query=sparse_encoder.encode_query(query_texts[i]),
+                            using=SPARSE_VECTOR_NAME,
+                            filter=query_filter,
+                            limit=prefetch_limit,
+                        ),
+                    ],
+                    query=FusionQuery(fusion=Fusion.RRF),
+                    limit=limit,
+                    with_payload=with_payload,
+                    with_vector=with_vectors,
+                )
+            else:
+                request = QueryRequest(
+                    query=query_vector,
+                    filter=query_filter,
+                    params=search_params,
+                    limit=limit,
+                    with_payload=with_payload,
+                    with_vector=with_vectors,
+                )
+            requests.append(request)
+
+        return requests
+
     @classmethod
     def get_or_create_collection(cls: Type[T]) -> CollectionInfo:
         collection_name = cls.get_collection_name()
@@ -187,11 +463,146 @@ class VectorBaseDocument(BaseModel, Generic[T], ABC):
     @classmethod
     def _create_collection(cls, collection_name: str, use_vector_index: bool = True) -> bool:
         if use_vector_index is True:
-            vectors_config = VectorParams(size=EmbeddingModelSingleton().embedding_size, distance=Distance.COSINE)
+            create_kwargs = cls.get_collection_config().create_kwargs(EmbeddingModelSingleton().embedding_size)
         else:
-            vectors_config = {}
+            create_kwargs = {"vectors_config": {}}
+
+        collection_created = connection.create_collection(collection_name=collection_name, **create_kwargs)
+        _sparse_vector_support.pop(collection_name, None)
+        if collection_created:
+            cls.ensure_payload_indexes()
+
+        return collection_created
+
+    @classmethod
+    def uses_sparse_vectors(cls: Type[T]) -> bool:
+        """
+        Whether points and queries carry the BM25 sparse vector: it must be declared in the Config class and present in
+        the collection. A collection created before the sparse vector was declared keeps working dense-only until it
+        is migrated with migrate_to_sparse_vectors().
+        """
+
+        if not cls.get_use_sparse_vectors():
+            return False
+
+        collection_name = cls.get_collection_name()
+        if collection_name not in _sparse_vector_support:
+            try:
+                info = connection.get_collection(collection_name=collection_name)
+            except exceptions.UnexpectedResponse:
+                # Not created yet, so it will be created from the Config, sparse vector included.
+                return True
+
+            cls._record_sparse_vector_support(info)
+
+        return _sparse_vector_support[collection_name]
+
+    @classmethod
+    async def auses_sparse_vectors(cls: Type[T]) -> bool:
+        """Same as uses_sparse_vectors, but reads the collection over the async Qdrant client when it isn't cached."""
+
+        if not cls.get_use_sparse_vectors():
+            return False
+
+        collection_name = cls.get_collection_name()
+        if collection_name not in _sparse_vector_support:
+            try:
+                info = await async_connection.get_collection(collection_name=collection_name)
+            except exceptions.UnexpectedResponse:
+                return True
+
+            cls._record_sparse_vector_support(info)
+
+        return _sparse_vector_support[collection_name]
+
+    @classmethod
+    def _record_sparse_vector_support(cls: Type[T], info: CollectionInfo) -> None:
+        collection_name = cls.get_collection_name()
+        _sparse_vector_support[collection_name] = SPARSE_VECTOR_NAME in (info.config.params.sparse_vectors or {})
+        if not _sparse_vector_support[collection_name]:
+            logger.warning(
+                f"Collection '{collection_name}' has no '{SPARSE_VECTOR_NAME}' sparse vector. Using dense search "
+                f"only until {cls.__name__}.migrate_to_sparse_vectors() is run."
+            )
+
+    @classmethod
+    def migrate_to_sparse_vectors(cls: Type[T], batch_size: int = 256) -> int:
+        """
+        Rebuilds a collection created without the sparse vector, adding the BM25 vector of every point's content.
+
+        The points are copied to a temporary collection, the collection is recreated from the Config class and the
+        points are copied back, so searches return nothing while it runs. Returns the number of migrated points.
+        """
+
+        collection_name = cls.get_collection_name()
+        _sparse_vector_support.pop(collection_name, None)
+        if not cls.get_use_sparse_vectors() or cls.uses_sparse_vectors():
+            return 0
+
+        vectors_config = connection.get_collection(collection_name=collection_name).config.params.vectors
+        vector_size = vectors_config.get("").size if isinstance(vectors_config, dict) else vectors_config.size
+        create_kwargs = cls.get_collection_config().create_kwargs(vector_size)
+
+        temporary_name = f"{collection_name}_sparse_migration"
+        if connection.collection_exists(temporary_name):
+            connection.delete_collection(temporary_name)
+        connection.create_collection(collection_name=temporary_name, **create_kwargs)
+        migrated = cls._copy_with_sparse_vectors(collection_name, temporary_name, batch_size)
+
+        connection.delete_collection(collection_name)
+        connection.create_collection(collection_name=collection_name, **create_kwargs)
+        cls.ensure_payload_indexes()
+        cls._copy_with_sparse_vectors(temporary_name, collection_name, batch_size)
+        connection.delete_collection(temporary_name)
+        _sparse_vector_support[collection_name] = True
+        IngestionStamps(connection).bump(collection_name)
+
+        logger.info(f"Added sparse vectors to {migrated} points of '{collection_name}'.")
+
+        return migrated
+
+    @classmethod
+    def _copy_with_sparse_vectors(cls: Type[T], source: str, target: str, batch_size: int) -> int:
+        copied, offset = 0, None
+        while True:
+            records, offset = connection.scroll(
+                collection_name=source, limit=batch_size, offset=offset, with_payload=True, with_vectors=True
+            )
+            points = []
+            for record in records:
+                vector = record.vector.get("") if isinstance(record.vector, dict) else record.vector
+                sparse_vector = sparse_encoder.encode_document((record.payload or {}).get("content", ""))
+                vectors = {"": vector, SPARSE_VECTOR_NAME: sparse_vector}
+                points.append(PointStruct(id=record.id, vector=vectors, payload=record.payload))
+            if points:
+                connection.upsert(collection_name=target, points=points, wait=True)
+                copied += len(points)
+            if offset is None:
+                return copied
+
+    @classmethod
+    def ensure_payload_indexes(cls: Type[T]) -> list[str]:
+        """
+        Creates the payload indexes declared as 'payload_indexes' in the Config class that the collection is missing
+        (or has with another type). Indexes that already match are left untouched, so it's safe to call at startup.
+        """
+
+        payload_indexes = cls.get_payload_indexes()
+        if not payload_indexes:
+            return []
+
+        collection_name = cls.get_collection_name()
+        try:
+            changed = ensure_payload_indexes(connection, collection_name, payload_indexes)
+        except exceptions.UnexpectedResponse:
+            logger.warning(f"Collection '{collection_name}' does not exist yet. Skipping its payload indexes.")
 
-        return connection.create_collection(collection_name=collection_name, vectors_config=vectors_config)
+            return []
+
+        if changed:
+            logger.info(f"Created payload indexes in '{collection_name}'.", fields=changed)
+
+        return changed
 
     @classmethod
     def get_category(cls: Type[T]) -> DataCategory:
@@ -219,6 +630,41 @@ class VectorBaseDocument(BaseModel, Generic[T], ABC):
 
         return cls.Config.use_vector_index
 
+    @classmethod
+    def get_payload_indexes(cls: Type[T]) -> dict[str, str]:
+        """Payload fields to index, mapped to their type: 'keyword', 'integer', 'datetime' or 'tenant'."""
+
+        if not hasattr(cls, "Config") or not hasattr(cls.Config, "payload_indexes"):
+            return {}
+
+        return cls.Config.payload_indexes
+
+    @classmethod
+    def get_use_sparse_vectors(cls: Type[T]) -> bool:
+        if not hasattr(cls, "Config") or not hasattr(cls.Config, "use_sparse_vectors"):
+            return False
+
+        return cls.Config.use_sparse_vectors
+
+    @classmethod
+    def get_collection_config(cls: Type[T]) -> CollectionConfig:
+        """
+        Returns the quantization, on-disk and HNSW layout declared as 'collection_config' in the Config class.
+        A preset name ("default", "scalar", "product", "binary") or a CollectionConfig instance is accepted.
+        """
+
+        collection_config = getattr(getattr(cls, "Config", None), "collection_config", "default")
+        if isinstance(collection_config, str):
+            if collection_config not in PRESETS:
+                raise ImproperlyConfigured(f"Unknown collection config preset '{collection_config}'.")
+
+            collection_config = PRESETS[collection_config]
+
+        if cls.get_use_sparse_vectors():
+            collection_config = replace(collection_config, sparse_vectors=True)
+
+        return collection_config
+
     @classmethod
     def group_by_class(
         cls: Type["VectorBaseDocument"], documents: list["VectorBaseDocument"]
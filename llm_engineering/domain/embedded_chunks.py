@@ -2,14 +2,14 @@ from abc import ABC
 
 from pydantic import UUID4, Field
 
-from llm_engineering.domain.types import DataCategory
+from llm_engineering.domain.types import DataCategory, Embedding
 
 from .base import VectorBaseDocument
 
 
 class EmbeddedChunk(VectorBaseDocument, ABC):
     content: str
-    embedding: list[float] | None
+    embedding: Embedding | None
     platform: str
     document_id: UUID4
     author_id: UUID4
@@ -36,6 +36,8 @@ class EmbeddedPostChunk(EmbeddedChunk):
         name = "embedded_posts"
         category = DataCategory.POSTS
         use_vector_index = True
+        use_sparse_vectors = True
+        payload_indexes = {"author_id": "keyword"}
 
 
 class EmbeddedArticleChunk(EmbeddedChunk):
@@ -45,6 +47,8 @@ class EmbeddedArticleChunk(EmbeddedChunk):
         name = "embedded_articles"
         category = DataCategory.ARTICLES
         use_vector_index = True
+        use_sparse_vectors = True
+        payload_indexes = {"author_id": "keyword"}
 
 
 class EmbeddedRepositoryChunk(EmbeddedChunk):
@@ -55,3 +59,47 @@ class EmbeddedRepositoryChunk(EmbeddedChunk):
         name = "embedded_repositories"
         category = DataCategory.REPOSITORIES
         use_vector_index = True
+        use_sparse_vectors = True
+        payload_indexes = {"author_id": "keyword"}
+
+
+if __name__ == "__main__":
+    import tracemalloc
+    import uuid
+
+    import numpy as np
+    from loguru import logger
+
+    num_chunks, embedding_size = 100_000, 384
+    matrix = np.random.rand(num_chunks, embedding_size).astype(np.float32)
+
+    def build_chunks(embeddings) -> list[EmbeddedArticleChunk]:
+        author_id = uuid.uuid4()
+        return [
+            EmbeddedArticleChunk(
+                content="",
+                embedding=embedding,
+                platform="medium",
+                document_id=author_id,
+                author_id=author_id,
+                author_full_name="",
+                link="",
+            )
+            for embedding in embeddings
+        ]
+
+    def measure(fn) -> tuple[float, float]:
+        tracemalloc.start()
+        result = fn()  # noqa: F841
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return current / 2**20, peak / 2**20
+
+    # Before: every embedding was boxed into a Python list of floats.
+    current, peak = measure(lambda: matrix.tolist())
+    logger.info(f"list[float] embeddings: {current:.1f} MiB retained, {peak:.1f} MiB peak for {num_chunks} chunks")
+
+    # After: chunks hold row views of the contiguous float32 batch matrix.
+    current, peak = measure(lambda: build_chunks(matrix))
+    logger.info(f"float32 chunks: {current:.1f} MiB retained, {peak:.1f} MiB peak for {num_chunks} chunks")
@@ -1,4 +1,37 @@
 from enum import StrEnum
+from typing import Annotated, Any
+
+import numpy as np
+from numpy.typing import NDArray
+from pydantic import PlainSerializer, PlainValidator, WithJsonSchema
+
+
+def _to_float32_array(value: Any) -> NDArray[np.float32]:
+    """Validate an embedding as a contiguous float32 array, without copying arrays that already are one."""
+
+    try:
+        # asarray, since ascontiguousarray would silently turn a scalar into a 1-element vector
+        array = np.asarray(value, dtype=np.float32)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"An embedding must be a flat sequence of numbers: {e}") from e
+
+    # Reject corrupt vectors here rather than inside Qdrant.
+    if array.ndim != 1:
+        raise ValueError(f"An embedding must be one-dimensional, got shape {array.shape}.")
+    if array.size == 0:
+        raise ValueError("An embedding must not be empty.")
+    if not np.isfinite(array).all():
+        raise ValueError("An embedding must not contain NaN or infinite values.")
+
+    return np.ascontiguousarray(array)
+
+
+Embedding = Annotated[
+    NDArray[np.float32],
+    PlainValidator(_to_float32_array),
+    PlainSerializer(lambda value: value.tolist(), when_used="json"),
+    WithJsonSchema({"type": "array", "items": {"type": "number"}}),
+]
 
 
 class DataCategory(StrEnum):
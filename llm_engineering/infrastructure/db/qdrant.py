@@ -1,7 +1,8 @@
 from loguru import logger
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient, QdrantClient
 from qdrant_client.http.exceptions import UnexpectedResponse
 
+from llm.vector_store.embedded import AsyncEmbeddedVectorClient, get_embedded_client
 from llm_engineering.settings import settings
 
 
@@ -10,6 +11,12 @@ class QdrantDatabaseConnector:
 
     def __new__(cls, *args, **kwargs) -> QdrantClient:
         if cls._instance is None:
+            if settings.VECTOR_BACKEND == "embedded":
+                cls._instance = get_embedded_client(settings.EMBEDDED_VECTOR_PATH)
+                logger.info(f"Using the embedded vector backend at: {settings.EMBEDDED_VECTOR_PATH}")
+
+                return cls._instance
+
             try:
                 if settings.USE_QDRANT_CLOUD:
                     cls._instance = QdrantClient(
@@ -40,4 +47,26 @@ class QdrantDatabaseConnector:
         return cls._instance
 
 
+class AsyncQdrantDatabaseConnector:
+    _instance: AsyncQdrantClient | None = None
+
+    def __new__(cls, *args, **kwargs) -> AsyncQdrantClient:
+        if cls._instance is None:
+            if settings.VECTOR_BACKEND == "embedded":
+                cls._instance = AsyncEmbeddedVectorClient(get_embedded_client(settings.EMBEDDED_VECTOR_PATH))
+            elif settings.USE_QDRANT_CLOUD:
+                cls._instance = AsyncQdrantClient(
+                    url=settings.QDRANT_CLOUD_URL,
+                    api_key=settings.QDRANT_APIKEY,
+                )
+            else:
+                cls._instance = AsyncQdrantClient(
+                    host=settings.QDRANT_DATABASE_HOST,
+                    port=settings.QDRANT_DATABASE_PORT,
+                )
+
+        return cls._instance
+
+
 connection = QdrantDatabaseConnector()
+async_connection = AsyncQdrantDatabaseConnector()
@@ -1,12 +1,23 @@
+import asyncio
+
 import opik
 from fastapi import FastAPI, HTTPException
 from opik import opik_context
 from pydantic import BaseModel
 
+from llm.cache.semantic_cache import SemanticCache, SemanticCacheHit
 from llm_engineering import settings
+from llm_engineering.application.networks import EmbeddingModelSingleton
+from llm_engineering.application.rag.result_cache import collections_version
 from llm_engineering.application.rag.retriever import ContextRetriever
-from llm_engineering.application.utils import misc
-from llm_engineering.domain.embedded_chunks import EmbeddedChunk
+from llm_engineering.application.utils import misc, run_in_executor
+from llm_engineering.domain.embedded_chunks import (
+    EmbeddedArticleChunk,
+    EmbeddedChunk,
+    EmbeddedPostChunk,
+    EmbeddedRepositoryChunk,
+)
+from llm_engineering.domain.queries import Query
 from llm_engineering.infrastructure.opik_utils import configure_opik
 from llm_engineering.model.inference import InferenceExecutor, LLMInferenceSagemakerEndpoint
 
@@ -15,6 +26,31 @@ configure_opik()
 app = FastAPI()
 
 
+# Answers to paraphrased questions are served from here instead of running retrieval and generation again. They
+# are keyed on the same collection versions as the retrieval cache, so every ingestion retires them.
+semantic_cache = (
+    SemanticCache(
+        model_version=f"{settings.HF_MODEL_ID}|{settings.TEXT_EMBEDDING_MODEL_ID}",
+        threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+        ttl=settings.SEMANTIC_CACHE_TTL,
+        max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+        version_fn=collections_version,
+        version_check_interval=settings.RETRIEVAL_CACHE_VERSION_CHECK_INTERVAL,
+    )
+    if settings.SEMANTIC_CACHE_ENABLED
+    else None
+)
+
+
+@app.on_event("startup")
+def ensure_payload_indexes() -> None:
+    # The retriever filters on author_id, which scans every payload in the collection unless it is indexed.
+    for embedded_chunk_odm in [EmbeddedArticleChunk, EmbeddedPostChunk, EmbeddedRepositoryChunk]:
+        embedded_chunk_odm.ensure_payload_indexes()
+        # Logs a migration hint for collections created before sparse vectors were declared.
+        embedded_chunk_odm.uses_sparse_vectors()
+
+
 class QueryRequest(BaseModel):
     query: str
 
@@ -33,13 +69,91 @@ def call_llm_service(query: str, context: str | None) -> str:
     return answer
 
 
+def embed_query(query: str) -> list[float]:
+    return EmbeddingModelSingleton()(query, to_list=True)
+
+
+def semantic_cache_scope(query_model: Query) -> dict:
+    """A paraphrase only shares an answer with questions resolved to the same author."""
+
+    return {"author_id": query_model.author_id}
+
+
+def semantic_cache_lookup(query_embedding: list[float] | None, query_model: Query | None) -> SemanticCacheHit | None:
+    if semantic_cache is None or not query_embedding or query_model is None:
+        return None
+
+    hit = semantic_cache.lookup(query_embedding, scope=semantic_cache_scope(query_model))
+    opik_context.update_current_trace(
+        metadata={
+            "semantic_cache_hit": hit is not None,
+            "semantic_cache_similarity": hit.similarity if hit else None,
+            "semantic_cache": semantic_cache.stats(),
+        },
+    )
+
+    return hit
+
+
+def semantic_cache_store(
+    query_embedding: list[float] | None, query_model: Query | None, query: str, answer: str, context: str
+) -> None:
+    # The embedding model returns an empty vector when it fails, which would never match anything.
+    if semantic_cache is None or not query_embedding or query_model is None:
+        return
+
+    semantic_cache.put(query_embedding, query, answer, context, scope=semantic_cache_scope(query_model))
+
+
 @opik.track
 def rag(query: str) -> str:
     retriever = ContextRetriever(mock=False)
-    documents = retriever.search(query, k=3)
+    query_model = retriever.self_query(query) if semantic_cache is not None else None
+    query_embedding = embed_query(query) if semantic_cache is not None else None
+    if (hit := semantic_cache_lookup(query_embedding, query_model)) is not None:
+        return hit.answer
+
+    documents = retriever.search(query, k=3, query_model=query_model)
     context = EmbeddedChunk.to_context(documents)
 
     answer = call_llm_service(query, context)
+    semantic_cache_store(query_embedding, query_model, query, answer, context)
+
+    opik_context.update_current_trace(
+        tags=["rag"],
+        metadata={
+            "model_id": settings.HF_MODEL_ID,
+            "embedding_model_id": settings.TEXT_EMBEDDING_MODEL_ID,
+            "temperature": settings.TEMPERATURE_INFERENCE,
+            "query_tokens": misc.compute_num_tokens(query),
+            "context_tokens": misc.compute_num_tokens(context),
+            "answer_tokens": misc.compute_num_tokens(answer),
+        },
+    )
+
+    return answer
+
+
+@opik.track
+async def arag(query: str) -> str:
+    retriever = ContextRetriever(mock=False)
+    query_model = None
+    query_embedding = None
+    if semantic_cache is not None:
+        query_model, query_embedding = await asyncio.gather(
+            retriever.aself_query(query), run_in_executor(embed_query, query)
+        )
+    # The lookup may refresh the collections' version over the synchronous Qdrant client.
+    if (hit := await run_in_executor(semantic_cache_lookup, query_embedding, query_model)) is not None:
+        return hit.answer
+
+    documents = await retriever.asearch(query, k=3, query_model=query_model)
+    context = EmbeddedChunk.to_context(documents)
+
+    # The SageMaker runtime client is synchronous.
+    answer = await run_in_executor(call_llm_service, query, context)
+    # Like the lookup, storing may refresh the collections' version over the synchronous Qdrant client.
+    await run_in_executor(semantic_cache_store, query_embedding, query_model, query, answer, context)
 
     opik_context.update_current_trace(
         tags=["rag"],
@@ -59,8 +173,16 @@ def rag(query: str) -> str:
 @app.post("/rag", response_model=QueryResponse)
 async def rag_endpoint(request: QueryRequest):
     try:
-        answer = rag(query=request.query)
+        answer = await arag(query=request.query)
 
         return {"answer": answer}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@app.get("/rag/cache")
+async def rag_cache_endpoint():
+    if semantic_cache is None:
+        return {"enabled": False}
+
+    return {"enabled": True, **semantic_cache.stats()}
@@ -33,6 +33,9 @@ class Settings(BaseSettings):
     QDRANT_DATABASE_PORT: int = 6333
     QDRANT_CLOUD_URL: str = "str"
     QDRANT_APIKEY: str | None = None
+    # "embedded" runs the vector store in-process on EMBEDDED_VECTOR_PATH, without a Qdrant server.
+    VECTOR_BACKEND: str = "qdrant"  # qdrant | embedded
+    EMBEDDED_VECTOR_PATH: str = "data/vector_index"
 
     # AWS Authentication
     AWS_REGION: str = "eu-central-1"
@@ -63,6 +66,37 @@ class Settings(BaseSettings):
     TEXT_EMBEDDING_MODEL_ID: str = "sentence-transformers/all-MiniLM-L6-v2"
     RERANKING_CROSS_ENCODER_MODEL_ID: str = "cross-encoder/ms-marco-MiniLM-L-4-v2"
     RAG_MODEL_DEVICE: str = "cpu"
+    RAG_MODEL_BACKEND: str = "torch"  # torch | onnx | onnx-int8
+    RAG_ONNX_CACHE_DIR: str = ".cache/onnx"
+    RAG_ONNX_QUANTIZATION_CONFIG: str = "avx2"  # arm64 | avx2 | avx512 | avx512_vnni
+    RAG_ONNX_PARITY_THRESHOLD: float = 0.99  # Minimum cosine similarity of exported embeddings
+    RAG_ONNX_SCORE_TOLERANCE: float = 0.1  # Maximum absolute error of exported cross-encoder logits
+    RAG_EXECUTOR_MAX_WORKERS: int = 4
+    RERANKING_SCORE_CACHE_BACKEND: str = "memory"  # memory | sqlite | none
+    RERANKING_SCORE_CACHE_PATH: str | None = ".cache/rerank_scores.sqlite"
+    RERANKING_SCORE_CACHE_MAX_SIZE: int = 100000
+    RERANKING_SCORE_CACHE_TTL: float | None = 24 * 60 * 60
+    RERANKING_MODE: str = "cross_encoder"  # cross_encoder | cascade | vector
+    RERANKING_CASCADE_TOP_M: int = 10
+    RERANKING_LATENCY_BUDGET_MS: float | None = None
+    RERANKING_MMR_LAMBDA: float = 0.7
+    RETRIEVAL_CACHE_BACKEND: str = "memory"  # memory | sqlite | redis | none
+    RETRIEVAL_CACHE_PATH: str | None = ".cache/retrieval.sqlite"
+    RETRIEVAL_CACHE_URL: str | None = None  # e.g. redis://localhost:6379/0
+    RETRIEVAL_CACHE_MAX_SIZE: int = 10000
+    RETRIEVAL_CACHE_TTL: float | None = 60 * 60
+    RETRIEVAL_CACHE_VERSION_CHECK_INTERVAL: float = 5.0
+    RETRIEVAL_DEFAULT_SLA_TIER: str | None = None  # interactive | standard | batch
+    RETRIEVAL_LATENCY_DECAY_HALF_LIFE: float | None = 5 * 60
+    AUTHOR_RESOLVER_ENABLED: bool = True
+    AUTHOR_RESOLVER_REFRESH_SECONDS: float = 5 * 60
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95
+    SEMANTIC_CACHE_TTL: float | None = 24 * 60 * 60
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 5000
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_DIR: str | None = ".cache/embeddings"
+    EMBEDDING_CACHE_MEMORY_ITEMS: int = 10000
 
     # LinkedIn Credentials
     LINKEDIN_USERNAME: str | None = None
@@ -2,19 +2,43 @@
 from llm.cleaning.handlers import ArticleCleaningHandler
 from llm.chunking.handlers import ArticleChunkingHandler
 from llm.embedding.service import ArticleEmbeddingHandler
-from llm.vector_store.qdrant_client import QdrantVectorStore, ArticleVectorMapper
+from llm.vector_store.qdrant_client import QdrantVectorStore, ArticleVectorMapper, PAYLOAD_VERSION
+from llm.vector_store.payload_indexes import ARTICLE_CHUNK_INDEXES
+from llm.vector_store.collection_versions import ARTICLE_CHUNKS_ALIAS
 from llm.odm import Article
-import time
+from llm.rag.bm25_index import BM25Index, chunk_key
+from llm.rag.sparse import SparseEncoder
+import os
 class RAGFeaturePipeline:
-    def __init__(self, batch_size=50):
+    def __init__(self, batch_size=50, embedding_batch_size=64, bucket_boundaries=(64, 128, 256),
+                 num_embedding_workers=0):
         self.cleaning_handler = ArticleCleaningHandler()
         self.chunking_handler = ArticleChunkingHandler()
-        self.embedding_handler = ArticleEmbeddingHandler()
+        self.embedding_handler = ArticleEmbeddingHandler(
+            batch_size=embedding_batch_size,
+            bucket_boundaries=bucket_boundaries
+        )
+        self.num_embedding_workers = num_embedding_workers
+        self.bm25_index = BM25Index(os.getenv("BM25_INDEX_DIR", ".cache/bm25_index"))
+        self.sparse_encoder = SparseEncoder()
         self.vector_store = QdrantVectorStore(batch_size=batch_size)
         self.vector_mapper = ArticleVectorMapper()
     
-    def run(self):
-        """Run complete RAG pipeline with better error handling"""
+    def run(self, full_refresh: bool = False, rebuild: bool = False, wait_for_indexing: bool = True):
+        """Run complete RAG pipeline with better error handling
+
+        Runs are incremental: only chunks whose deterministic point id is not
+        in Qdrant yet are embedded and written, and points of chunks that no
+        longer exist are deleted. Deletes only touch articles that were
+        cleaned, chunked and embedded without errors in this run, or that
+        are gone from MongoDB, so an article that fails keeps its old
+        chunks. full_refresh re-embeds and rewrites every chunk in place.
+
+        rebuild (and the very first load) writes every chunk into a new
+        article_chunks_v{n} collection instead, optionally waits for Qdrant
+        to finish indexing it, and then switches the article_chunks alias
+        to it, so searches never see a partial collection.
+        """
         print("🚀 Starting RAG Feature Pipeline...")
         try:
             print("📥 Extracting articles from MongoDB...")
@@ -22,7 +46,9 @@ class RAGFeaturePipeline:
             
             print(f"📊 Found {len(articles)} articles")
             
-            all_embedded_chunks = []
+            all_chunks = []
+            # Articles whose chunks are known this run; only their stale points may be deleted
+            processed_pmids = set()
             
             for i, article in enumerate(articles):
                 try:
@@ -31,35 +57,142 @@ class RAGFeaturePipeline:
                     cleaned_article = self.cleaning_handler.clean(article_dict)
                     print("✂️ Chunking article...")
                     chunks = self.chunking_handler.chunk(cleaned_article)
+                    processed_pmids.add(article.pmid)
                     if chunks:
-                        print("🔢 Generating embeddings...")
-                        embedded_chunks = self.embedding_handler.embed_chunks(chunks)
-                        all_embedded_chunks.extend(embedded_chunks)
+                        all_chunks.extend(chunks)
                         print(f"📦 Processed article with {len(chunks)} chunks")
                     else:
                         print("⚠️ No chunks generated for this article")
-                    time.sleep(0.1)
                 except Exception as e:
                     print(f"❌ Error processing article {i+1}: {e}")
                     continue
+            if len(processed_pmids) < len(articles):
+                print(f"⚠️ {len(articles) - len(processed_pmids)} articles failed and keep their indexed chunks")
+            self._update_bm25_index(articles, all_chunks, processed_pmids)
+            versions = self.vector_store.versioned(ARTICLE_CHUNKS_ALIAS)
+            rebuild = rebuild or not self.vector_store.collection_exists(ARTICLE_CHUNKS_ALIAS)
+            if rebuild:
+                chunks_to_write = list({self.vector_mapper.point_id(chunk): chunk for chunk in all_chunks}.values())
+                stale_points = {}
+                if len(processed_pmids) < len(articles):
+                    print("⚠️ Failed articles will be missing from the rebuilt collection")
+            else:
+                chunks_to_write, stale_points = self._diff_against_index(
+                    all_chunks, processed_pmids, {article.pmid for article in articles}, full_refresh
+                )
+            if not chunks_to_write and not stale_points:
+                print("✅ Qdrant is already up to date, nothing to embed")
+                return 0
+            # Embed across articles so batch sizes no longer follow article length
+            print(f"🔢 Generating embeddings for {len(chunks_to_write)} chunks...")
+            if self.num_embedding_workers > 1:
+                with self.embedding_handler.embedding_service.multi_process(
+                        self.num_embedding_workers, shard_size=self.embedding_handler.batch_size):
+                    all_embedded_chunks = self.embedding_handler.embed_chunks_bucketed(chunks_to_write)
+            else:
+                all_embedded_chunks = self.embedding_handler.embed_chunks_bucketed(chunks_to_write)
+            embedding_stats = self.embedding_handler.last_run_stats
+            if embedding_stats:
+                print(f"⚡ Embedded {embedding_stats['chunks']} chunks in {embedding_stats['batches']} batches: "
+                      f"{embedding_stats['chunks_per_sec']:.1f} chunks/s, {embedding_stats['tokens_per_sec']:.0f} tokens/s")
+            cache_stats = self.embedding_handler.embedding_service.cache_stats()
+            if cache_stats:
+                print(f"🗃️ Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                      f"({cache_stats['hit_rate']:.1%} hit rate)")
+            # An article with chunks that could not be embedded keeps its old points until a later run succeeds
+            embedded_ids = {self.vector_mapper.point_id(chunk) for chunk in all_embedded_chunks}
+            failed_pmids = {chunk['pmid'] for chunk in chunks_to_write
+                            if self.vector_mapper.point_id(chunk) not in embedded_ids}
+            ids_to_delete = [point_id for point_id, pmid in stale_points.items() if pmid not in failed_pmids]
+            # Lexical term weights go next to the dense vector for hybrid search
+            for chunk in all_embedded_chunks:
+                chunk['sparse_embedding'] = self.sparse_encoder.encode_document(chunk['chunk_content'])
+            # A rebuild fills a fresh version while searches keep hitting the live one through the alias
+            target = versions.next_name() if rebuild else ARTICLE_CHUNKS_ALIAS
+            if rebuild:
+                self.vector_store.create_collection(
+                    collection_name=target,
+                    vector_size=384,
+                    sparse=True,
+                    payload_indexes=ARTICLE_CHUNK_INDEXES
+                )
             if all_embedded_chunks:
                 print(f"🗄️ Loading {len(all_embedded_chunks)} chunks to Qdrant in batches...")
                 points = [self.vector_mapper.to_point_struct(chunk) for chunk in all_embedded_chunks]
-                self.vector_store.create_collection(
-                    collection_name="article_chunks",
-                    vector_size=384 
-                )
-                self.vector_store.upsert_vectors("article_chunks", points)
-                print(f"✅ Pipeline completed! Loaded {len(points)} chunks to Qdrant")
-                return len(points)
-            else:
-                print("❌ No chunks to load into Qdrant")
-                return 0
+                self.vector_store.upsert_vectors(target, points)
+            # Stale points go only after their replacements are in, so an article never drops out of search
+            if ids_to_delete:
+                print(f"🗑️ Deleting {len(ids_to_delete)} stale chunks from Qdrant...")
+                self.vector_store.delete_points(target, ids_to_delete)
+            # Cached retrievals in every process key on this stamp, so they miss from now on
+            self.vector_store.ingestion_stamps().bump(ARTICLE_CHUNKS_ALIAS)
+            if rebuild:
+                if wait_for_indexing:
+                    print(f"⏳ Waiting for Qdrant to finish indexing {target}...")
+                    versions.wait_until_indexed(target)
+                versions.swap(target)
+            versions.collect_garbage()
+            print(f"✅ Pipeline completed! Wrote {len(all_embedded_chunks)} chunks and deleted "
+                  f"{len(ids_to_delete)} from Qdrant")
+            return len(all_embedded_chunks)
         except Exception as e:
             print(f"💥 Pipeline failed: {e}")
             import traceback
             traceback.print_exc()
             return 0
+    
+    def _diff_against_index(self, chunks, processed_pmids, current_pmids, full_refresh=False):
+        """Split chunks into those to embed and write, and map the points to delete to their pmid
+
+        A point is stale when its chunk no longer exists, and only for articles
+        processed in this run or removed from MongoDB: the chunks of an
+        article that failed are unknown, not gone.
+        """
+        chunks_by_id = {self.vector_mapper.point_id(chunk): chunk for chunk in chunks}
+        indexed = self.vector_store.scroll_payloads(ARTICLE_CHUNKS_ALIAS,
+                                                    fields=["embedding_model", "pmid", "payload_version"])
+        model_name = self.embedding_handler.model_name
+        # A chunk embedded by another model has the same id but a stale vector, and one written before the
+        # payload gained the filter fields (doi, journal, year, author_list) would be missed by filtered searches
+        unchanged = {
+            point_id for point_id, payload in indexed.items()
+            if point_id in chunks_by_id and payload.get("embedding_model") == model_name
+            and payload.get("payload_version") == PAYLOAD_VERSION and not full_refresh
+        }
+        chunks_to_write = [chunk for point_id, chunk in chunks_by_id.items() if point_id not in unchanged]
+        stale_points = {
+            point_id: payload.get("pmid") for point_id, payload in indexed.items()
+            if point_id not in chunks_by_id
+            and (payload.get("pmid") in processed_pmids or payload.get("pmid") not in current_pmids)
+        }
+        print(f"🔍 {len(unchanged)} chunks unchanged, {len(chunks_to_write)} to write, "
+              f"{len(stale_points)} to delete")
+        return chunks_to_write, stale_points
+    
+    def _update_bm25_index(self, articles, chunks, processed_pmids):
+        """Re-index processed articles in the corpus-level BM25 index and drop removed ones"""
+        print("📚 Updating BM25 index...")
+        # Articles that failed keep their indexed chunks, like in Qdrant
+        chunks_by_pmid = {pmid: [] for pmid in processed_pmids}
+        for chunk in chunks:
+            chunks_by_pmid.setdefault(chunk['pmid'], []).append(chunk)
+        current_pmids = {article.pmid for article in articles}
+        for pmid in self.bm25_index.groups():
+            if pmid not in current_pmids:
+                self.bm25_index.delete_group(pmid)
+        for pmid, article_chunks in chunks_by_pmid.items():
+            self.bm25_index.replace_group(pmid, [
+                (chunk_key(pmid, chunk['metadata']['chunk_id']), chunk['chunk_content'])
+                for chunk in article_chunks
+            ])
+        self.bm25_index.save()
+        print(f"📚 BM25 index holds {len(self.bm25_index)} chunks")
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Load PubMed articles into Qdrant")
+    parser.add_argument("--full_refresh", action="store_true", help="Re-embed every chunk in place")
+    parser.add_argument("--rebuild", action="store_true", help="Build a new collection version and swap the alias")
+    parser.add_argument("--no_wait_for_indexing", action="store_true", help="Swap as soon as the load is done")
+    args = parser.parse_args()
     pipeline = RAGFeaturePipeline(batch_size=50)  
-    pipeline.run()
\ No newline at end of file
+    pipeline.run(full_refresh=args.full_refresh, rebuild=args.rebuild, wait_for_indexing=not args.no_wait_for_indexing)
\ No newline at end of file
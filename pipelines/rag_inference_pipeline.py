@@ -2,6 +2,7 @@ import logging
 from typing import List
 from llm.rag.retriever import ContextRetriever
 from llm.llm_api.client import LLMClient
+from llm.cache.semantic_cache import SemanticCache
 
 #logger = logging.getLogger(__name__)
 
@@ -12,10 +13,34 @@ class RAGInferencePipeline:
         if not mock:
             self.llm_client = LLMClient(model_name=model_name)
         self.mock = mock
+        # Paraphrased questions reuse an earlier answer instead of a full generation
+        self.semantic_cache = None
+        if not mock:
+            self.semantic_cache = SemanticCache.from_env(
+                model_version=f"{self.llm_client.model_name}|{self.retriever.embedding_service.model_name}",
+                version_fn=self.retriever.corpus_version
+            )
+        self.last_context_chunks: List[dict] = []
+        self.last_cache_hit = None
     
     def generate_response(self, query: str) -> str:
+        query_embedding = None
+        cache_scope = None
+        self.last_cache_hit = None
+        if self.semantic_cache is not None:
+            # A paraphrase only shares an answer when it resolves to the same filters, e.g. the same journal
+            cache_scope = self.retriever.filters(self.retriever.resolve(query))
+            query_embedding = self.retriever.embedding_service.embed_text(query)
+            hit = self.semantic_cache.lookup(query_embedding, scope=cache_scope)
+            if hit is not None:
+                logging.info(f"Semantic cache hit ({hit.similarity:.3f}) for: {hit.query}")
+                self.last_cache_hit = hit
+                self.last_context_chunks = hit.context
+                return hit.answer
+        
         # Retrieving relevantent context 
         context_chunks = self.retriever.search(query, k=3)
+        self.last_context_chunks = context_chunks
         
         # Build prompt with context
         prompt = self._build_prompt(query, context_chunks)
@@ -29,8 +54,15 @@ class RAGInferencePipeline:
             temperature=0.3 
         )
         
+        # Failed generations come back as an empty string or a placeholder and must not be cached
+        if self.semantic_cache is not None and response and self.llm_client.generator is not None:
+            self.semantic_cache.put(query_embedding, query, response, context_chunks, scope=cache_scope)
         return response
     
+    def cache_stats(self) -> dict:
+        """Hit-rate metrics of the semantic answer cache"""
+        return self.semantic_cache.stats() if self.semantic_cache else {}
+    
     def _build_prompt(self, query: str, context_chunks: List[dict]) -> str:
         if not context_chunks:
             return f"Question: {query}\nAnswer:"
@@ -0,0 +1,104 @@
+import pytest
+
+# Importing llm_engineering loads the whole package, models included
+pytest.importorskip("pydantic_settings")
+pytest.importorskip("transformers")
+
+from llm_engineering.application.rag import author_resolver  # noqa: E402
+from llm_engineering.application.rag.author_resolver import AuthorResolver  # noqa: E402
+from llm_engineering.domain.documents import UserDocument  # noqa: E402
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(author_resolver.time, "monotonic", lambda: now[0])
+
+    return now
+
+
+@pytest.fixture
+def failing_mongo(monkeypatch):
+    calls = []
+
+    def bulk_find(*args, **kwargs):
+        calls.append(1)
+        raise ConnectionError("MongoDB is down")
+
+    monkeypatch.setattr(UserDocument, "bulk_find", bulk_find)
+
+    return calls
+
+
+def test_failed_first_load_backs_off(clock, failing_mongo):
+    resolver = AuthorResolver(refresh_seconds=300, retry_seconds=5)
+
+    for _ in range(10):
+        assert resolver.resolve("Paul Iusztin on RAG").ambiguous
+
+    assert len(failing_mongo) == 1
+    assert resolver.stats()["unavailable"] == 10
+
+
+def test_retry_delay_doubles_up_to_the_refresh_interval(clock, failing_mongo):
+    resolver = AuthorResolver(refresh_seconds=12, retry_seconds=5)
+    resolver.resolve("query")
+
+    for delay in (5, 10, 12, 12):
+        clock[0] += delay - 0.1
+        resolver.resolve("query")
+        calls = len(failing_mongo)
+        clock[0] += 0.1
+        resolver.resolve("query")
+        assert len(failing_mongo) == calls + 1
+
+
+@pytest.fixture
+def users(monkeypatch):
+    users = {
+        "paul": UserDocument(first_name="Paul", last_name="Iusztin"),
+        "maxime": UserDocument(first_name="Maxime", last_name="Labonne"),
+        "paul_smith": UserDocument(first_name="Paul", last_name="Smith"),
+    }
+    monkeypatch.setattr(UserDocument, "bulk_find", lambda *args, **kwargs: list(users.values()))
+
+    return users
+
+
+def test_full_name_resolves_even_when_its_first_name_is_shared(users):
+    resolver = AuthorResolver()
+
+    resolution = resolver.resolve("My name is Paul Iusztin. Could you draft a post on RAG?")
+
+    assert resolution.user == users["paul"] and not resolution.ambiguous
+    assert resolver.stats()["resolved"] == 1
+
+
+def test_user_id_in_the_query_resolves(users):
+    resolution = AuthorResolver().resolve(f"Posts of author {users['maxime'].id} on fine-tuning")
+
+    assert resolution.user == users["maxime"]
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "Compare Paul Iusztin and Maxime Labonne on RAG",
+        "Labonne on model merging",
+        "Paul on vector databases",
+        "Paul Iusztin and Smith on RAG",
+    ],
+)
+def test_several_users_or_a_lone_first_or_last_name_are_left_to_the_llm(users, query):
+    resolver = AuthorResolver()
+
+    resolution = resolver.resolve(query)
+
+    assert resolution.user is None and resolution.ambiguous
+    assert resolver.stats()["ambiguous"] == 1
+
+
+def test_query_without_a_known_author_resolves_to_nobody(users):
+    resolution = AuthorResolver().resolve("How do vector databases index embeddings?")
+
+    assert resolution.user is None and not resolution.ambiguous
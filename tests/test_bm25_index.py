@@ -0,0 +1,41 @@
+import os
+
+from llm.rag.bm25_index import BM25Index
+
+
+def _write(index_dir, documents):
+    index = BM25Index(index_dir)
+    for group, texts in documents.items():
+        index.replace_group(group, [(f"{group}:{i}", text) for i, text in enumerate(texts)])
+    index.save()
+    return index
+
+
+def test_reader_reloads_a_generation_published_by_another_writer(tmp_path):
+    _write(str(tmp_path), {"1": ["statins lower cholesterol"], "2": ["aspirin and stroke"]})
+    reader = BM25Index(str(tmp_path), check_interval=0)
+    assert len(reader) == 2
+    assert reader.score("insulin", [("3:0", None)])[0] == 0
+
+    _write(str(tmp_path), {"3": ["insulin resistance in diabetes"]})
+
+    assert len(reader) == 3
+    assert reader.score("insulin", [("3:0", None)])[0] > 0
+
+
+def test_reader_keeps_its_generation_until_the_check_interval(tmp_path):
+    _write(str(tmp_path), {"1": ["statins lower cholesterol"]})
+    reader = BM25Index(str(tmp_path), check_interval=3600)
+    assert len(reader) == 1
+
+    _write(str(tmp_path), {"2": ["aspirin and stroke"]})
+
+    assert len(reader) == 1
+
+
+def test_saves_publish_whole_generations_and_keep_the_previous_one(tmp_path):
+    for pmid in ("1", "2", "3"):
+        _write(str(tmp_path), {pmid: [f"article {pmid}"]})
+
+    assert sorted(os.listdir(tmp_path)) == ["CURRENT", "gen-000002", "gen-000003"]
+    assert sorted(BM25Index(str(tmp_path)).groups()) == ["1", "2", "3"]
@@ -0,0 +1,63 @@
+import pytest
+from qdrant_client.http import models
+
+from llm.vector_store.collection_config import PRESETS, CollectionConfig
+from llm.vector_store.embedded import EmbeddedVectorClient
+
+
+def _server_info(config: CollectionConfig, vector_size: int = 8) -> models.CollectionInfo:
+    """Collection info as a Qdrant server reports it for a collection created from config"""
+    kwargs = config.create_kwargs(vector_size)
+    return models.CollectionInfo(
+        status=models.CollectionStatus.GREEN,
+        optimizer_status=models.OptimizersStatusOneOf.OK,
+        segments_count=1,
+        payload_schema={},
+        config=models.CollectionConfig(
+            params=models.CollectionParams(
+                vectors=kwargs["vectors_config"],
+                sparse_vectors=kwargs["sparse_vectors_config"],
+                on_disk_payload=kwargs["on_disk_payload"],
+            ),
+            hnsw_config=models.HnswConfig(
+                m=config.hnsw_m or 16, ef_construct=config.hnsw_ef_construct or 100, full_scan_threshold=10000
+            ),
+            optimizer_config=models.OptimizersConfig(
+                deleted_threshold=0.2, vacuum_min_vector_number=1000, default_segment_number=0, flush_interval_sec=5
+            ),
+            wal_config=models.WalConfig(wal_capacity_mb=32, wal_segments_ahead=0),
+            quantization_config=kwargs["quantization_config"],
+        ),
+    )
+
+
+@pytest.mark.parametrize("preset", list(PRESETS))
+def test_presets_are_recognized_from_the_collection(preset):
+    config = PRESETS[preset]
+
+    recovered = CollectionConfig.from_collection_info(_server_info(config))
+
+    assert recovered.quantization == config.quantization
+    assert recovered.on_disk == config.on_disk
+    assert recovered.search_params() == config.search_params()
+
+
+def test_custom_layout_is_read_back():
+    config = CollectionConfig(
+        quantization="scalar", hnsw_m=32, hnsw_ef_construct=200, sparse_vectors=True, on_disk_payload=True
+    )
+
+    recovered = CollectionConfig.from_collection_info(_server_info(config))
+
+    assert (recovered.quantization, recovered.on_disk) == ("scalar", False)
+    assert (recovered.hnsw_m, recovered.hnsw_ef_construct) == (32, 200)
+    assert recovered.sparse_vectors and recovered.on_disk_payload
+    # Qdrant does not store query-time settings, so they come from the preset of the quantization
+    assert recovered.oversampling == PRESETS["scalar"].oversampling
+
+
+def test_embedded_collections_read_as_unquantized():
+    client = EmbeddedVectorClient()
+    client.create_collection("chunks", **PRESETS["scalar"].create_kwargs(8))
+
+    assert CollectionConfig.from_collection_info(client.get_collection("chunks")).search_params() is None
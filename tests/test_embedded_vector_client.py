@@ -0,0 +1,165 @@
+import subprocess
+import sys
+import uuid
+
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from llm.rag.sparse import SPARSE_VECTOR_NAME, SparseEncoder, sparse_vectors_config
+from llm.vector_store.embedded import EmbeddedVectorClient
+
+COLLECTION = "embedded_parity"
+NUM_VECTORS = 500
+DIM = 32
+NUM_QUERIES = 10
+
+FILTERS = {
+    "none": None,
+    "pmid": models.Filter(must=[models.FieldCondition(key="pmid", match=models.MatchValue(value="7"))]),
+    "journal_any": models.Filter(must=[
+        models.FieldCondition(key="journal", match=models.MatchAny(any=["Nature", "Lancet"]))
+    ]),
+    "author_and_years": models.Filter(must=[
+        models.FieldCondition(key="author_list", match=models.MatchValue(value="Author 3")),
+        models.FieldCondition(key="year", range=models.Range(gte=2000, lte=2010)),
+    ]),
+    "must_not": models.Filter(must_not=[
+        models.FieldCondition(key="journal", match=models.MatchValue(value="Cell"))
+    ]),
+}
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = np.random.default_rng(0)
+    encoder = SparseEncoder()
+    # Varied vocabulary and lengths, so lexical scores rarely tie
+    words = [f"term{i}" for i in range(300)]
+    texts = [" ".join(rng.choice(words, size=rng.integers(5, 60))) for _ in range(NUM_VECTORS)]
+    vectors = rng.standard_normal((NUM_VECTORS, DIM)).astype(np.float32)
+    points = [
+        models.PointStruct(
+            id=str(uuid.UUID(int=i)),
+            payload={"pmid": str(i % 97), "year": 1990 + i % 35, "journal": ["Nature", "Cell", "Lancet"][i % 3],
+                     "author_list": [f"Author {i % 11}", f"Author {i % 13}"], "chunk_content": text},
+            vector={"": vector.tolist(), SPARSE_VECTOR_NAME: encoder.encode_document(text)}
+        )
+        for i, (vector, text) in enumerate(zip(vectors, texts))
+    ]
+    return {
+        "points": points,
+        "queries": rng.standard_normal((NUM_QUERIES, DIM)).astype(np.float32),
+        "query_texts": [" ".join(rng.choice(words, size=3)) for _ in range(NUM_QUERIES)],
+        "encoder": encoder,
+    }
+
+
+def _load(client, points):
+    client.create_collection(
+        COLLECTION,
+        vectors_config=models.VectorParams(size=DIM, distance=models.Distance.COSINE),
+        sparse_vectors_config=sparse_vectors_config()
+    )
+    client.create_payload_index(COLLECTION, "pmid", models.PayloadSchemaType.KEYWORD)
+    for i in range(0, len(points), 128):
+        client.upsert(COLLECTION, points[i:i + 128], wait=True)
+    return client
+
+
+@pytest.fixture
+def clients(corpus, tmp_path):
+    qdrant = _load(QdrantClient(":memory:"), corpus["points"])
+    embedded = _load(EmbeddedVectorClient(str(tmp_path)), corpus["points"])
+    yield qdrant, embedded
+    qdrant.close()
+    embedded.close()
+
+
+def _ids(points):
+    return sorted(str(point.id) for point in points)
+
+
+def _ranking(points):
+    # Backends may order equal scores differently, so the points tied at the cutoff are left out
+    cutoff = points[-1].score + 1e-4 if points else 0.0
+    return {str(point.id): point.score for point in points if point.score > cutoff}
+
+
+def _assert_same_rankings(expected, actual):
+    # Qdrant scores in float64 and the embedded backend in float32
+    assert len(expected) == len(actual)
+    for expected_scores, actual_scores in zip(expected, actual):
+        assert actual_scores == pytest.approx(expected_scores, abs=1e-5)
+
+
+@pytest.mark.parametrize("filter_name", list(FILTERS))
+def test_dense_search_matches_qdrant(clients, corpus, filter_name):
+    rankings = [
+        [_ranking(client.query_points(COLLECTION, query=query.tolist(), query_filter=FILTERS[filter_name],
+                                      limit=10).points) for query in corpus["queries"]]
+        for client in clients
+    ]
+
+    _assert_same_rankings(*rankings)
+
+
+@pytest.mark.parametrize("filter_name", list(FILTERS))
+def test_sparse_search_matches_qdrant(clients, corpus, filter_name):
+    # Hybrid search fuses with qdrant_client's own RRF, so matching both inputs covers it
+    rankings = [
+        [_ranking(client.query_points(COLLECTION, query=corpus["encoder"].encode_query(text),
+                                      using=SPARSE_VECTOR_NAME, query_filter=FILTERS[filter_name],
+                                      limit=10).points) for text in corpus["query_texts"]]
+        for client in clients
+    ]
+
+    _assert_same_rankings(*rankings)
+
+
+@pytest.mark.parametrize("filter_name", list(FILTERS))
+def test_batch_count_and_scroll_match_qdrant(clients, corpus, filter_name):
+    query_filter = FILTERS[filter_name]
+    rankings, counts = [], []
+    for client in clients:
+        batch = client.query_batch_points(COLLECTION, requests=[
+            models.QueryRequest(query=query.tolist(), filter=query_filter, limit=5, with_payload=True)
+            for query in corpus["queries"]
+        ])
+        records, _ = client.scroll(COLLECTION, scroll_filter=query_filter, limit=NUM_VECTORS)
+        rankings.append([_ranking(response.points) for response in batch])
+        counts.append((client.count(COLLECTION, count_filter=query_filter, exact=True).count, _ids(records)))
+
+    _assert_same_rankings(*rankings)
+    assert counts[0] == counts[1]
+
+
+def test_deletes_match_qdrant_and_persist(clients, tmp_path):
+    for client in clients:
+        client.delete(COLLECTION, models.FilterSelector(filter=FILTERS["pmid"]))
+        client.delete(COLLECTION, models.PointIdsList(points=[str(uuid.UUID(int=1)), str(uuid.UUID(int=2))]))
+    expected, actual = [_ids(client.scroll(COLLECTION, limit=NUM_VECTORS)[0]) for client in clients]
+    assert expected == actual
+
+    clients[1].close()
+    reopened = EmbeddedVectorClient(str(tmp_path))
+
+    assert _ids(reopened.scroll(COLLECTION, limit=NUM_VECTORS)[0]) == expected
+    reopened.close()
+
+
+def test_directory_is_opened_by_one_client_at_a_time(tmp_path):
+    client = EmbeddedVectorClient(str(tmp_path))
+
+    with pytest.raises(RuntimeError, match="already open"):
+        EmbeddedVectorClient(str(tmp_path))
+    other_process = subprocess.run(
+        [sys.executable, "-c", f"from llm.vector_store.embedded import EmbeddedVectorClient; "
+                               f"EmbeddedVectorClient({str(tmp_path)!r})"],
+        capture_output=True, text=True
+    )
+    assert other_process.returncode != 0 and "already open" in other_process.stderr
+
+    client.close()
+    EmbeddedVectorClient(str(tmp_path)).close()
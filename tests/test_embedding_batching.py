@@ -0,0 +1,85 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from llm.embedding.batching import EmbeddingBatcher
+
+
+class FakeEncoder:
+    """Embeds a text as [len(text), index of the call], failing on texts that contain "bad" """
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self._lock:
+            self.calls.append(list(texts))
+            call = len(self.calls)
+        if any("bad" in text for text in texts):
+            raise ValueError("cannot embed")
+        return np.array([[len(text), call] for text in texts], dtype=np.float32)
+
+
+def test_every_caller_gets_its_own_row():
+    encoder = FakeEncoder()
+    texts = [f"text {'x' * i}" for i in range(100)]
+
+    with EmbeddingBatcher(encoder, max_batch_size=8, max_wait_ms=20) as batcher:
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            embeddings = list(pool.map(batcher.embed, texts))
+
+    assert [embedding[0] for embedding in embeddings] == [len(text) for text in texts]
+    assert all(len(call) <= 8 for call in encoder.calls)
+    # Concurrent requests were actually batched
+    assert batcher.stats()["batches"] < len(texts)
+    assert batcher.stats()["items"] == len(texts)
+
+
+def test_a_failing_text_only_fails_its_own_future():
+    encoder = FakeEncoder()
+
+    with EmbeddingBatcher(encoder, max_batch_size=8, max_wait_ms=50) as batcher:
+        futures = [batcher.submit(text) for text in ["good one", "bad one", "good two"]]
+
+        assert futures[0].result(timeout=5)[0] == len("good one")
+        with pytest.raises(ValueError):
+            futures[1].result(timeout=5)
+        assert futures[2].result(timeout=5)[0] == len("good two")
+
+
+def test_submit_after_close_raises():
+    batcher = EmbeddingBatcher(FakeEncoder())
+    batcher.close()
+
+    with pytest.raises(RuntimeError):
+        batcher.submit("late")
+
+
+def test_submits_racing_close_never_hang():
+    for _ in range(50):
+        batcher = EmbeddingBatcher(FakeEncoder(), max_wait_ms=1)
+        futures = []
+        start = threading.Event()
+
+        def submit_many():
+            start.wait()
+            for i in range(20):
+                try:
+                    futures.append(batcher.submit(f"text {i}"))
+                except RuntimeError:
+                    return
+
+        threads = [threading.Thread(target=submit_many) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        start.set()
+        batcher.close()
+        for thread in threads:
+            thread.join()
+
+        # Every accepted future resolves; none is left behind the shutdown sentinel
+        for future in futures:
+            assert future.result(timeout=5) is not None
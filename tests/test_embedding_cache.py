@@ -0,0 +1,63 @@
+import os
+
+import numpy as np
+
+from llm.embedding.cache import KEY_SIZE, EmbeddingCache
+
+
+def _vectors(n, dim=4, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+def test_vectors_persist_across_instances(tmp_path):
+    texts = ["alpha", "beta", "gamma"]
+    vectors = _vectors(3)
+    EmbeddingCache("model", cache_dir=str(tmp_path)).put_many(texts, vectors)
+
+    cache = EmbeddingCache("model", cache_dir=str(tmp_path))
+
+    np.testing.assert_array_equal(cache.get("beta"), vectors[1])
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_missing_keys_file_is_an_empty_index(tmp_path):
+    EmbeddingCache("model", cache_dir=str(tmp_path)).put_many(["alpha"], _vectors(1))
+    os.remove(tmp_path / "model" / "keys.bin")
+
+    cache = EmbeddingCache("model", cache_dir=str(tmp_path))
+
+    assert cache.get("alpha") is None
+    cache.put_many(["beta"], _vectors(1, seed=1))
+    assert EmbeddingCache("model", cache_dir=str(tmp_path)).get("beta") is not None
+
+
+def test_torn_append_is_dropped_before_the_next_write(tmp_path):
+    vectors = _vectors(3)
+    EmbeddingCache("model", cache_dir=str(tmp_path)).put_many(["a", "b"], vectors[:2])
+    # A crash after the vector append but before the key append
+    with open(tmp_path / "model" / "vectors.f32", "ab") as f:
+        f.write(vectors[2].tobytes()[:7])
+
+    cache = EmbeddingCache("model", cache_dir=str(tmp_path))
+    cache.put_many(["c"], vectors[2:])
+
+    reopened = EmbeddingCache("model", cache_dir=str(tmp_path))
+    for text, vector in zip(["a", "b", "c"], vectors):
+        np.testing.assert_array_equal(reopened.get(text), vector)
+    assert os.path.getsize(tmp_path / "model" / "keys.bin") == 3 * KEY_SIZE
+
+
+def test_rows_appended_by_another_instance_are_picked_up(tmp_path):
+    reader = EmbeddingCache("model", cache_dir=str(tmp_path))
+    writer = EmbeddingCache("model", cache_dir=str(tmp_path))
+    vectors = _vectors(2)
+
+    writer.put_many(["alpha"], vectors[:1])
+    np.testing.assert_array_equal(reader.get("alpha"), vectors[0])
+
+    # Both append after each other; neither overwrites the other's rows
+    reader.put_many(["beta"], vectors[1:])
+    writer.put_many(["gamma"], vectors[:1])
+    reopened = EmbeddingCache("model", cache_dir=str(tmp_path))
+    np.testing.assert_array_equal(reopened.get("beta"), vectors[1])
+    np.testing.assert_array_equal(reopened.get("gamma"), vectors[0])
@@ -0,0 +1,52 @@
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from llm.embedding.service import ArticleEmbeddingHandler  # noqa: E402
+
+
+class FakeTokenizer:
+    def __call__(self, texts, add_special_tokens=True):
+        return {"input_ids": [text.split() for text in texts]}
+
+
+class FakeEmbeddingService:
+    """Embeds a text as [number of words], failing on texts that contain "bad" """
+
+    pool = None
+
+    def __init__(self):
+        self.model = type("Model", (), {"tokenizer": FakeTokenizer()})()
+
+    def embed_batch(self, texts):
+        if any("bad" in text for text in texts):
+            raise ValueError("cannot embed")
+        return [[float(len(text.split()))] for text in texts]
+
+
+def _handler(batch_size=4):
+    handler = ArticleEmbeddingHandler.__new__(ArticleEmbeddingHandler)
+    handler.embedding_service = FakeEmbeddingService()
+    handler.model_name = "fake"
+    handler.batch_size = batch_size
+    handler.bucket_boundaries = [2, 4]
+    handler.last_run_stats = {}
+    return handler
+
+
+def test_a_failing_chunk_only_drops_itself():
+    chunks = [{"pmid": str(i), "chunk_content": " ".join(["word"] * (i % 5 + 1))} for i in range(12)]
+    chunks[5]["chunk_content"] = "bad word"
+
+    embedded = _handler().embed_chunks_bucketed(chunks)
+
+    assert [chunk["pmid"] for chunk in embedded] == [str(i) for i in range(12) if i != 5]
+    assert all(chunk["embedding"] == [float(len(chunk["chunk_content"].split()))] for chunk in embedded)
+    assert _handler().embed_chunks_bucketed([chunks[5]]) == []
+
+
+def test_failures_are_counted_in_run_stats():
+    handler = _handler()
+    handler.embed_chunks_bucketed([{"pmid": "1", "chunk_content": "bad"}, {"pmid": "2", "chunk_content": "ok"}])
+
+    assert handler.last_run_stats["failed"] == 1
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from pydantic import BaseModel, ValidationError
+
+# Importing llm_engineering loads the whole package, models included
+pytest.importorskip("pydantic_settings")
+pytest.importorskip("transformers")
+
+from llm_engineering.domain.types import Embedding  # noqa: E402
+
+
+class Vector(BaseModel):
+    embedding: Embedding
+
+
+def test_float32_arrays_are_kept_without_copying():
+    array = np.arange(4, dtype=np.float32)
+
+    assert Vector(embedding=array).embedding is array
+    assert Vector(embedding=[1, 2, 3]).embedding.dtype == np.float32
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        [[1.0, 2.0], [3.0, 4.0]],
+        np.zeros((1, 4)),
+        1.0,
+        [],
+        [[1.0, 2.0], [3.0]],
+        [1.0, float("nan")],
+        [1.0, float("inf")],
+        ["a", "b"],
+    ],
+    ids=["2d", "2d_array", "scalar", "empty", "ragged", "nan", "inf", "strings"],
+)
+def test_corrupt_vectors_are_rejected(value):
+    with pytest.raises(ValidationError):
+        Vector(embedding=value)
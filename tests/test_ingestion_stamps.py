@@ -0,0 +1,38 @@
+from llm.cache.backends import InMemoryCacheBackend
+from llm.cache.retrieval_cache import RetrievalCache
+from llm.vector_store.embedded import EmbeddedVectorClient
+from llm.vector_store.ingestion_stamps import IngestionStamps
+
+
+def test_bump_changes_only_the_bumped_stamp():
+    stamps = IngestionStamps(EmbeddedVectorClient())
+    assert stamps.stamp("article_chunks") is None
+
+    first = stamps.bump("article_chunks")
+    second = stamps.bump("article_chunks")
+
+    assert first != second
+    assert stamps.stamp("article_chunks") == second
+    assert stamps.stamp("other") is None
+
+
+def test_stamp_is_shared_through_the_store(tmp_path):
+    writer = IngestionStamps(EmbeddedVectorClient(str(tmp_path)))
+    stamp = writer.bump("article_chunks")
+    writer.client.close()
+
+    assert IngestionStamps(EmbeddedVectorClient(str(tmp_path))).stamp("article_chunks") == stamp
+
+
+def test_bump_invalidates_caches_with_their_own_backend():
+    stamps = IngestionStamps(EmbeddedVectorClient())
+    stamps.bump("article_chunks")
+    # A reader's private in-memory backend never sees invalidate() from the ingestion process
+    cache = RetrievalCache(InMemoryCacheBackend(), version_fn=lambda: stamps.stamp("article_chunks"),
+                           version_check_interval=0.0)
+    cache.set("statins", ["cached"])
+    assert cache.get("statins") == ["cached"]
+
+    stamps.bump("article_chunks")
+
+    assert cache.get("statins") is None
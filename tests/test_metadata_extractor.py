@@ -0,0 +1,55 @@
+import pytest
+
+from llm.rag.metadata_extractor import MetadataExtractor
+
+
+@pytest.fixture
+def extractor():
+    return MetadataExtractor(
+        journals=["Cancer", "Cell", "Blood", "Nature", "Nature Medicine", "The Lancet"],
+        authors=["Smith J", "Jones K"],
+    )
+
+
+@pytest.mark.parametrize("query", [
+    "new treatments for breast cancer",
+    "cell signaling in blood vessels",
+    "the nature of sepsis in children",
+    "smith j on statins",
+    "outcomes observed in 2020 cohorts",
+])
+def test_topic_words_are_not_name_filters(extractor, query):
+    metadata = extractor.extract(query)
+
+    assert metadata.journals == [] and metadata.authors == []
+    assert metadata.to_filter() is None
+
+
+@pytest.mark.parametrize("query, journals", [
+    ("papers published in Nature Medicine on statins", ["Nature Medicine"]),
+    ("studies in the journal Cell and Blood on stem cells", ["Cell", "Blood"]),
+    ("reviews published in the Lancet", ["The Lancet"]),
+])
+def test_cued_journals_are_extracted(extractor, query, journals):
+    assert extractor.extract(query).journals == journals
+
+
+def test_cued_authors_and_years_are_extracted(extractor):
+    metadata = extractor.extract("trials by smith j and Jones K since 2019")
+
+    assert metadata.authors == ["Smith J", "Jones K"]
+    assert metadata.year_from == 2019
+
+
+def test_relaxed_filter_keeps_only_structured_conditions(extractor):
+    metadata = extractor.extract("published in Cancer in the year 2020")
+
+    assert [condition.key for condition in metadata.to_filter().must] == ["journal", "year"]
+    assert [condition.key for condition in metadata.to_filter(include_names=False).must] == ["year"]
+
+
+@pytest.mark.parametrize("query", ["trials published in 2020", "reviews from the year 2020"])
+def test_cued_single_years_are_extracted(extractor, query):
+    metadata = extractor.extract(query)
+
+    assert (metadata.year_from, metadata.year_to) == (2020, 2020)
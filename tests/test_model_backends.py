@@ -0,0 +1,117 @@
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pydantic_settings")
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("optimum.onnxruntime")
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from sentence_transformers import SentenceTransformer, models  # noqa: E402
+from sentence_transformers.cross_encoder import CrossEncoder  # noqa: E402
+
+from llm_engineering.application.networks import backends  # noqa: E402
+from llm_engineering.settings import settings  # noqa: E402
+
+WORDS = "what are the side effects of metformin brca1 mutations and risk breast cancer deep learning".split()
+
+
+def _tiny_bert(directory, num_labels=None):
+    """A randomly initialized two-layer BERT with a word-level vocabulary, so no download is needed"""
+    vocab_file = directory / "vocab.txt"
+    directory.mkdir(parents=True, exist_ok=True)
+    vocab_file.write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", *WORDS]))
+    config = transformers.BertConfig(
+        vocab_size=5 + len(WORDS),
+        hidden_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=64,
+        max_position_embeddings=64,
+        num_labels=num_labels or 2,
+    )
+    torch.manual_seed(0)
+    model_cls = transformers.BertForSequenceClassification if num_labels else transformers.BertModel
+    model_cls(config).save_pretrained(directory)
+    transformers.BertTokenizerFast(vocab_file=str(vocab_file)).save_pretrained(directory)
+
+    return directory
+
+
+@pytest.fixture(scope="module")
+def tiny_bi_encoder(tmp_path_factory):
+    bert_dir = _tiny_bert(tmp_path_factory.mktemp("bert"))
+    model_dir = tmp_path_factory.mktemp("bi_encoder")
+    transformer = models.Transformer(str(bert_dir), max_seq_length=32)
+    SentenceTransformer(modules=[transformer, models.Pooling(32)], device="cpu").save(str(model_dir))
+
+    return str(model_dir)
+
+
+@pytest.fixture(scope="module")
+def tiny_cross_encoder(tmp_path_factory):
+    return str(_tiny_bert(tmp_path_factory.mktemp("cross_encoder"), num_labels=1))
+
+
+@pytest.fixture(autouse=True)
+def onnx_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "RAG_ONNX_CACHE_DIR", str(tmp_path / "onnx"))
+
+    return tmp_path / "onnx"
+
+
+def _parity_file(cache_dir, model_id, backend):
+    return cache_dir / model_id.replace("/", "__") / f"parity_{backend}.json"
+
+
+def test_score_parity_catches_shifted_and_scaled_scores():
+    reference = np.array([1.0, 2.0, 3.0])
+
+    assert backends.check_score_parity(lambda _: reference, lambda _: reference + 1e-4) < 1e-3
+    # Cosine similarity over the score vector would accept both of these
+    assert backends.check_score_parity(lambda _: reference, lambda _: reference * 3) > 1
+    assert backends.check_score_parity(lambda _: reference, lambda _: reference + 10) > 1
+    assert backends.check_parity(lambda _: reference[None], lambda _: reference[None] * 3) > 0.99
+
+
+def test_onnx_bi_encoder_matches_torch(tiny_bi_encoder, onnx_cache_dir):
+    model = backends.load_model(SentenceTransformer, tiny_bi_encoder, backend="onnx", device="cpu")
+    reference = SentenceTransformer(tiny_bi_encoder, device="cpu")
+
+    parity = json.loads(_parity_file(onnx_cache_dir, tiny_bi_encoder, "onnx").read_text())
+    assert parity["passed"]
+    assert parity["cosine_similarity"] >= settings.RAG_ONNX_PARITY_THRESHOLD
+    np.testing.assert_allclose(
+        model.encode(backends.PARITY_PROBES), reference.encode(backends.PARITY_PROBES), atol=1e-4
+    )
+
+
+def test_onnx_cross_encoder_matches_torch(tiny_cross_encoder, onnx_cache_dir):
+    model = backends.load_model(CrossEncoder, tiny_cross_encoder, backend="onnx", device="cpu")
+    reference = CrossEncoder(tiny_cross_encoder, device="cpu")
+    pairs = [(backends.PARITY_PROBES[0], probe) for probe in backends.PARITY_PROBES]
+
+    parity = json.loads(_parity_file(onnx_cache_dir, tiny_cross_encoder, "onnx").read_text())
+    assert parity["passed"]
+    assert parity["max_abs_error"] <= settings.RAG_ONNX_SCORE_TOLERANCE
+    np.testing.assert_allclose(model.predict(pairs), reference.predict(pairs), atol=1e-4)
+
+
+def test_failed_parity_falls_back_to_torch(tiny_cross_encoder, onnx_cache_dir, monkeypatch):
+    monkeypatch.setattr(settings, "RAG_ONNX_SCORE_TOLERANCE", -1.0)
+
+    model = backends.load_model(CrossEncoder, tiny_cross_encoder, backend="onnx", device="cpu")
+
+    assert not json.loads(_parity_file(onnx_cache_dir, tiny_cross_encoder, "onnx").read_text())["passed"]
+    assert model.backend == "torch"
+    # The stored verdict is reused without exporting or checking again
+    assert backends.load_model(CrossEncoder, tiny_cross_encoder, backend="onnx", device="cpu").backend == "torch"
+
+
+def test_int8_export_loads(tiny_bi_encoder, onnx_cache_dir):
+    model = backends.load_model(SentenceTransformer, tiny_bi_encoder, backend="onnx-int8", device="cpu")
+
+    assert _parity_file(onnx_cache_dir, tiny_bi_encoder, "onnx-int8").exists()
+    assert model.encode(["breast cancer risk"]).shape == (1, 32)
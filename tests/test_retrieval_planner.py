@@ -0,0 +1,69 @@
+import pytest
+
+# Importing llm_engineering loads the whole package, models included
+pytest.importorskip("pydantic_settings")
+pytest.importorskip("transformers")
+
+from llm_engineering.application.rag.planner import (  # noqa: E402
+    RetrievalPlanner,
+    StageLatencyTracker,
+    cascade_size,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _plan(tracker: StageLatencyTracker):
+    return RetrievalPlanner(tracker).plan(k=3, expand_to_n_queries=3, latency_budget_ms=1500, rerank_mode="vector")
+
+
+def test_unobserved_stage_decays_toward_the_prior():
+    clock = FakeClock()
+    tracker = StageLatencyTracker(decay_half_life=60, clock=clock)
+    tracker.observe("expansion", 10_000)
+    slow = tracker.estimate("expansion")
+
+    clock.now = 60
+
+    assert tracker.estimate("expansion") == pytest.approx(800 + (slow - 800) / 2)
+
+
+def test_planner_expands_again_after_a_slow_expansion():
+    clock = FakeClock()
+    tracker = StageLatencyTracker(decay_half_life=60, clock=clock)
+    assert _plan(tracker).expand_to_n_queries == 3
+
+    tracker.observe("expansion", 10_000)
+    assert _plan(tracker).expand_to_n_queries == 1
+
+    clock.now = 10 * 60
+
+    assert _plan(tracker).expand_to_n_queries == 3
+
+
+def test_without_half_life_estimates_never_decay():
+    clock = FakeClock()
+    tracker = StageLatencyTracker(clock=clock)
+    tracker.observe("expansion", 10_000)
+    slow = tracker.estimate("expansion")
+
+    clock.now = 10 * 60
+
+    assert tracker.estimate("expansion") == slow
+
+
+def test_cascade_plan_is_estimated_with_the_size_its_slack_pays_for():
+    tracker = StageLatencyTracker()
+
+    plan = RetrievalPlanner(tracker).plan(k=3, expand_to_n_queries=3, latency_budget_ms=1500, rerank_mode="cascade")
+
+    # The priors leave 190 ms of slack over a 10-pair cascade, enough to score all 18 candidates at 5 ms per pair.
+    assert plan.rerank_mode == "cascade"
+    assert plan.cascade_top_m == cascade_size(18, 3, plan.rerank_budget_ms, 5.0) == 18
+    assert plan.estimated_ms == pytest.approx(400 + 800 + 3 * 10 + 30 + 18 * 5)
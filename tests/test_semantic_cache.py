@@ -0,0 +1,32 @@
+from llm.cache.semantic_cache import SemanticCache
+
+EMBEDDING = [0.6, 0.8, 0.0]
+PARAPHRASE = [0.6, 0.79, 0.01]
+
+
+def test_paraphrase_hits_within_the_same_scope():
+    cache = SemanticCache("model")
+    cache.put(EMBEDDING, "statins and liver damage", "answer", scope={"journal": "Hepatology"})
+
+    hit = cache.lookup(PARAPHRASE, scope={"journal": "Hepatology"})
+
+    assert hit is not None and hit.answer == "answer"
+
+
+def test_paraphrase_with_other_filters_misses():
+    cache = SemanticCache("model")
+    cache.put(EMBEDDING, "papers by Smith on statins", "answer", scope={"author": "Smith"})
+
+    assert cache.lookup(PARAPHRASE, scope={"author": "Jones"}) is None
+    assert cache.lookup(PARAPHRASE) is None
+
+
+def test_new_corpus_version_retires_answers():
+    corpus = {"stamp": "a"}
+    cache = SemanticCache("model", version_fn=lambda: corpus["stamp"], version_check_interval=0.0)
+    cache.put(EMBEDDING, "statins and liver damage", "answer")
+    assert cache.lookup(PARAPHRASE) is not None
+
+    corpus["stamp"] = "b"
+
+    assert cache.lookup(PARAPHRASE) is None
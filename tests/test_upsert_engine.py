@@ -0,0 +1,66 @@
+import uuid
+
+import pytest
+from qdrant_client.http import models
+
+from llm.vector_store.embedded import EmbeddedVectorClient
+from llm.vector_store.upsert_engine import UpsertEngine
+
+COLLECTION = "upserts"
+
+
+class FlakyClient:
+    """Embedded client that records upserted batches and fails once on the batch holding fail_on"""
+
+    def __init__(self, fail_on=None):
+        self._client = EmbeddedVectorClient()
+        self._client.create_collection(COLLECTION, vectors_config=models.VectorParams(
+            size=2, distance=models.Distance.DOT))
+        self.fail_on = fail_on
+        self.upserted = []
+
+    def upsert(self, collection_name, points, wait=True):
+        if self.fail_on is not None and any(str(point.id) == self.fail_on for point in points):
+            self.fail_on = None
+            raise ConnectionError("Qdrant went away")
+        self.upserted.append([str(point.id) for point in points])
+        return self._client.upsert(collection_name, points, wait=wait)
+
+
+def _points(n, seed=0):
+    return [models.PointStruct(id=str(uuid.UUID(int=seed * 1000 + i)), vector=[1.0, 0.0], payload={"i": i})
+            for i in range(n)]
+
+
+def _engine(client, tmp_path):
+    return UpsertEngine(client, batch_size=2, max_in_flight=1, max_retries=1, checkpoint_dir=str(tmp_path))
+
+
+def test_resumed_load_skips_committed_batches(tmp_path):
+    points = _points(6)
+    client = FlakyClient(fail_on=points[4].id)
+    with pytest.raises(ConnectionError):
+        _engine(client, tmp_path).upsert(COLLECTION, points, load_id="load")
+
+    client.upserted.clear()
+    stats = _engine(client, tmp_path).upsert(COLLECTION, points, load_id="load")
+
+    assert stats.skipped_batches == 2
+    assert [point.id for point in points[4:]] in client.upserted
+    assert [point.id for point in points[:2]] not in client.upserted
+
+
+def test_resumed_load_rewrites_batches_with_other_points(tmp_path):
+    points = _points(6)
+    client = FlakyClient(fail_on=points[4].id)
+    with pytest.raises(ConnectionError):
+        _engine(client, tmp_path).upsert(COLLECTION, points, load_id="load")
+
+    # Same load id and size, but the first batch now holds other points
+    changed = _points(2, seed=1) + points[2:]
+    client.upserted.clear()
+    stats = _engine(client, tmp_path).upsert(COLLECTION, changed, load_id="load")
+
+    assert stats.skipped_batches == 1
+    assert [point.id for point in changed[:2]] in client.upserted
+    assert client._client.count(COLLECTION).count == 8